@@ -12,6 +12,7 @@ __version__ = 1.0
 #py import
 import collections as _collections
 import os
+import weakref as _weakref
 
 #mpc import
 import mpc.logging as _logging
@@ -19,6 +20,9 @@ import mpc.tessa
 from mpc.tessa import store, contexts
 #import ftrack
 
+#project import
+from save.assettypes import getAssetTypeObject, invalidateAssetTypes
+
 _log = _logging.getLogger()
 from save.context import _AbstractJobContext
 
@@ -134,21 +138,98 @@ class Asset(context._AbstractJobContext):
         """ Load the assetTypeGroup (str) from the assetType (resolved by the definition manager)
         """
         if self.__assetTypeGroup is None:
-            try:
-                # Coerce the assetType into an object
-                assetTypeObj = definitions.getDefinitionObject(self.__context, self.__assetType)
+            self.__assetTypeGroup = getAssetTypeObject(self.__context, self.__assetType).assetTypeGroup
 
-                # Check asset type is compatible with our context
-                definitions.checkAssetTypeForContext(assetTypeObj, self.__context)
 
-            except exceptions.AssetTypeNotFound:
-                # Instantiate the missing asset types with the minimal definition 'MissingAssetType'
-                assetTypeObj = _MissingAssetType
-                _log.warn("Could not find asset definition for child of asset type %r.", self.__assetType)
+class AssetRecord(object):
+    """ Lightweight stand-in for an Asset, for searches returning many thousands of results
 
-            self.__assetTypeGroup = assetTypeObj.assetTypeGroup
+        Stores only the context, asset type, name and stream.  The type and stream strings are
+        interned and equal contexts are shared, so a large result set holds one copy of each.
+        The sort key is built once, and the full Asset is only created when toAsset() is called.
+
+        Usage:
+            records = sorted(AssetRecord(context, assetType, name) for context, _, assetType, name in results)
+            records[0].toAsset().findVersions()
+    """
+    __slots__ = ('context', 'assetType', 'name', 'stream', '_sortKey', '__weakref__')
+
+    def __init__(self, context, assetType, name, stream=None):
+        self.context = _internContext(context)
+        self.assetType = _intern(assetType)
+        self.name = name
+        self.stream = _intern(stream)
+        self._sortKey = None
+
+    @classmethod
+    def fromAsset(cls, asset):
+        """ Builds the compact record of a full Asset
+        """
+        return cls(asset.context, asset.assetType, asset.name, None if asset.stream is None else str(asset.stream))
+
+    def toAsset(self, delayLoad=True):
+        """ Builds the full Asset, by default without loading its asset type group
+
+            Returns:
+                Asset
+        """
+        return Asset(self.context, self.assetType, self.name, stream=self.stream, delayLoad=delayLoad)
+
+    @property
+    def sortKey(self):
+        """ Tuple the records sort by, built on first use
+        """
+        if self._sortKey is None:
+            self._sortKey = _makeComparisonTuple(self)
+        return self._sortKey
+
+    @property
+    def assetTypeGroup(self):
+        """ The group type of the asset (str), one definition lookup per context level and asset type
+        """
+        return getAssetTypeObject(self.context, self.assetType).assetTypeGroup
+
+    def __repr__(self):
+        return "%s(%r, %r, %r, %r)" % (self.__class__.__name__, self.context, self.assetType, self.name, self.stream)
+
+    def __eq__(self, obj):
+        return isinstance(obj, AssetRecord) and self.sortKey == obj.sortKey
+
+    def __ne__(self, obj):
+        return not self == obj
+
+    def __lt__(self, obj):
+        return self.sortKey < obj.sortKey
+
+    def __hash__(self):
+        return hash(self.sortKey)
+
+    def __cmp__(self, other):
+        return cmp(self.sortKey, other.sortKey)
+
+
+# Contexts shared between asset records, dropped again once no record uses them
+_contexts = _weakref.WeakValueDictionary()
+
+def _internContext(context):
+    """ Returns an already known context equal to context, or context itself
+    """
+    try:
+        return _contexts.setdefault(tuple(context), context)
+    except TypeError:
+        return context
+
+def _intern(value):
+    """ Interns byte strings, anything else is returned as is
+    """
+    return intern(value) if type(value) is str else value
+
+def _makeComparisonTuple(asset):
+    """ Tuple that orders assets by context, type, name and stream
+    """
+    return (tuple(value for _, value in asset.context), asset.assetType, asset.name,
+            None if asset.stream is None else str(asset.stream))
 
-    
 
 class SaveContext(context._AbstractJobContext):
     
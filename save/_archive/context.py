@@ -17,13 +17,31 @@ import os
 import mpc.logging as _logging
 #import ftrack
 
+#project import
+from save import cache as _cache
+from save import tasks as _tasks
+
 _log = _logging.getLogger()
 
+# Bounded cache of validation results, invalid contexts can become valid at any time so they expire sooner
+_validContextsCache = _cache.LRUCache(maxsize=4096)
+_VALID_CONTEXT_TTL = 300
+_INVALID_CONTEXT_TTL = 15
+
+# Child queries in flight at once when walking many contexts, e.g. the shots of every scene of a job
+_FIND_CHILDREN_CONCURRENCY = 16
+
 
 class Services(object):
     def findJobs(cls):
         pass
 
+    def validateContext(cls, contextUri):
+        pass
+
+    def validateContexts(cls, contextUris):
+        pass
+
 
 class _AbstractContext(object):
     """ Base context object.
@@ -159,6 +177,21 @@ class _AbstractContext(object):
         """
         raise NotImplementedError # pragma: no cover
 
+    def findChildren_async(self, callback=None, **findChildrenKwargs):
+        """ Runs findChildren in a background thread
+
+            Arguments:
+                callback: called with the future once the children are found, from the background thread
+                findChildrenKwargs: passed on to findChildren
+
+            Returns:
+                save.tasks.Future whose result is the list of child contexts
+        """
+        future = _tasks.submit(self.findChildren, **findChildrenKwargs)
+        if callback:
+            future.add_done_callback(callback)
+        return future
+
     def hasChildren(self):
         """ Provide a cheap way to determine whether this node has children
         """
@@ -565,6 +598,83 @@ def fromEnvironment(services=None):
                            services=services)
 
 
+def findChildrenBatch(contexts, withReleases=False, assetTypeFilter=None, assetGroupFilter=None):
+    """ Finds the children of many Job or Scene contexts with one query per backend instead of
+        one or two per context, e.g. every shot of a job in a single asset and a single context query
+
+        Arguments:
+            contexts: list of Job or Scene instances sharing the same services
+            withReleases: True only asks the asset backend, see Job.findChildren and Scene.findChildren
+            assetTypeFilter: passed on to the asset backend with withReleases, ignored otherwise like
+                findChildren ignores it
+            assetGroupFilter: as assetTypeFilter
+
+        Returns:
+            dict mapping each context to its sorted list of child contexts
+    """
+    for context in contexts:
+        if not isinstance(context, (Job, Scene)):
+            raise ValueError('Invalid argument type: %r, Job or Scene context expected' % (type(context),))
+    if not contexts:
+        return {}
+
+    services = contexts[0].services
+    contextUris = dict((context, _uri.fromContext(context)) for context in contexts)
+    names = dict((context, set()) for context in contexts)
+
+    if withReleases is not True:
+        # findChildren only filters the asset backend's children when asked for the ones with releases
+        assetTypeFilter = assetGroupFilter = None
+    childRecords = services.asset.findChildContextsBatch(contextUris.values(), assetGroupFilter, assetTypeFilter, True)
+    for context, contextUri in contextUris.items():
+        names[context].update(_uri.toContext(childUri, services=services)
+                              for childUri, _ in childRecords.get(contextUri, []))
+
+    if withReleases is not True:
+        # Scenes come from the job's context listing and shots from the scene's, one batched query per level
+        for contextType, findBatch in [(Job, services.context.findScenesBatch),
+                                       (Scene, services.context.findShotsBatch)]:
+            levelUris = [contextUri for context, contextUri in contextUris.items() if isinstance(context, contextType)]
+            if not levelUris:
+                continue
+            childUris = findBatch(levelUris)
+            for context, contextUri in contextUris.items():
+                names[context].update(_uri.toContext(childUri, services=services)
+                                      for childUri in set(childUris.get(contextUri, [])))
+
+    children = {}
+    for context, childNames in names.items():
+        level = context.__childType__.label().lower()
+        children[context] = sorted(set(getattr(name, level) for name in childNames if getattr(name, level) is not None),
+                                   key=lambda x: x.name)
+    return children
+
+
+def findChildren(contexts, concurrency=None, **findChildrenKwargs):
+    """ Blocking version of findChildren_async, for Maya callers that need the children straight away
+
+        Returns:
+            list with the list of child contexts of each context
+    """
+    return findChildren_async(contexts, concurrency, **findChildrenKwargs).result()
+
+
+def findChildren_async(contexts, concurrency=None, **findChildrenKwargs):
+    """ Finds the children of many contexts, e.g. the shots of every scene of a job, with
+        several service queries in flight instead of one round trip after the other
+
+        Arguments:
+            contexts: list of Job, Scene or Shot instances
+            concurrency: queries in flight at once, defaults to _FIND_CHILDREN_CONCURRENCY
+            findChildrenKwargs: passed on to each findChildren call
+
+        Returns:
+            save.tasks.Future whose result is the list of child contexts of each context, in order
+    """
+    return _tasks.map_async(lambda context: context.findChildren(**findChildrenKwargs), contexts,
+                            concurrency or _FIND_CHILDREN_CONCURRENCY)
+
+
 def validateContext(context):
     """ Validates that a context object is valid
 
@@ -575,20 +685,35 @@ def validateContext(context):
         Returns:
             True if the context exists, False otherwise
     """
-    if not isinstance(context, (Facility, Job, Scene, Shot)):
-        raise ValueError('Invalid argument type: %r, context object expected' % (type(context),))
+    return validateContexts([context])[0]
 
-    contextUri = URIFactory.fromContext(context)
 
+def validateContexts(contexts):
+    """ Validates many context objects with a single service call for the ones not already cached
 
-    services = context.service
-    valid = Services.validateContext(contextUri)
-
-    # Only cache valid contexts, since invalid ones can become valid at any time
-    if valid:
-        return _validContextsCache.setdefault(contextUri, valid)
+        Arguments:
+            contexts: list of Facility, Job, Scene or Shot instances to be validated
 
-    return valid
+        Returns:
+            list of booleans, True where the context exists
+    """
+    for context in contexts:
+        if not isinstance(context, (Facility, Job, Scene, Shot)):
+            raise ValueError('Invalid argument type: %r, context object expected' % (type(context),))
+
+    contextUris = [URIFactory.fromContext(context) for context in contexts]
+    results = [_validContextsCache.get(contextUri) for contextUri in contextUris]
+
+    uncached = [contextUri for contextUri, valid in zip(contextUris, results) if valid is None]
+    if uncached:
+        answers = dict(zip(uncached, Services.validateContexts(uncached)))
+        for contextUri, valid in answers.items():
+            _validContextsCache.set(contextUri, bool(valid),
+                                    ttl=_VALID_CONTEXT_TTL if valid else _INVALID_CONTEXT_TTL)
+        results = [answers[contextUri] if valid is None else valid
+                   for contextUri, valid in zip(contextUris, results)]
+
+    return [bool(valid) for valid in results]
 
 
 def URIFactory(object):
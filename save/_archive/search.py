@@ -1,5 +1,7 @@
 """ Searching the store
 """
+import time as _time
+
 from mpc.logging import getLogger as _getLogger
 
 from mpc.tessa import exceptions, contexts
@@ -12,6 +14,66 @@ from mpc.tessa._core.utils import streamUtils as _streamUtils
 
 _log = _getLogger()
 
+# Marks a findAssetPages cursor that resumes a page part way through
+_PARTIAL_PAGE = 'partial:'
+
+class SearchStats(object):
+	""" Counters and per phase timings of a search.  Passing one to findAssets also collects the entries
+		that could not be turned into an Asset instead of logging each of them.
+
+		Usage:
+			stats = SearchStats()
+			assets = list(findAssets(context, assetType='model', recursive=True, stats=stats))
+			stats.skipped, stats.errors, stats.asDict()
+	"""
+
+	def __init__(self, maxErrors=100):
+		"""
+			Args:
+				maxErrors (int): most errors kept in `errors`, every skipped entry is still counted
+		"""
+		self.maxErrors = maxErrors
+		self.serviceCalls = 0
+		self.serviceSeconds = 0.0
+		self.expandSeconds = 0.0
+		self.constructSeconds = 0.0
+		self.records = 0
+		self.found = 0
+		self.skipped = 0
+		self.errors = []
+
+	def addError(self, record, exc):
+		""" Counts a skipped record, keeping (record, exception) while there is room
+		"""
+		self.skipped += 1
+		if len(self.errors) < self.maxErrors:
+			self.errors.append((record, exc))
+
+	def asDict(self):
+		""" Returns the counters and timings, e.g. to log them or print them as JSON
+		"""
+		return {'serviceCalls': self.serviceCalls, 'serviceSeconds': self.serviceSeconds,
+				'expandSeconds': self.expandSeconds, 'constructSeconds': self.constructSeconds,
+				'records': self.records, 'found': self.found, 'skipped': self.skipped}
+
+	def __repr__(self):
+		return 'SearchStats(%s)' % ', '.join('%s=%r' % item for item in sorted(self.asDict().items()))
+
+def _timedExpand(records, stats):
+	""" Expands the service's records, adding the time spent to stats.expandSeconds
+	"""
+	expanded = iter(_hierarchyUtils.expandAssets(records))
+	while True:
+		start = _time.time()
+		try:
+			record = next(expanded)
+		except StopIteration:
+			stats.expandSeconds += _time.time() - start
+			return
+		stats.expandSeconds += _time.time() - start
+		stats.records += 1
+		yield record
+
 def _validateAndFormatNames(assetName):
 	""" the find functions require that the assetName be a list and be valid
 	"""
@@ -26,7 +88,7 @@ def _validateAndFormatNames(assetName):
 	return assetName
 
 def findAssets(context, assetType=None, name=None, stream=None, filterTypeGroups=None, recursive=False,
-			allowMissing=False):
+			allowMissing=False, pageSize=None, cursor=None, maxResults=None, stats=None, compact=False):
 	""" Find assets in the store.
 
 		Args:
@@ -47,11 +109,108 @@ def findAssets(context, assetType=None, name=None, stream=None, filterTypeGroups
 			allowMissing (bool): determines if asset types unknown to Tessa can be returned.
 				Default: False
 
+			pageSize (int): fetch the results this many at a time, see findAssetPages.  The first Asset
+				is yielded as soon as the first page arrives and only one page is held in memory.
+				Default: None, fetches everything in one call
+
+			cursor (str): resume a paged search from the cursor of a page returned by findAssetPages
+
+			maxResults (int): stop after this many assets, the service is never asked for more records than
+				are still needed, see findAssetPages
+
+			stats (SearchStats): collects per phase timings, counters and the entries that could not be
+				turned into an Asset.  Without it those entries are logged and skipped
+
+			compact (bool): yield asset.AssetRecord instances built straight from the service's records
+				instead of full Assets, for searches returning many thousands of results.  Each context is
+				resolved once per search and each asset type once per context level.
+				Default: False
+
 
 		Returns:
-			generator of store.Asset instances
+			generator of store.Asset instances, or asset.AssetRecord instances when compact
 	"""
+	if pageSize is None and cursor is None and maxResults is None:
+		results = _findAssetRecords(context, assetType, name, stream, filterTypeGroups, recursive, allowMissing,
+									stats=stats)
+		for asset in _toAssets(context, results, allowMissing, stats, compact=compact):
+			yield asset
+		return
+
+	for assets, _ in findAssetPages(context, assetType, name, stream, filterTypeGroups, recursive, allowMissing,
+									pageSize=pageSize or maxResults, cursor=cursor, maxResults=maxResults,
+									stats=stats, compact=compact):
+		for asset in assets:
+			yield asset
+
+def findAssetPages(context, assetType=None, name=None, stream=None, filterTypeGroups=None, recursive=False,
+			allowMissing=False, pageSize=500, cursor=None, maxResults=None, stats=None, compact=False):
+	""" Find assets in the store one page at a time, asking the service for at most pageSize records per call
+
+		The service's records are expanded into one asset per component, so a page can hold more assets than
+		pageSize.  Every asset of a page is returned with it, unless maxResults cuts the page short: the cursor
+		returned with that page then resumes with the rest of the page instead of skipping it.
+
+		Args:
+			context, assetType, name, stream, filterTypeGroups, recursive, allowMissing, stats, compact: see findAssets
+
+			pageSize (int): records requested per service call.
+				Default: 500
 
+			cursor (str): cursor of a previous page to continue from, None starts at the beginning
+
+			maxResults (int): stop after this many assets, the last request only asks for what is left
+
+		Returns:
+			generator of ([store.Asset], nextCursor) tuples, nextCursor is None on the last page
+	"""
+	pageSize = pageSize or 500
+	remaining = maxResults
+	resolved = {}
+	cursor, limit, skip = _splitCursor(cursor)
+	while remaining is None or remaining > 0:
+		pageCursor = cursor
+		limit = limit or (pageSize if remaining is None else min(pageSize, remaining))
+		records, cursor = _findAssetRecords(context, assetType, name, stream, filterTypeGroups, recursive,
+											allowMissing, limit=limit, cursor=pageCursor, stats=stats)
+		records = list(records)
+		assets = []
+		for used in xrange(skip, len(records)):
+			if remaining is not None and len(assets) >= remaining:
+				# the rest of the page is asked for again, with the same limit, when resuming
+				yield assets, _joinCursor(pageCursor, limit, used)
+				return
+			assets.extend(_toAssets(context, records[used:used + 1], allowMissing, stats, compact=compact,
+									resolved=resolved))
+		if remaining is not None:
+			remaining -= len(assets)
+		yield assets, cursor
+		if cursor is None:
+			return
+		limit = skip = 0
+
+def _joinCursor(cursor, limit, skip):
+	""" Cursor resuming a page part way through: the page is requested again from the service's cursor, with the
+		same limit so it holds the same records, and its first `skip` records are passed over
+	"""
+	return '%s%d:%d:%s' % (_PARTIAL_PAGE, limit, skip, cursor or '')
+
+def _splitCursor(cursor):
+	""" Returns the (service cursor, limit, skip) of a cursor handed out by findAssetPages, limit and skip are
+		0 unless it resumes a page part way through, see _joinCursor
+	"""
+	if not cursor or not cursor.startswith(_PARTIAL_PAGE):
+		return cursor, 0, 0
+	limit, skip, cursor = cursor[len(_PARTIAL_PAGE):].split(':', 2)
+	return cursor or None, int(limit), int(skip)
+
+def _findAssetRecords(context, assetType, name, stream, filterTypeGroups, recursive, allowMissing, limit=None,
+					cursor=None, stats=None):
+	""" Validates the search and asks the service for the matching records
+
+		With a limit or cursor one page is requested from asset.findAssetsPage and
+		(records, nextCursor) is returned, otherwise the full record list from asset.findAssets
+	"""
 	if isinstance(context, contexts.Facility) and recursive:
 		raise exceptions.TessaException("Recursive search is not available for Facility level contexts")
 
@@ -63,34 +222,64 @@ def findAssets(context, assetType=None, name=None, stream=None, filterTypeGroups
 	if name is not None:
 		name = _validateAndFormatNames(name)
 
-	# Get the list of assets from the service
-	# The results from asset.findAssets is processed by hierarchyUtils.compressAssets() in order
+	# The results from asset.findAssets are processed by hierarchyUtils.compressAssets() in order
 	# to group each component efficiently
-	results = _hierarchyUtils.expandAssets(
-		context.services.asset.findAssets(
-			_uri.fromContext(context),
-			assetType,
-			name,
-			serialisationUtils.serialiseStream(stream),
-			filterTypeGroups,
-			recursive,
-			allowMissing
-		)
-	)
-
-	# Return Asset objects for each asset found
-	for assetContext, _, assetType, assetName in results:
+	arguments = (_uri.fromContext(context), assetType, name, serialisationUtils.serialiseStream(stream),
+				 filterTypeGroups, recursive, allowMissing)
+	paged = limit is not None or cursor is not None
+	start = _time.time()
+	if paged:
+		records, nextCursor = context.services.asset.findAssetsPage(*arguments, limit=limit, cursor=cursor)
+	else:
+		records = context.services.asset.findAssets(*arguments)
+	if stats is not None:
+		stats.serviceCalls += 1
+		stats.serviceSeconds += _time.time() - start
+		expanded = _timedExpand(records, stats)
+	else:
+		expanded = _hierarchyUtils.expandAssets(records)
+	return (expanded, nextCursor) if paged else expanded
+
+def _toAssets(context, results, allowMissing, stats=None, compact=False, resolved=None):
+	""" Return Asset objects for each asset record found, skipping the ones that can't be built
+
+		With compact, asset.AssetRecord objects are returned instead.  The contexts they are built on are kept
+		in `resolved`, by the record's context, so every context is only looked up once per search.  Unless
+		allowMissing, the asset type is checked against the context level like a full Asset checks it, so the
+		same records are skipped either way.
+	"""
+	resolved = {} if resolved is None else resolved
+	for record in results:
+		assetContext, _, assetType, assetName = record
+		start = _time.time()
 		try:
 			resultName, resultStream = _streamUtils.splitAssetNameForStream(assetName)
-			yield _asset.Asset(
-				_uri.toContext(assetContext, services=context.services),
-				assetType,
-				resultName,
-				stream=resultStream,
-				delayLoad=allowMissing,
-			)
+			if compact:
+				if assetContext not in resolved:
+					resolved[assetContext] = _uri.toContext(assetContext, services=context.services)
+				if not allowMissing:
+					_asset.getAssetTypeObject(resolved[assetContext], assetType)
+				asset = _asset.AssetRecord(resolved[assetContext], assetType, resultName, stream=resultStream)
+			else:
+				asset = _asset.Asset(
+					_uri.toContext(assetContext, services=context.services),
+					assetType,
+					resultName,
+					stream=resultStream,
+					delayLoad=allowMissing,
+				)
 		except Exception, exc:
-			print str(exc)
+			asset = None
+			if stats is None:
+				_log.warning('Skipping asset %s: %s', assetName, exc)
+			else:
+				stats.addError(record, exc)
+
+		if stats is not None:
+			stats.constructSeconds += _time.time() - start
+			stats.found += asset is not None
+		if asset is not None:
+			yield asset
 
 def findVersionsOfAssets(context, assetType=None, name=None, stream=None, filterTypeGroups=None,
 							recursive=False, filterAttributes=None,
@@ -9,9 +9,90 @@ __author__ = "Andres Weber"
 __email__ = "andresmweber@gmail.com"
 __version__ = 1.0
 #mpcSave_contextManager
+import collections
+import imp
+import os
+import sys
+import types
 import unittest
 #from save import context
 
+Named = collections.namedtuple('Named', ['name'])
+
+
+class FoundContext(object):
+    """ What uri.toContext gives back for a 'job/scene/shot' uri, only the levels findChildren reads
+    """
+    def __init__(self, uri):
+        levels = uri.split('/') + [None, None]
+        self.scene = Named(levels[1]) if levels[1] else None
+        self.shot = Named(levels[2]) if levels[2] else None
+
+
+class FakeUri(object):
+    @staticmethod
+    def fromContext(context):
+        return '/'.join(level for level in (context._job, context._scene, context._shot) if level)
+
+    @staticmethod
+    def toContext(uri, services=None):
+        return FoundContext(uri)
+
+
+class FakeAssetService(object):
+    """ Child contexts with releases, as {uri: [(child uri, assetType)]}
+    """
+    def __init__(self, releases):
+        self.releases = releases
+
+    def findChildContexts(self, uri, assetGroupFilter, assetTypeFilter, recursive):
+        return [(child, assetType) for child, assetType in self.releases.get(uri, [])
+                if assetTypeFilter is None or assetType == assetTypeFilter]
+
+    def findChildContextsBatch(self, uris, assetGroupFilter, assetTypeFilter, recursive):
+        return dict((uri, self.findChildContexts(uri, assetGroupFilter, assetTypeFilter, recursive)) for uri in uris)
+
+
+class FakeContextService(object):
+    """ Child contexts on disc, as {uri: [child uri]}
+    """
+    def __init__(self, folders):
+        self.folders = folders
+
+    def findScenes(self, uri):
+        return list(self.folders.get(uri, []))
+
+    findShots = findScenes
+
+    def findScenesBatch(self, uris):
+        return dict((uri, self.findScenes(uri)) for uri in uris)
+
+    findShotsBatch = findScenesBatch
+
+
+def _loadContext():
+    """ context.py needs mpc and uses Asset and _uri without importing them, so its source is run in a new
+        module that already has fakes for those
+    """
+    fakes = {'mpc': types.ModuleType('mpc'), 'mpc.logging': types.ModuleType('mpc.logging')}
+    fakes['mpc.logging'].getLogger = lambda *args: None
+    fakes['mpc'].logging = fakes['mpc.logging']
+    originals = dict((name, sys.modules.get(name)) for name in fakes)
+    sys.modules.update(fakes)
+    try:
+        module = imp.new_module('context')
+        module.Asset = object
+        module._uri = FakeUri
+        source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'context.py')
+        exec compile(open(source).read(), source, 'exec') in module.__dict__
+    finally:
+        for name, original in originals.items():
+            if original is None:
+                sys.modules.pop(name)
+            else:
+                sys.modules[name] = original
+    return module
+
 class TestModel(unittest.TestCase):
     def setUp(self):
         self.fixtures=[]
@@ -24,5 +105,37 @@ class TestModel(unittest.TestCase):
     def test_context(self):
         self.assertEqual(1,1)
 
+
+class TestFindChildrenBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.context = _loadContext()
+        self.services = type('Services', (object,), {})()
+        self.services.asset = FakeAssetService({
+            'macys': [('macys/s01', 'model'), ('macys/s02', 'rig')],
+            'macys/s01': [('macys/s01/sh2', 'model'), ('macys/s01/sh3', 'rig')]})
+        self.services.context = FakeContextService({
+            'macys': ['macys/s01', 'macys/s03'],
+            'macys/s01': ['macys/s01/sh1', 'macys/s01/sh2']})
+
+    def _make(self, contextType, job, scene=None):
+        found = contextType.__new__(contextType)
+        found._AbstractContext__services = self.services
+        found._facility, found._job, found._scene, found._shot = 'mpc', job, scene, None
+        return found
+
+    def testFindChildrenBatch_matches_findChildren(self):
+        contexts = [self._make(self.context.Job, 'macys'), self._make(self.context.Scene, 'macys', 's01')]
+        for withReleases in (False, True):
+            for assetTypeFilter in (None, 'model'):
+                batched = self.context.findChildrenBatch(contexts, withReleases=withReleases,
+                                                         assetTypeFilter=assetTypeFilter)
+                for found in contexts:
+                    self.assertEqual(batched[found], found.findChildren(withReleases=withReleases,
+                                                                        assetTypeFilter=assetTypeFilter))
+        batched = self.context.findChildrenBatch(contexts, assetTypeFilter='model')
+        self.assertEqual([scene.name for scene in batched[contexts[0]]], ['s01', 's02', 's03'])
+        self.assertEqual([shot.name for shot in batched[contexts[1]]], ['sh1', 'sh2', 'sh3'])
+
 if __name__ == '__main__':
     unittest.main()
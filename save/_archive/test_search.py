@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+    :module: test_search
+    :platform: None
+    :synopsis: This module tests the paging, compact results and stats of search.py against a fake asset service
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import collections
+import unittest
+import search
+
+FakeAsset = collections.namedtuple('FakeAsset', ['context', 'assetType', 'name'])
+FakeRecord = collections.namedtuple('FakeRecord', ['context', 'assetType', 'name', 'stream'])
+
+
+class FakeAssetService(object):
+    """ Serves compressed (context, uri, assetType, [names]) records a page at a time, like asset.findAssetsPage
+    """
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def findAssets(self, *arguments):
+        self.calls.append(None)
+        return list(self.records)
+
+    def findAssetsPage(self, *arguments, **kwargs):
+        self.calls.append(kwargs['limit'])
+        start = int(kwargs['cursor'] or 0)
+        end = start + kwargs['limit']
+        return self.records[start:end], str(end) if end < len(self.records) else None
+
+
+class FakeContext(object):
+    def __init__(self, records):
+        self.services = type('Services', (object,), {})()
+        self.services.asset = FakeAssetService(records)
+
+
+def _fakeAsset(context, assetType, name, stream=None, delayLoad=False):
+    if name.startswith('bad'):
+        raise ValueError('no such asset type')
+    return FakeAsset(context, assetType, name)
+
+
+def _fakeAssetRecord(context, assetType, name, stream=None):
+    return FakeRecord(context, assetType, name, stream)
+
+
+class SearchTestCase(unittest.TestCase):
+    """ Patches the tessa helpers search.py uses with fakes and searches a FakeContext
+    """
+
+    def setUp(self):
+        # every record expands to one asset per name, the way hierarchyUtils.expandAssets splits components
+        self.patched = {'_hierarchyUtils': type('H', (object,), {'expandAssets': staticmethod(
+                            lambda records: [(context, uri, assetType, name)
+                                             for context, uri, assetType, names in records for name in names])}),
+                        '_uri': type('U', (object,), {'fromContext': staticmethod(lambda context: 'uri'),
+                                                      'toContext': staticmethod(self._toContext)}),
+                        '_streamUtils': type('S', (object,), {'splitAssetNameForStream': staticmethod(
+                            lambda name: (name, None))}),
+                        '_asset': type('A', (object,), {'Asset': staticmethod(_fakeAsset),
+                                                        'AssetRecord': staticmethod(_fakeAssetRecord),
+                                                        'getAssetTypeObject': staticmethod(self._assetTypeObject)}),
+                        'serialisationUtils': type('Z', (object,), {'serialiseStream': staticmethod(
+                            lambda stream: stream)}),
+                        'contexts': type('C', (object,), {'Facility': type('Facility', (object,), {})})}
+        self.originals = dict((name, getattr(search, name)) for name in self.patched)
+        for name, value in self.patched.items():
+            setattr(search, name, value)
+        self.lookups = []
+        self.context = FakeContext([('shot', 'uri', 'model', ['char_santa', 'char_santa_hair']),
+                                    ('shot', 'uri', 'model', ['prop_sleigh']),
+                                    ('shot', 'uri', 'rig', ['char_santa', 'char_santa_hair', 'char_santa_hat']),
+                                    ('shot', 'uri', 'rig', ['prop_sleigh'])])
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(search, name, value)
+
+    def _toContext(self, uri, services=None):
+        self.lookups.append(uri)
+        return uri
+
+    def _assetTypeObject(self, context, assetType):
+        if assetType == 'unknown':
+            raise ValueError('no such asset type')
+        return assetType
+
+    def _names(self, assets):
+        return [(asset.assetType, asset.name) for asset in assets]
+
+
+class TestFindAssetPages(SearchTestCase):
+
+    def testFindAssetPages_keeps_expanded_assets(self):
+        pages = list(search.findAssetPages(self.context, pageSize=2))
+        self.assertEqual([len(assets) for assets, _ in pages], [3, 4])
+        self.assertEqual([cursor for _, cursor in pages], ['2', None])
+        self.assertEqual(self.context.services.asset.calls, [2, 2])
+
+    def testFindAssetPages_maxResults_resumes_the_page(self):
+        stats = search.SearchStats()
+        (first, cursor), = search.findAssetPages(self.context, pageSize=2, maxResults=2, stats=stats)
+        self.assertEqual(self._names(first), [('model', 'char_santa'), ('model', 'char_santa_hair')])
+        self.assertEqual(stats.found, 2)
+        rest = [asset for assets, _ in search.findAssetPages(self.context, pageSize=2, cursor=cursor)
+                for asset in assets]
+        self.assertEqual(self._names(first + rest), self._names(search.findAssets(self.context)))
+        self.assertEqual(len(rest), 5)
+
+    def testFindAssets_maxResults_limits_the_service(self):
+        assets = list(search.findAssets(self.context, maxResults=4))
+        self.assertEqual(len(assets), 4)
+        self.assertEqual(self.context.services.asset.calls, [4])
+
+    def testFindAssets_compact_yields_records(self):
+        records = list(search.findAssets(self.context, compact=True))
+        self.assertEqual(self._names(records), self._names(search.findAssets(self.context)))
+        self.assertEqual(set(type(record) for record in records), set([FakeRecord]))
+        self.assertEqual(records[0], FakeRecord('shot', 'model', 'char_santa', None))
+
+    def testFindAssets_compact_resolves_each_context_once(self):
+        self.context.services.asset.records.append(('seq', 'uri', 'model', ['env_city']))
+        records = list(search.findAssets(self.context, compact=True, pageSize=2))
+        self.assertEqual(len(records), 8)
+        self.assertEqual(self.lookups, ['shot', 'seq'])
+
+    def testFindAssets_compact_skips_unknown_asset_types(self):
+        self.context.services.asset.records.append(('shot', 'uri', 'unknown', ['env_city']))
+        stats = search.SearchStats()
+        records = list(search.findAssets(self.context, compact=True, stats=stats))
+        self.assertEqual(len(records), 7)
+        self.assertEqual(stats.skipped, 1)
+        missing = list(search.findAssets(self.context, compact=True, allowMissing=True))
+        self.assertEqual(missing[-1], FakeRecord('shot', 'unknown', 'env_city', None))
+
+
+class TestSearchStats(SearchTestCase):
+
+    def setUp(self):
+        super(TestSearchStats, self).setUp()
+        self.context.services.asset.records.append(('shot', 'uri', 'model', ['bad_one', 'bad_two', 'bad_three']))
+
+    def testSearchStats_counts_records(self):
+        stats = search.SearchStats()
+        assets = list(search.findAssets(self.context, stats=stats))
+        self.assertEqual(len(assets), 7)
+        self.assertEqual((stats.serviceCalls, stats.records, stats.found, stats.skipped), (1, 10, 7, 3))
+        self.assertEqual([record[3] for record, _ in stats.errors], ['bad_one', 'bad_two', 'bad_three'])
+
+    def testSearchStats_counts_every_page(self):
+        stats = search.SearchStats()
+        list(search.findAssets(self.context, pageSize=2, stats=stats))
+        self.assertEqual((stats.serviceCalls, stats.records, stats.found, stats.skipped), (3, 10, 7, 3))
+
+    def testSearchStats_caps_errors(self):
+        stats = search.SearchStats(maxErrors=2)
+        list(search.findAssets(self.context, stats=stats))
+        self.assertEqual(stats.skipped, 3)
+        self.assertEqual(len(stats.errors), 2)
+        self.assertTrue(all(isinstance(exc, ValueError) for _, exc in stats.errors))
+
+    def testSearchStats_asDict(self):
+        stats = search.SearchStats()
+        list(search.findAssets(self.context, stats=stats))
+        summary = stats.asDict()
+        self.assertEqual(sorted(summary), ['constructSeconds', 'expandSeconds', 'found', 'records', 'serviceCalls',
+                                           'serviceSeconds', 'skipped'])
+        self.assertEqual((summary['records'], summary['found'], summary['skipped']), (10, 7, 3))
+        self.assertTrue(all(summary[key] >= 0 for key in ('constructSeconds', 'expandSeconds', 'serviceSeconds')))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+    :module: assettypes
+    :platform: None
+    :synopsis: This module caches the Tessa asset type definitions the asset and search modules look up
+    :plans:
+    Resolving an asset type asks the definition manager, which is slow and gives the same answer for every
+    asset of a context level.  Definitions are kept per (context level, asset type) for the whole process,
+    types unknown to Tessa expire sooner in case their definition gets added.  Kept apart from _archive/asset.py
+    so it imports without the studio stack, definitions and exceptions are None when mpc isn't installed.
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import logging
+
+# Project Imports
+import cache
+try:
+    from mpc.tessa import definitions, exceptions
+except ImportError:
+    definitions = exceptions = None
+
+_log = logging.getLogger(__name__)
+
+_assetTypeCache = cache.LRUCache(maxsize=1024)
+_MISSING_ASSET_TYPE_TTL = 60
+
+
+class _MissingAssetType(object):
+    """ Minimal definition standing in for asset types unknown to Tessa
+    """
+    assetTypeGroup = None
+
+
+def getAssetTypeObject(context, assetType):
+    """ Resolves an asset type through the definition manager, once per context level and asset type
+    Args:
+        context: context the asset lives in, only its level (Job, Scene, Shot...) is part of the cache key
+        assetType (str): asset type name
+    Returns (object): the definition object, _MissingAssetType for types unknown to Tessa
+    """
+    key = (type(context).__name__, assetType)
+    assetTypeObj = _assetTypeCache.get(key)
+    if assetTypeObj is None:
+        try:
+            # Coerce the assetType into an object
+            assetTypeObj = definitions.getDefinitionObject(context, assetType)
+
+            # Check asset type is compatible with our context
+            definitions.checkAssetTypeForContext(assetTypeObj, context)
+            _assetTypeCache.set(key, assetTypeObj)
+
+        except exceptions.AssetTypeNotFound:
+            # Instantiate the missing asset types with the minimal definition 'MissingAssetType'
+            assetTypeObj = _MissingAssetType
+            _log.warn("Could not find asset definition for child of asset type %r.", assetType)
+            _assetTypeCache.set(key, assetTypeObj, ttl=_MISSING_ASSET_TYPE_TTL)
+    return assetTypeObj
+
+
+def invalidateAssetTypes(assetType=None):
+    """ Forgets cached asset type definitions, e.g. after the definitions were edited
+    Args:
+        assetType (str): only forget this asset type, None forgets every type
+    """
+    if assetType is None:
+        _assetTypeCache.clear()
+        return
+    for key in [key for key in _assetTypeCache.keys() if key[1] == assetType]:
+        _assetTypeCache.pop(key)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+    :module: audit
+    :platform: None
+    :synopsis: This module checks the saved versions of a job for non-conforming names, version gaps, duplicates
+               and archived versions that can no longer be rebuilt
+    :plans:
+    Listing folders on the file server is what takes the time, so scenes are listed and discipline folders are
+    audited by a pool of threads (tasks.imap_unordered) while the results are consumed.  Each discipline folder is
+    read and parsed as one batch and only its issues are kept, so memory stays flat on jobs with millions of files.
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import collections
+import os
+import time
+
+# Project Imports
+import delta
+import index
+import model
+import tasks
+
+# One problem found by JobAudit.  versions are the missing or duplicated version numbers, paths the files involved,
+# for a broken_chain the archived version and the missing base.  An unreadable folder is one that couldn't be listed
+Issue = collections.namedtuple('Issue', ['kind', 'folder', 'description', 'discipline', 'versions', 'paths'])
+
+# What auditing one discipline folder found: files is every file listed, scene_files those with an audited extension
+FolderReport = collections.namedtuple('FolderReport', ['folder', 'files', 'scene_files', 'issues'])
+
+
+class AuditStats(object):
+    """ Running totals of a JobAudit, updated from the consuming thread only
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.folders = 0
+        self.files = 0
+        self.scene_files = 0
+        self.issues = collections.Counter()
+
+    def add(self, report):
+        self.folders += 1
+        self.files += report.files
+        self.scene_files += report.scene_files
+        self.issues.update(issue.kind for issue in report.issues)
+
+    def elapsed(self):
+        """ Returns (float): seconds since the audit started, up to when it finished
+        """
+        return (self.finished or time.time()) - self.started
+
+    def as_dict(self):
+        """ Returns (dict): the totals along with files audited per second
+        """
+        elapsed = self.elapsed()
+        return {'folders': self.folders, 'files': self.files, 'scene_files': self.scene_files,
+                'issues': dict(self.issues), 'seconds': round(elapsed, 3),
+                'files_per_second': round(self.files / elapsed, 1) if elapsed else None}
+
+
+class JobAudit(object):
+    """ Finds the scene files of a job whose names don't follow config['path']['template_string'] and the
+        versions missing or saved twice for each description/discipline of a discipline folder
+        Issues are yielded folder by folder as the folders finish, not in tree order.  Non-conforming files
+        are left out of the gap and duplicate checks, folders that can't be listed are reported as unreadable.
+    Usage:
+        a = JobAudit.from_config(model.config, '/jobs/macysSanta_5403623')
+        for issue in a.run():
+            print issue.kind, issue.folder, issue.versions
+        a.stats.as_dict()
+    """
+
+    def __init__(self, job_folder, workers=16, extensions=('ma', 'mb'), name_re=None, parser=None):
+        """ init
+        Args:
+            job_folder (str): e.g. /jobs/macysSanta_5403623
+            workers (int): folders listed at once
+            extensions [str]: scene file extensions to audit, anything else is counted but skipped
+            name_re (re.RegexObject): regex conforming names match, defaults to model.get_filename_regex(extensions)
+            parser (model.FilenameParser): parser reading versions, defaults to model.get_filename_parser()
+        """
+        self.job_folder = job_folder
+        self.workers = workers
+        self.extensions = frozenset(extension.lower() for extension in extensions)
+        self.parser = parser or model.get_filename_parser()
+        self.name_re = name_re or model.get_filename_regex(self.extensions)
+        self.stats = AuditStats()
+
+    @classmethod
+    def from_config(cls, config_in, job_folder, workers=None):
+        """ Builds an audit from the [audit] section of a config dictionary, names are checked against
+            model.get_filename_regex
+        Args:
+            config_in (dict): config dictionary following config.ini
+            job_folder (str): job to audit
+            workers (int): overrides config['audit']['workers']
+        Returns (JobAudit): new audit
+        """
+        audit_config = config_in['audit']
+        extensions = audit_config['extensions']
+        if isinstance(extensions, basestring):
+            extensions = [extensions]
+        return cls(job_folder, workers=int(workers or audit_config['workers']), extensions=extensions)
+
+    def run(self):
+        """ Audits every discipline folder of the job
+        Returns (generator): Issue for every problem found, self.stats is complete once it is exhausted
+        """
+        self.stats = AuditStats()
+        unreadable = []
+        folders = (folder for _, _, folder in self.discipline_folders(unreadable))
+        for report in tasks.imap_unordered(self.audit_folder, folders, concurrency=self.workers):
+            self.stats.add(report)
+            for issue in report.issues:
+                yield issue
+        for folder in sorted(unreadable):
+            issue = Issue('unreadable', folder, None, None, [], [])
+            self.stats.issues[issue.kind] += 1
+            yield issue
+        self.stats.finished = time.time()
+
+    def discipline_folders(self, unreadable=None):
+        """ Lists the discipline folders of every shot, a scene at a time on the worker threads,
+            skipping config['map'] ignored scenes and shots
+        Args:
+            unreadable (list): the job, scene and shot folders that couldn't be listed are appended to it
+        Returns (generator): (scene, shot, folder) tuples, scene by scene as they are listed
+        """
+        folders = sorted(set(model.SaveData.get_discipline_folder(discipline)
+                             for discipline in model.config['discipline_LUT']))
+        shot_ignore_list = model.config['map']['shot_ignore_list']
+
+        def list_scene(scene):
+            found = []
+            scene_folder = os.path.join(self.job_folder, scene)
+            for shot in _list_folders(scene_folder, shot_ignore_list, unreadable):
+                for folder in folders:
+                    path = os.path.join(scene_folder, shot, folder)
+                    if os.path.isdir(path):
+                        found.append((scene, shot, path))
+            return found
+
+        scenes = _list_folders(self.job_folder, model.config['map']['scene_ignore_list'], unreadable)
+        for found in tasks.imap_unordered(list_scene, scenes, concurrency=self.workers):
+            for entry in found:
+                yield entry
+
+    def audit_folder(self, folder):
+        """ Reads a discipline folder and its user folders (including versions archived by the delta module)
+            and checks its scene files' names and versions, and that every archived version can be rebuilt
+        Returns (FolderReport): counts and issues of the folder
+        """
+        try:
+            version_index = index.VersionIndex(self.parser, folder).scan()
+        except OSError:
+            return FolderReport(folder, 0, 0, [Issue('unreadable', folder, None, None, [], [])])
+        files, scene_files, issues, user_folders = 0, 0, [], set()
+        for description, discipline in sorted(set(key[:2] for key in version_index.keys())):
+            by_version = collections.OrderedDict()
+            for version, _, path in version_index.files(description, discipline):
+                files += 1
+                user_folders.add(os.path.dirname(path))
+                filename = os.path.basename(path)
+                if os.path.splitext(filename)[1][1:].lower() not in self.extensions:
+                    continue
+                scene_files += 1
+                if not self.name_re.match(filename):
+                    issues.append(Issue('nonconforming', folder, description, discipline, [version], [path]))
+                    continue
+                by_version.setdefault(version, []).append(path)
+            if not by_version:
+                continue
+            versions = by_version.keys()
+            missing = sorted(set(range(versions[0], versions[-1] + 1)) - set(versions))
+            if missing:
+                issues.append(Issue('gap', folder, description, discipline, missing, []))
+            for version, paths in by_version.items():
+                if len(paths) > 1:
+                    issues.append(Issue('duplicate', folder, description, discipline, [version], sorted(paths)))
+        for user_folder in sorted(user_folders):
+            for name, base in delta.broken_chains(user_folder):
+                parsed = self.parser.parse(name)
+                issues.append(Issue('broken_chain', folder, parsed.description, parsed.discipline, [parsed.version],
+                                    [os.path.join(user_folder, name), os.path.join(user_folder, base)]))
+        return FolderReport(folder, files, scene_files, issues)
+
+
+def audit_job(job_folder, workers=None):
+    """ Audits a job with the config.ini settings, see JobAudit
+    Returns (generator): Issue for every problem found
+    """
+    return JobAudit.from_config(model.config, job_folder, workers=workers).run()
+
+
+def _list_folders(folder, ignore, unreadable=None):
+    """ Returns [str]: sorted names of the visible subfolders of folder that aren't in ignore, none if folder
+        can't be listed, in which case it is appended to unreadable
+    """
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        if unreadable is not None:
+            unreadable.append(folder)
+        return []
+    return sorted(name for name in names if not name.startswith('.') and name not in ignore and
+                  os.path.isdir(os.path.join(folder, name)))
@@ -0,0 +1,6 @@
+"""
+    :module: benchmark
+    :platform: None
+    :synopsis: This package contains the performance benchmarks for the save package
+    :plans:
+"""
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+    :module: fixtures
+    :platform: None
+    :synopsis: This module builds synthetic job trees and scene files for the benchmarks and tests
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+import contextlib
+import os
+import random
+import shutil
+import tempfile
+
+from save import model
+from save import services
+
+# scenes: scenes per job, shots: shots per scene, files: saved files per shot, jobs: sibling jobs on the server
+SIZES = {
+    'small':  {'scenes': 5,   'shots': 5,  'files': 10, 'jobs': 50},
+    'medium': {'scenes': 50,  'shots': 20, 'files': 20, 'jobs': 500},
+    'huge':   {'scenes': 400, 'shots': 25, 'files': 10, 'jobs': 3000},
+}
+
+USERS = [('aweber', 'aw'), ('jfrank', 'jf'), ('kmorris', 'km')]
+DESCRIPTIONS = ['char_santa', 'prop_sleigh', 'env_northPole', 'char_elf_lodA', 'fx_snow']
+
+
+def make_filenames(count, seed=0):
+    """ Returns [str]: count filenames in the formats artists actually use, clean and legacy mixed together
+    """
+    rng = random.Random(seed)
+    disciplines = model.config['map']['disciplines']
+    formats = ['{d}_{D}_{v:03d}_{u}.ma',
+               '{d}_{D}_v{v:03d}_{u}.mb',
+               '{d}.v{v:03d}.ma',
+               '{d}_{D}_v{v:02d}_{u}_wip.ma',
+               '{d}_{l}_{v}_{u}.mb']
+    filenames = []
+    for _ in range(count):
+        _, user = rng.choice(USERS)
+        discipline = rng.choice(disciplines)
+        filenames.append(rng.choice(formats).format(d=rng.choice(DESCRIPTIONS), D=discipline, l=discipline.lower(),
+                                                    v=rng.randint(1, 200), u=user))
+    return filenames
+
+
+def make_scene(nodes, seed=0, renamed=()):
+    """ Returns (str): the content of a Maya ASCII scene with nodes transforms at random positions
+    Args:
+        nodes (int): number of transforms
+        seed (int): seed of the positions, the same seed gives the same scene
+        renamed [int]: numbers of the nodes whose name gets a _fix suffix, to make a small edit
+    """
+    rng = random.Random(seed)
+    lines = ['//Maya ASCII 2016 scene\n']
+    for number in range(nodes):
+        lines.append('createNode transform -n "node%d%s";\n' % (number, '_fix' if number in renamed else ''))
+        lines.append('\tsetAttr ".v" no;\n')
+        lines.append('\tsetAttr ".t" -type "double3" %f %f %f ;\n' % (rng.random(), rng.random(), rng.random()))
+    return ''.join(lines)
+
+
+def make_job_tree(server_path, job_name, scenes, shots, files, seed=0):
+    """ Creates a job on disk following config['path'] with empty scene files in per-user discipline folders
+    Args:
+        server_path (str): folder standing in for /jobs
+        job_name (str): name of the job folder
+        scenes (int): number of scenes
+        shots (int): shots per scene
+        files (int): files per shot
+    Returns (dict): {scene: [shot]} tree that was created
+    """
+    rng = random.Random(seed)
+    tree = {}
+    discipline_folders = sorted(set(model.config['discipline_LUT'].values()))
+    for scene_index in range(scenes):
+        scene_name = 'sc%03d' % scene_index
+        tree[scene_name] = []
+        for shot_index in range(shots):
+            shot_name = '%s_sh%04d' % (scene_name, shot_index * 10)
+            tree[scene_name].append(shot_name)
+            for filename in make_filenames(files, seed=rng.random()):
+                folder_name, _ = rng.choice(USERS)
+                folder = os.path.join(server_path, job_name, scene_name, shot_name, 'maya', 'scenes',
+                                      rng.choice(discipline_folders), folder_name)
+                if not os.path.isdir(folder):
+                    os.makedirs(folder)
+                open(os.path.join(folder, filename), 'w').close()
+    return tree
+
+
+@contextlib.contextmanager
+def synthetic_environment(size='small', latency=0.0, seed=0):
+    """ Builds a server folder with one full job plus empty sibling jobs, points the config at it
+        and swaps the context service for a services.MemoryContexts, restoring everything afterwards
+    Args:
+        size (str): key of SIZES
+        latency (float): seconds the context service sleeps per call
+    Returns (dict): {'server': str, 'job': str, 'tree': dict, 'contexts': services.MemoryContexts}
+    """
+    spec = SIZES[size]
+    temp_dir = tempfile.mkdtemp(prefix='mpcsave_bench_')
+    server_path = os.path.join(temp_dir, 'jobs')
+    job_name = 'benchJob_5000000'
+    tree = make_job_tree(server_path, job_name, spec['scenes'], spec['shots'], spec['files'], seed=seed)
+    for job_index in range(spec['jobs']):
+        os.makedirs(os.path.join(server_path, 'otherJob%04d_%07d' % (job_index, 5000001 + job_index)))
+
+    stub = services.MemoryContexts({job_name: tree}, latency=latency)
+    overrides = [('map', 'server', server_path.lstrip('/')),
+                 ('path', 'path_format_string', os.path.join(server_path, '{JOB}', '{SCENE}', '{SHOT}')),
+                 ('cache', 'tree_cache_dir', os.path.join(temp_dir, 'cache'))]
+    originals = [(section, option, model.config[section][option]) for section, option, _ in overrides]
+    try:
+        for section, option, value in overrides:
+            model.config[section][option] = value
+        model.set_context_service(stub)
+        yield {'server': server_path, 'job': job_name, 'tree': tree, 'contexts': stub}
+    finally:
+        model.set_context_service(None)
+        for section, option, value in originals:
+            model.config[section][option] = value
+        model._job_list_cache.clear()
+        model._version_indexes.clear()
+        model._version_histories.clear()
+        model._validation_cache.clear()
+        shutil.rmtree(temp_dir, ignore_errors=True)
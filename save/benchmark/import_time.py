@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+    :module: import_time
+    :platform: None
+    :synopsis: This module measures the cost of importing save.model in a fresh interpreter
+    :plans:
+    Usage:
+        python -m save.benchmark.import_time --runs 20
+        python -m save.benchmark.import_time --json
+        git archive ac99f1a save | tar -x -C /tmp/baseline && python -m save.benchmark.import_time --root /tmp/baseline
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Each snippet runs in its own interpreter and prints the seconds it took
+SNIPPETS = {
+    # What a Maya startup script or farm job pays just for having the package importable
+    'import': 'import save.model',
+    # What every import used to pay: the config parsed and mpc.tessa.contexts imported up front.  Checkouts
+    # from before get_config already do both when imported
+    'import_eager': ('import save.model\n'
+                     'getattr(save.model, "get_config", lambda: None)()\n'
+                     'try:\n'
+                     '    save.model.contexts.contextFactory\n'
+                     'except (ImportError, AttributeError):\n'
+                     '    pass'),
+}
+
+_TIMER = ('import time\n'
+          'start = time.time()\n'
+          '%s\n'
+          'print(time.time() - start)\n')
+
+
+def time_snippet(snippet, runs=10, python=sys.executable, package_root=None):
+    """ Times a snippet in fresh interpreters
+    Args:
+        snippet (str): python code to time
+        runs (int): number of interpreters to start
+        python (str): interpreter to run
+        package_root (str): folder holding the save package to time, defaults to this checkout
+    Returns [float]: seconds taken by each run
+    """
+    package_root = package_root or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([package_root, os.environ.get('PYTHONPATH', '')]))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    timings = []
+    # The first run compiles the .pyc files, like any installed package would already have
+    subprocess.check_output([python, '-c', _TIMER % snippet], env=env, cwd=package_root)
+    for _ in range(runs):
+        output = subprocess.check_output([python, '-c', _TIMER % snippet], env=env, cwd=package_root)
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def run(runs=10, python=sys.executable, package_root=None):
+    """ Times every snippet, see time_snippet
+    Returns (dict): {snippet name: {'min_ms': float, 'median_ms': float, 'runs': int}}
+    """
+    results = {}
+    for name, snippet in sorted(SNIPPETS.items()):
+        timings = sorted(time_snippet(snippet, runs, python, package_root))
+        results[name] = {'min_ms': timings[0] * 1000.0,
+                         'median_ms': timings[len(timings) // 2] * 1000.0,
+                         'runs': runs}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser('save.benchmark.import_time', description="Times importing save.model")
+    parser.add_argument('-r', '--runs', dest='runs', type=int, default=10, help="Interpreters started per snippet")
+    parser.add_argument('-p', '--python', dest='python', default=sys.executable, help="Interpreter to time")
+    parser.add_argument('--root', dest='root', default=None,
+                        help="Folder holding another checkout of the save package to time, e.g. a baseline")
+    parser.add_argument('-j', '--json', dest='json', action='store_true', help="Print results as JSON", default=False)
+    args = parser.parse_args()
+
+    results = run(args.runs, args.python, args.root)
+    if args.json:
+        sys.stdout.write(json.dumps(results, sort_keys=True) + '\n')
+        return
+    for name, result in sorted(results.items()):
+        sys.stdout.write('%-14s min %8.2fms  median %8.2fms  (%d runs)\n' % (
+            name, result['min_ms'], result['median_ms'], result['runs']))
+
+if __name__ == "__main__":
+    main()
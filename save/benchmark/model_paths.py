@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+    :module: model_paths
+    :platform: None
+    :synopsis: This module benchmarks the hot paths of save.model against synthetic jobs on a temp filesystem
+    :plans:
+    Usage:
+        python -m save.benchmark.model_paths --size medium
+        python -m save.benchmark.model_paths --size small --size huge --output results.json
+        python -m save.benchmark.model_paths --latency 0.002 --only refresh_tree
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from save import model
+from save.benchmark import fixtures
+
+
+def measure(function, repeat=5, setup=None):
+    """ Times function() repeat times, calling setup() untimed before each run
+    Returns [float]: seconds taken by each run
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.time()
+        function()
+        timings.append(time.time() - start)
+    return timings
+
+
+def _summary(timings, items):
+    timings = sorted(timings)
+    return {'min_ms': timings[0] * 1000.0,
+            'median_ms': timings[len(timings) // 2] * 1000.0,
+            'runs': len(timings),
+            'items': items,
+            'per_item_us': timings[0] * 1e6 / max(items, 1)}
+
+
+def bench_from_existing(env, repeat):
+    filenames = fixtures.make_filenames(env['filename_count'])
+    parse = lambda: [model.SceneFile.from_existing(filename) for filename in filenames]
+    return {'from_existing_cold': _summary(measure(parse, repeat, setup=model.get_filename_parser().clear),
+                                           len(filenames)),
+            'from_existing_warm': _summary(measure(parse, repeat, setup=parse), len(filenames))}
+
+
+def bench_parse_many(env, repeat):
+    filenames = fixtures.make_filenames(env['filename_count'])
+    parse = lambda: list(model.SceneFile.parse_many(filenames))
+    return {'parse_many': _summary(measure(parse, repeat, setup=model.get_filename_parser().clear), len(filenames))}
+
+
+def bench_get_filename(env, repeat):
+    save_data = model.SaveData('/%s/%s/sc000/sc000_sh0000/maya/scenes/model/aweber/char_santa_MDL_001_aw.ma' % (
+        model.config['map']['server'], env['job']))
+    save_data.scene_file = model.SceneFile('char_santa', 'MDL', 1, user='aw')
+    count = env['filename_count']
+    render = lambda: [save_data.get_filename() for _ in range(count)]
+    return {'get_filename': _summary(measure(render, repeat), count)}
+
+
+def bench_parse_path(env, repeat):
+    paths = ['/%s/%s/%s/%s/maya/scenes/model/aweber/%s' % (model.config['map']['server'], env['job'], scene,
+                                                           shots[0], 'char_santa_MDL_001_aw.ma')
+             for scene, shots in sorted(env['tree'].items())] * 10
+    parse = lambda: [model.Directory._parse_path(path) for path in paths]
+    return {'parse_path': _summary(measure(parse, repeat), len(paths))}
+
+
+def bench_refresh_tree(env, repeat):
+    context = {'job': env['job'], 'scene': 'sc000', 'shot': 'sc000_sh0000'}
+    shot_count = sum(len(shots) for shots in env['tree'].values())
+
+    def cold():
+        model.Directory(context).refresh_tree(force=True)
+
+    def warm():
+        model.Directory(context).refresh_tree(force=False)
+
+    return {'refresh_tree_service': _summary(measure(cold, repeat), shot_count),
+            'refresh_tree_disk_cache': _summary(measure(warm, repeat, setup=cold), shot_count)}
+
+
+def bench_get_jobs(env, repeat):
+    job_count = len(model.Directory.get_jobs())
+    return {'get_jobs_cold': _summary(measure(model.Directory.get_jobs, repeat, setup=model._job_list_cache.clear),
+                                      job_count),
+            'get_jobs_cached': _summary(measure(model.Directory.get_jobs, repeat), job_count)}
+
+
+BENCHMARKS = [('from_existing', bench_from_existing),
+              ('parse_many', bench_parse_many),
+              ('get_filename', bench_get_filename),
+              ('parse_path', bench_parse_path),
+              ('refresh_tree', bench_refresh_tree),
+              ('get_jobs', bench_get_jobs)]
+
+
+def run(size='small', repeat=5, latency=0.0, only=None):
+    """ Runs the benchmarks against a synthetic job of the given size
+    Args:
+        size (str): key of fixtures.SIZES
+        repeat (int): timed runs per benchmark
+        latency (float): seconds the stub context service sleeps per call
+        only [str]: names from BENCHMARKS to run, None runs them all
+    Returns (dict): machine readable results
+    """
+    spec = fixtures.SIZES[size]
+    results = {}
+    with fixtures.synthetic_environment(size, latency=latency) as env:
+        env['filename_count'] = spec['scenes'] * spec['shots'] * spec['files']
+        for name, benchmark in BENCHMARKS:
+            if only and name not in only:
+                continue
+            results.update(benchmark(env, repeat))
+    return {'size': size,
+            'spec': spec,
+            'latency': latency,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser('save.benchmark.model_paths', description="Benchmarks the save.model hot paths")
+    parser.add_argument('-s', '--size', dest='sizes', action='append', choices=sorted(fixtures.SIZES),
+                        help="Synthetic job size, repeat for several (default: small)")
+    parser.add_argument('-r', '--repeat', dest='repeat', type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument('-l', '--latency', dest='latency', type=float, default=0.0,
+                        help="Seconds the stub context service sleeps per call")
+    parser.add_argument('--only', dest='only', action='append', choices=[name for name, _ in BENCHMARKS],
+                        help="Benchmark to run, repeat for several (default: all)")
+    parser.add_argument('-o', '--output', dest='output', help="Also write the results as JSON lines to this file")
+    args = parser.parse_args()
+
+    output = open(args.output, 'a') if args.output else None
+    try:
+        for size in args.sizes or ['small']:
+            report = run(size, args.repeat, args.latency, args.only)
+            sys.stdout.write(json.dumps(report, sort_keys=True) + '\n')
+            if output:
+                output.write(json.dumps(report, sort_keys=True) + '\n')
+    finally:
+        if output:
+            output.close()
+
+if __name__ == "__main__":
+    main()
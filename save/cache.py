@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+    :module: cache
+    :platform: None
+    :synopsis: This module contains the small in-memory caches shared by the model classes
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import collections
+import threading
+import time
+
+
+class LRUCache(object):
+    """ Bounded mapping that throws away the least recently used entries once it is full,
+        optionally expiring entries a number of seconds after they were stored
+    Usage:
+        a = LRUCache(maxsize=2, ttl=30)
+        a['one'] = 1
+        a['two'] = 2
+        a['three'] = 3
+        a.get('one')
+        a.set('four', 4, ttl=5)
+        len(a)
+    """
+    _missing = object()
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """ init
+        Args:
+            maxsize (int): maximum number of entries kept, None for unbounded
+            ttl (float): default seconds an entry stays valid, None never expires
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """ Returns the cached value for key and marks it as most recently used
+        Args:
+            key (hashable): cache key
+            default (object): value returned on a miss
+        Returns (object): cached value or default
+        """
+        with self._lock:
+            value, expires = self._data.pop(key, (self._missing, None))
+            if value is self._missing or (expires is not None and expires < time.time()):
+                self.misses += 1
+                return default
+            self._data[key] = (value, expires)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=_missing):
+        """ Stores a value
+        Args:
+            key (hashable): cache key
+            value (object): value to store
+            ttl (float): seconds this entry stays valid, defaults to the cache's ttl, None never expires
+        """
+        if ttl is self._missing:
+            ttl = self.ttl
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, None if ttl is None else time.time() + ttl)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """ Removes key from the cache
+        Returns (object): the removed value or default
+        """
+        with self._lock:
+            return self._data.pop(key, (default, None))[0]
+
+    def clear(self):
+        """ Empties the cache and resets the hit/miss counters
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def keys(self):
+        """ Returns [hashable]: the stored keys, least recently used first, expired entries included until looked up
+        """
+        with self._lock:
+            return list(self._data.keys())
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __getitem__(self, key):
+        value = self.get(key, self._missing)
+        if value is self._missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        with self._lock:
+            value, expires = self._data.get(key, (self._missing, None))
+            return value is not self._missing and (expires is None or expires >= time.time())
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return '%s(maxsize=%r, size=%d, hits=%d, misses=%d)' % (self.__class__.__name__, self.maxsize,
+                                                                 len(self), self.hits, self.misses)
@@ -2,38 +2,262 @@
 """
     :module: cmd
     :platform: None
-    :synopsis: This module will be used for a command line interface for MPCSave
+    :synopsis: This module is the command line interface for MPCSave, installed as mpcsave
     :plans:
+    Every command writes one JSON object per line to stdout so other pipeline tools can read the results
+    without Maya.  Commands taking paths read them from stdin when none are given (or for -), one per line, and
+    answer each line as it arrives.  A path that can't be handled gets an {"path": ..., "error": ...} line and
+    makes the command exit with 1 once the rest are done.  --line-buffered flushes every answer straight away.
+    Usage:
+        mpcsave parse /jobs/macysSanta_5403623/build/char_santa/maya/scenes/model/aweber/char_santa_MDL_004_aw.ma
+        find /jobs/macysSanta_5403623 -name "*.ma" | mpcsave parse --workers 8
+        mpcsave next-version /jobs/macysSanta_5403623/build/char_santa/maya/scenes/model/aweber/char_santa_MDL_004_aw.ma
+        mpcsave list-shots macysSanta_5403623 --backend local
+        mpcsave audit macysSanta_5403623
+        mpcsave compact /jobs/macysSanta_5403623/build/char_santa --keep 3 --dry-run
 """
 __author__ = "Andres Weber"
 __email__ = "andresmweber@gmail.com"
 __version__ = 1.0
 
-import sys
 import argparse
+import errno
+import getpass as gp
+import json
+import os
+import sys
+
+# Project Imports
+import audit
+import delta
+import model
+import services
+import store
+
+
+def parse(args, out):
+    """ Parses filenames into their fields.  Every path gets a line with the fields, the path as given, its
+        basename as filename and whether that name is conforming, see model.get_filename_regex.  Legacy names
+        that SceneFile.from_existing reads are reported as not conforming rather than as errors
+    """
+    name_re = model.get_filename_regex()
+    records = model.SceneFile.parse_many(_iter_paths(args.paths), workers=args.workers,
+                                         chunksize=1 if args.line_buffered else 2048)
+    for record in records:
+        fields = record._asdict()
+        fields['path'] = fields.pop('filename')
+        fields['filename'] = os.path.basename(fields['path'])
+        fields['conforming'] = name_re.match(fields['filename']) is not None
+        out(fields)
+    return 0
+
+
+def next_version(args, out):
+    """ Works out the next free version of each scene's description and discipline from its discipline folder
+    """
+    template = model.get_template(model.config['path']['template_string'])
+    parser = model.get_filename_parser()
+    failed = 0
+    for path in _iter_paths(args.paths):
+        try:
+            parsed = parser.parse(os.path.basename(path))
+            folder = _discipline_folder(path, parsed.discipline)
+            version = model.get_version_index(folder).next_version(parsed.description, parsed.discipline)
+        except (KeyError, ValueError, OSError) as err:
+            failed = 1
+            out({'path': path, 'error': _describe(err)})
+            continue
+        filename = template.render(DESCRIPTION=parsed.description, DISCIPLINE=parsed.discipline,
+                                   VERSION='%03d' % version, INITIALS=args.initials or parsed.user, OPTIONAL=None,
+                                   EXT=parsed.extension)
+        out({'path': path, 'next_version': version, 'filename': filename, 'folder': folder,
+             'file_path': os.path.join(folder, args.username, filename)})
+    return failed
+
+
+def list_shots(args, out):
+    """ Lists a job's scenes and shots through the context service
+    """
+    directory = model.Directory({'job': args.job, 'scene': None, 'shot': None})
+    directory.refresh_tree(force=False, concurrency=args.concurrency)
+    template = model.get_template(model.config['path']['path_format_string'])
+    for scene in sorted(directory.get_scenes()):
+        if args.scenes and scene not in args.scenes:
+            continue
+        for shot in sorted(directory.get_shots(scene) or []):
+            out({'job': args.job, 'scene': scene, 'shot': shot,
+                 'path': template.render(JOB=args.job, SCENE=scene, SHOT=shot)})
+    return 0
+
+
+def audit_job(args, out):
+    """ Reports non-conforming names, version gaps and duplicate versions in a job's discipline folders,
+        followed by a summary line with the totals and throughput
+    """
+    job_folder = _job_folder(args.job)
+    if not os.path.isdir(job_folder):
+        out({'path': job_folder, 'error': 'no such job folder'})
+        return 1
+    job_audit = audit.JobAudit.from_config(model.config, job_folder, workers=args.workers)
+    for issue in job_audit.run():
+        if not args.kinds or issue.kind in args.kinds:
+            out(issue._asdict())
+    out({'summary': job_audit.stats.as_dict()})
+    return 1 if job_audit.stats.issues and args.strict else 0
+
+
+def compact(args, out):
+    """ Archives the older versions under a shot or discipline folder as deltas, see delta.compact
+    """
+    options = delta.config_options(model.config)
+    if args.keep is not None:
+        options['keep'] = args.keep
+    if args.max_chain is not None:
+        options['max_chain'] = args.max_chain
+    results = delta.compact_tree(args.folder, model.get_filename_parser(), dry_run=args.dry_run, **options)
+    for result in results:
+        out(result._asdict())
+    size, stored = sum(result.size for result in results), sum(result.stored for result in results)
+    out({'summary': {'versions': len(results), 'bytes_freed': size - stored, 'dry_run': args.dry_run}})
+    return 0
+
+
+def restore(args, out):
+    """ Turns versions archived as deltas or evicted to a version store back into full files
+    """
+    failed = 0
+    for path in _iter_paths(args.paths):
+        if delta.is_archived(path):
+            out({'path': delta.restore(path)})
+        elif store.is_stored(path):
+            out({'path': store.restore(path)})
+        else:
+            failed = 1
+            out({'path': path, 'error': 'not archived'})
+    return failed
+
 
-def main():
-    parser = argparse.ArgumentParser('ftrack_copyAsset', description="Tool to copy ftrack srcAsset builds between jobs")
-    parser.add_argument('-s', '--sourceJob', dest="srcJobName", action="store", required=True, help="Name of source job")
-    parser.add_argument('-b', '--buildName', dest="buildName", action="store", required=True, help="Name of asset build to copy")
-    parser.add_argument('-o', '--override', dest='override', action='store_true', help="Override if destination asset build already exists", default=False)
-    # These are not hooked up!
-    parser.add_argument('-t', '--testmode', dest='testmode', action='store_true', help="Test mode - print without populating ftrack", default=False)
-    parser.add_argument('-v', '--verbose', dest='verbose', action='store_true', help="Verbose mode", default=False)
+def main(argv=None):
+    parser = argparse.ArgumentParser('mpcsave', description="Command line tools for MPCSave versioned scene files")
+    parser.add_argument('--backend', dest='backend', choices=('tessa', 'local', 'memory'), default=None,
+                        help="Context service to use instead of config [services] backend")
+    parser.add_argument('--line-buffered', dest='line_buffered', action='store_true', default=False,
+                        help="Flush every output line, for reading the answers while paths are still being sent")
+    commands = parser.add_subparsers(dest='command')
 
-    if '' in sys.argv:
-        sys.argv.remove('')
-    args = parser.parse_args()
+    parse_parser = commands.add_parser('parse', help="Parse scene filenames into their fields")
+    parse_parser.add_argument('paths', nargs='*', help="Filenames or paths, read from stdin when left out or -")
+    parse_parser.add_argument('-w', '--workers', type=int, default=1,
+                              help="Processes parsing in parallel, 0 uses every cpu")
+    parse_parser.set_defaults(function=parse)
 
-    if args.testmode:
-        args.verbose = True
+    next_parser = commands.add_parser('next-version', help="Next free version and filename of scene files")
+    next_parser.add_argument('paths', nargs='*', help="Scene file paths, read from stdin when left out or -")
+    next_parser.add_argument('-i', '--initials', default=None, help="Initials for the new filename, defaults to "
+                                                                  "the ones in each path")
+    next_parser.add_argument('-u', '--username', default=gp.getuser(), help="User folder of the new file")
+    next_parser.set_defaults(function=next_version)
 
+    shots_parser = commands.add_parser('list-shots', help="List the scenes and shots of a job")
+    shots_parser.add_argument('job', help="Job name")
+    shots_parser.add_argument('-s', '--scene', dest='scenes', action='append', default=[],
+                              help="Only list this scene, may be repeated")
+    shots_parser.add_argument('-c', '--concurrency', type=int, default=None,
+                              help="Context service calls in flight, defaults to config [services] concurrency")
+    shots_parser.set_defaults(function=list_shots)
+
+    audit_parser = commands.add_parser('audit', help="Report non-conforming names, version gaps and duplicate "
+                                                     "versions in a job")
+    audit_parser.add_argument('job', help="Job name or folder")
+    audit_parser.add_argument('-w', '--workers', type=int, default=None,
+                              help="Folders listed at once, defaults to config [audit] workers")
+    audit_parser.add_argument('-k', '--kind', dest='kinds', action='append', default=[],
+                              choices=('nonconforming', 'gap', 'duplicate', 'broken_chain', 'unreadable'),
+                              help="Only report this kind of issue, may be repeated")
+    audit_parser.add_argument('--strict', action='store_true', default=False,
+                              help="Exit with 1 when anything was reported")
+    audit_parser.set_defaults(function=audit_job)
+
+    compact_parser = commands.add_parser('compact', help="Archive older .ma versions of a shot as deltas")
+    compact_parser.add_argument('folder', help="Shot, discipline or user folder to compact")
+    compact_parser.add_argument('-k', '--keep', type=int, default=None,
+                                help="Latest versions kept as full files, defaults to config [delta] keep")
+    compact_parser.add_argument('--max-chain', dest='max_chain', type=int, default=None,
+                                help="Deltas replayed at most to rebuild a version, "
+                                     "defaults to config [delta] max_chain")
+    compact_parser.add_argument('-n', '--dry-run', dest='dry_run', action='store_true', default=False,
+                                help="Report what would be archived without changing anything")
+    compact_parser.set_defaults(function=compact)
+
+    restore_parser = commands.add_parser('restore', help="Rebuild archived or evicted versions as full files")
+    restore_parser.add_argument('paths', nargs='*', help="Original paths of the archived versions, read from stdin "
+                                                         "when left out or -")
+    restore_parser.set_defaults(function=restore)
+
+    args = parser.parse_args([arg for arg in (sys.argv[1:] if argv is None else argv) if arg != ''])
+    if getattr(args, 'workers', 1) == 0:
+        args.workers = None
+    if args.backend:
+        sections = dict(model.config.items())
+        sections['services'] = dict(sections['services'], backend=args.backend)
+        model.set_context_service(services.from_config(sections))
     try:
-        args.dstJobName = os.environ["JOB"]
-    except KeyError:
-        print "Set job to destination job first!"
+        return args.function(args, _write_json_line if args.line_buffered else _write_json)
+    except IOError as err:
+        # the reading end of a pipe went away, e.g. | head
+        if err.errno == errno.EPIPE:
+            return 0
+        raise
+
+
+def _iter_paths(paths):
+    """ Returns (generator): the given paths, or the lines of stdin as they arrive when there are none or only -
+    """
+    if paths and paths != ['-']:
+        for path in paths:
+            yield path
         return
-    #copyAsset(args)
+    for line in iter(sys.stdin.readline, ''):
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _write_json(record):
+    sys.stdout.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def _write_json_line(record):
+    _write_json(record)
+    sys.stdout.flush()
+
+
+def _discipline_folder(path, discipline):
+    """ Returns (str): the discipline folder of the shot a scene file path is in, which has to be a shot
+        folder config['path']['path_format_string'] builds on config['map']['server']
+    """
+    levels = model.Directory._parse_path(path)
+    shot_folder = None
+    if len(levels) >= 3:
+        shot_folder = model.get_template(model.config['path']['path_format_string']).render(
+            JOB=levels[0], SCENE=levels[1], SHOT=levels[2])
+    if shot_folder is None or not os.path.abspath(path).startswith(os.path.join(shot_folder, '')):
+        raise ValueError('%s is not inside a job/scene/shot folder on the server' % path)
+    return os.path.join(shot_folder, model.SaveData.get_discipline_folder(discipline))
+
+
+def _job_folder(job):
+    """ Returns (str): the folder of a job given by name or path
+    """
+    if os.sep in job:
+        return job
+    return model.Directory.build_job_path(job)
+
+
+def _describe(err):
+    if isinstance(err, KeyError):
+        return 'unknown discipline %s' % err.args[0]
+    return str(err)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+"""
+    :module: delta
+    :platform: None
+    :synopsis: This module archives older Maya ASCII versions as compressed line deltas against the next version
+    :plans:
+    Successive .ma saves of a shot are mostly the same lines.  compact() keeps the latest versions of every
+    description as full files and replaces the older ones with a zlib compressed list of line ranges to copy
+    from the next version plus the lines that are new, in a hidden .delta folder next to them.  Every
+    max_chain'th archived version is kept as a compressed snapshot instead so reconstructing one never has to
+    replay more than max_chain deltas.  The VersionIndex still counts archived versions.
+    An archived version depends on every version after it up to the next full file or snapshot: deleting or
+    renaming one of those, or their archives, makes it impossible to rebuild, and so does editing a full file
+    in place.  restore() versions before touching the ones after them; broken_chains() finds missing bases
+    and the audit reports them, a changed base is only caught by the sha1 check of reconstruct().
+    Archives are fsync'ed along with their folders before the full file is removed.
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import bisect
+import collections
+import difflib
+import hashlib
+import itertools
+import json
+import os
+import zlib
+from cStringIO import StringIO
+
+# Project Imports
+import fsutil
+
+ARCHIVE_FOLDER = '.delta'
+ARCHIVE_SUFFIX = '.delta'
+
+# One file archived by compact(), base is None for a snapshot.  stored is the archive's size in bytes
+DeltaResult = collections.namedtuple('DeltaResult', ['path', 'base', 'size', 'stored'])
+
+# Regions without a line unique to both sides are only handed to difflib up to this many lines per side
+_DIFFLIB_LIMIT = 2000
+# Nested regions aligned on unique lines before the rest is written out as new lines
+_MAX_DEPTH = 64
+
+
+def diff_lines(base, target):
+    """ Describes target as line ranges copied from base and runs of new lines.
+        Common leading and trailing lines are matched first, the rest is aligned on the lines that occur exactly
+        once in both (patience diff), which stays close to linear on large scenes with a few edited regions.
+    Args:
+        base [str]: lines of the version the delta is taken against
+        target [str]: lines of the version to describe
+    Returns [tuple]: ('=', base start, line count) and ('+', [lines]) operations in target order
+    """
+    ops = []
+    _diff(base, 0, len(base), target, 0, len(target), ops, 0)
+    return ops
+
+
+def apply_delta(base, ops):
+    """ Rebuilds the lines described by diff_lines
+    Args:
+        base [str]: lines of the version the delta was taken against
+        ops [tuple]: operations returned by diff_lines or read from an archive
+    Returns [str]: lines of the target version
+    """
+    lines = []
+    for op in ops:
+        if op[0] == '=':
+            lines.extend(base[op[1]:op[1] + op[2]])
+        else:
+            lines.extend(op[1])
+    return lines
+
+
+def split_lines(content):
+    """ Splits on \\n only, unlike str.splitlines which also splits on the \\r and form feeds .ma strings may hold
+    Returns [str]: lines, keeping their line endings
+    """
+    return StringIO(content).readlines()
+
+
+def archive_path(path):
+    """ Returns (str): where compact() keeps the archive of a version
+    """
+    folder, filename = os.path.split(path)
+    return os.path.join(folder, ARCHIVE_FOLDER, filename + ARCHIVE_SUFFIX)
+
+
+def archived_names(folder):
+    """ Returns [str]: file names of the versions archived in a folder
+    """
+    try:
+        names = os.listdir(os.path.join(folder, ARCHIVE_FOLDER))
+    except OSError:
+        return []
+    return [name[:-len(ARCHIVE_SUFFIX)] for name in names if name.endswith(ARCHIVE_SUFFIX) and not name.startswith('.')]
+
+
+def archived_bases(folder):
+    """ Returns (set): names of the versions the archives of a folder are taken against, which have to stay
+        full files or archives for reconstruct() to work
+    """
+    bases = set()
+    for name in archived_names(folder):
+        base = read_archive(archive_path(os.path.join(folder, name)), header_only=True)['base']
+        if base is not None:
+            bases.add(base)
+    return bases
+
+
+def is_archived(path):
+    """ Returns (bool): whether a version only exists as an archive
+    """
+    return not os.path.exists(path) and os.path.exists(archive_path(path))
+
+
+def reconstruct(path):
+    """ Rebuilds an archived version by following its deltas to the nearest full file or snapshot
+    Args:
+        path (str): the version's original path
+    Returns (str): its content
+    """
+    chain = []
+    current = path
+    while not os.path.exists(current):
+        header, ops = read_archive(archive_path(current))
+        chain.append((header, ops))
+        if header['base'] is None:
+            break
+        current = os.path.join(os.path.dirname(path), header['base'])
+    if chain and chain[-1][0]['base'] is None:
+        lines = []
+    else:
+        with open(current, 'rb') as full_file:
+            lines = split_lines(full_file.read())
+    for header, ops in reversed(chain):
+        lines = apply_delta(lines, ops)
+    content = ''.join(lines)
+    if chain and hashlib.sha1(content).hexdigest() != chain[0][0]['sha1']:
+        raise IOError('%s could not be rebuilt from %s, its archive or a base is corrupt' % (path, current))
+    return content
+
+
+def broken_chains(folder):
+    """ Finds the archived versions of a folder whose chain of bases is missing a version
+    Returns [(str, str)]: (name, missing base name) of each version that can't be rebuilt, sorted
+    """
+    full = set(name for name in os.listdir(folder) if not name.startswith('.'))
+    archived = set(archived_names(folder)) - full
+    missing = {}
+
+    def missing_base(name):
+        """ Returns (str or None): the first base missing from name's chain
+        """
+        chain = []
+        while name in archived and name not in missing:
+            chain.append(name)
+            missing[name] = None
+            base = read_archive(archive_path(os.path.join(folder, name)), header_only=True)['base']
+            if base is not None and base not in full and base not in archived:
+                missing[name] = base
+                break
+            name = base
+        found = missing.get(name)
+        for name in chain:
+            missing[name] = missing[name] or found
+        return found
+
+    return sorted((name, missing_base(name)) for name in archived if missing_base(name))
+
+
+def restore(path):
+    """ Turns an archived version back into a full file, keeping its modification time
+        Versions archived against it keep working since full files are always preferred over archives
+    Args:
+        path (str): the version's original path
+    Returns (str): path
+    """
+    header, _ = read_archive(archive_path(path))
+    fsutil.write_atomic(path, reconstruct(path))
+    os.utime(path, (header['mtime'], header['mtime']))
+    os.remove(archive_path(path))
+    return path
+
+
+def compact(folder, parser, keep=3, max_chain=20, extensions=('ma',), dry_run=False):
+    """ Archives all but the latest keep versions of every description/discipline/user in a folder
+    Args:
+        folder (str): user folder holding the versions
+        parser (model.FilenameParser): parser used to group the files
+        keep (int): latest versions left as full files, at least 1
+        max_chain (int): deltas at most replayed to reconstruct a version before a snapshot is stored instead
+        extensions [str]: text formats to archive, deltas of binary files aren't worth it
+        dry_run (bool): work out and report the archives without writing them or removing anything
+    Returns [DeltaResult]: the versions archived, newest first for each description
+    """
+    keep = max(int(keep), 1)
+    full = set(name for name in os.listdir(folder)
+               if not name.startswith('.') and os.path.isfile(os.path.join(folder, name)))
+    archived = set(archived_names(folder)) - full
+    groups = {}
+    for name in full | archived:
+        parsed = parser.parse(name)
+        if parsed.extension.lower() not in extensions:
+            continue
+        key = (parsed.description, parsed.discipline, parsed.user, parsed.extension.lower())
+        groups.setdefault(key, []).append((parsed.version, name))
+
+    depths = {}
+
+    def depth(name):
+        """ Deltas replayed to rebuild name, 0 for full files and snapshots
+        """
+        if name not in depths:
+            header = None
+            if name in archived:
+                header = read_archive(archive_path(os.path.join(folder, name)), header_only=True)
+            depths[name] = depth(header['base']) + 1 if header and header['base'] else 0
+        return depths[name]
+
+    results = []
+    for key in sorted(groups):
+        versions = [name for _, name in sorted(groups[key])]
+        base_lines = None
+        for position in range(len(versions) - keep - 1, -1, -1):
+            name, base = versions[position], versions[position + 1]
+            if name in archived:
+                base_lines = None
+                continue
+            path = os.path.join(folder, name)
+            with open(path, 'rb') as full_file:
+                content = full_file.read()
+            lines = split_lines(content)
+            if base_lines is None:
+                base_path = os.path.join(folder, base)
+                base_lines = split_lines(reconstruct(base_path) if base in archived else open(base_path, 'rb').read())
+            if depth(base) + 1 > max_chain:
+                base, ops = None, [('+', lines)] if lines else []
+            else:
+                ops = diff_lines(base_lines, lines)
+            if apply_delta([] if base is None else base_lines, ops) != lines:
+                raise ValueError('Delta of %s against %s does not rebuild it' % (path, base))
+            mtime = os.stat(path).st_mtime
+            header = {'format': 1, 'base': base, 'size': len(content), 'mtime': mtime,
+                      'sha1': hashlib.sha1(content).hexdigest()}
+            data = encode_archive(header, ops)
+            depths[name] = 0 if base is None else depth(base) + 1
+            results.append(DeltaResult(path, base, len(content), len(data)))
+            if not dry_run:
+                # write_atomic fsyncs the archive and the .delta folder, the full file is only removed after that
+                fsutil.write_atomic(archive_path(path), data)
+                os.utime(archive_path(path), (mtime, mtime))
+                os.remove(path)
+                archived.add(name)
+            base_lines = lines
+    if results and not dry_run:
+        fsutil.fsync_folder(folder)
+    return results
+
+
+def compact_tree(folder, parser, keep=3, max_chain=20, extensions=('ma',), dry_run=False):
+    """ Runs compact() on every folder under a shot or discipline folder, skipping hidden folders
+    Returns [DeltaResult]: the versions archived
+    """
+    results = []
+    for path, folders, files in os.walk(folder):
+        folders[:] = sorted(name for name in folders if not name.startswith('.'))
+        if files:
+            results.extend(compact(path, parser, keep=keep, max_chain=max_chain, extensions=extensions,
+                                   dry_run=dry_run))
+    return results
+
+
+def config_options(config_in):
+    """ Reads the [delta] section of a config dictionary
+    Returns (dict): keep, max_chain and extensions keyword arguments of compact()
+    """
+    extensions = config_in['delta']['extensions']
+    if isinstance(extensions, basestring):
+        extensions = [extensions]
+    return {'keep': int(config_in['delta']['keep']),
+            'max_chain': int(config_in['delta']['max_chain']),
+            'extensions': tuple(extension.strip().lower().lstrip('.') for extension in extensions)}
+
+
+def encode_archive(header, ops):
+    """ Returns (str): zlib compressed JSON header line followed by the operations, one per line
+        ('=start,count' for copies, '+count' followed by the new lines)
+    """
+    out = [json.dumps(header, sort_keys=True), '\n']
+    for op in ops:
+        if op[0] == '=':
+            out.append('=%d,%d\n' % (op[1], op[2]))
+        else:
+            out.append('+%d\n' % len(op[1]))
+            out.extend(op[1])
+    return zlib.compress(''.join(out), 9)
+
+
+def read_archive(path, header_only=False):
+    """ Reads an archive written by compact()
+    Args:
+        path (str): archive file
+        header_only (bool): skip decoding the operations
+    Returns (dict, [tuple]): header and operations
+    """
+    with open(path, 'rb') as archive:
+        if header_only:
+            # only inflate up to the end of the header line
+            decompressor, data = zlib.decompressobj(), ''
+            for compressed in iter(lambda: archive.read(4096), ''):
+                data += decompressor.decompress(compressed)
+                if '\n' in data:
+                    break
+            return json.loads(data.split('\n', 1)[0])
+        data = StringIO(zlib.decompress(archive.read()))
+    header = json.loads(data.readline())
+    ops = []
+    for line in iter(data.readline, ''):
+        if line[0] == '=':
+            start, count = line[1:].split(',')
+            ops.append(('=', int(start), int(count)))
+        else:
+            ops.append(('+', [data.readline() for _ in xrange(int(line[1:]))]))
+    return header, ops
+
+
+def _diff(base, base_start, base_end, target, target_start, target_end, ops, depth):
+    """ Appends the operations turning base[base_start:base_end] into target[target_start:target_end] to ops
+    """
+    prefix = 0
+    while (base_start + prefix < base_end and target_start + prefix < target_end and
+           base[base_start + prefix] == target[target_start + prefix]):
+        prefix += 1
+    _copy(ops, base_start, prefix)
+    base_start += prefix
+    target_start += prefix
+    suffix = 0
+    while (base_start < base_end - suffix and target_start < target_end - suffix and
+           base[base_end - suffix - 1] == target[target_end - suffix - 1]):
+        suffix += 1
+    base_end -= suffix
+    target_end -= suffix
+
+    anchors = []
+    if base_start < base_end and target_start < target_end and depth < _MAX_DEPTH:
+        anchors = _unique_anchors(base, base_start, base_end, target, target_start, target_end)
+    if anchors:
+        base_line, target_line = base_start, target_start
+        for next_base, next_target in anchors + [(base_end, target_end)]:
+            if (next_base - base_line == next_target - target_line and
+                    base[base_line:next_base] == target[target_line:next_target]):
+                _copy(ops, base_line, next_base - base_line)
+            else:
+                _diff(base, base_line, next_base, target, target_line, next_target, ops, depth + 1)
+            if next_target < target_end:
+                _copy(ops, next_base, 1)
+            base_line, target_line = next_base + 1, next_target + 1
+    elif target_start == target_end:
+        pass
+    elif base_end - base_start <= _DIFFLIB_LIMIT and target_end - target_start <= _DIFFLIB_LIMIT:
+        matcher = difflib.SequenceMatcher(None, base[base_start:base_end], target[target_start:target_end],
+                                          autojunk=False)
+        for tag, base_from, base_to, target_from, target_to in matcher.get_opcodes():
+            if tag == 'equal':
+                _copy(ops, base_start + base_from, base_to - base_from)
+            elif target_to > target_from:
+                _insert(ops, target[target_start + target_from:target_start + target_to])
+    else:
+        _insert(ops, target[target_start:target_end])
+    _copy(ops, base_end, suffix)
+
+
+def _copy(ops, start, count):
+    if ops and ops[-1][0] == '=' and ops[-1][1] + ops[-1][2] == start:
+        ops[-1] = ('=', ops[-1][1], ops[-1][2] + count)
+    elif count:
+        ops.append(('=', start, count))
+
+
+def _insert(ops, lines):
+    if ops and ops[-1][0] == '+':
+        ops[-1][1].extend(lines)
+    elif lines:
+        ops.append(('+', list(lines)))
+
+
+def _unique_anchors(base, base_start, base_end, target, target_start, target_end):
+    """ Lines occurring exactly once on both sides, as the longest run of (base, target) line pairs that is
+        increasing on both sides
+    Returns [(int, int)]: anchor line numbers in base and target
+    """
+    base_unique = _unique_lines(base, base_start, base_end)
+    target_unique = _unique_lines(target, target_start, target_end)
+    pairs = sorted((number, base_unique[line]) for line, number in target_unique.iteritems() if line in base_unique)
+    if not pairs:
+        return []
+
+    base_numbers = [base_number for _, base_number in pairs]
+    if base_numbers == sorted(base_numbers):
+        return [(base_number, target_number) for target_number, base_number in pairs]
+
+    # longest increasing subsequence of the base line numbers, in target order
+    tails, tail_index, previous = [], [], [None] * len(pairs)
+    for position, base_number in enumerate(base_numbers):
+        low = bisect.bisect_left(tails, base_number)
+        previous[position] = tail_index[low - 1] if low else None
+        if low == len(tails):
+            tails.append(base_number)
+            tail_index.append(position)
+        else:
+            tails[low] = base_number
+            tail_index[low] = position
+    anchors = []
+    position = tail_index[-1]
+    while position is not None:
+        anchors.append((pairs[position][1], pairs[position][0]))
+        position = previous[position]
+    anchors.reverse()
+    return anchors
+
+
+def _unique_lines(lines, start, end):
+    """ Returns (dict): {line: line number} of the lines occurring once between start and end
+        Built from the first and last occurrence of every line, both found by dict() rather than a Python loop
+    """
+    numbers = xrange(start, end)
+    last = dict(itertools.izip(itertools.islice(lines, start, end), numbers))
+    first = dict(itertools.izip(reversed(lines[start:end]), reversed(numbers)))
+    return dict((line, number) for line, number in last.iteritems() if first[line] == number)
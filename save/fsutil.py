@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+    :module: fsutil
+    :platform: None
+    :synopsis: This module holds the file system helpers shared by the pipeline, store, delta and index modules
+    :plans:
+    write_atomic is the one way files are written to the job: into a temporary file in the destination folder,
+    fsync'ed, moved into place and the folder fsync'ed, so after a crash a file is either complete or absent.
+    Many small files written together, like the chunks of a store, can skip the fsyncs with sync=False and be
+    flushed in one go by fsync_files before whatever refers to them is written.
+    scandir is os.scandir, the scandir backport or None, callers fall back to os.listdir on None.
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import binascii
+import errno
+import os
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+def write_atomic(path, content, overwrite=True, progress=None, sync=True):
+    """ Writes a string or an iterable of strings to path so it's either complete or absent, even after a crash
+    Args:
+        path (str): file to write, its folder is created if needed
+        content (str or iterable): the data, iterables are written as they yield
+        overwrite (bool): replace an existing path instead of raising OSError(EEXIST).  Without it the file is
+                          hard linked into place, so one that appears while writing is never replaced either
+        progress (function): called with the number of bytes written so far after every string
+        sync (bool): fsync the file and its folder.  Without it the file is still complete or absent, but
+                     only once fsync_files was called on it after a crash
+    Returns (str): path
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        makedirs(folder)
+    if not overwrite and os.path.exists(path):
+        raise OSError(errno.EEXIST, 'Refusing to replace an existing file', path)
+
+    handle, partial = _create_partial(folder, os.path.basename(path))
+    try:
+        with os.fdopen(handle, 'wb') as file_out:
+            written = 0
+            for chunk in ([content] if isinstance(content, basestring) else content):
+                file_out.write(chunk)
+                written += len(chunk)
+                if progress:
+                    progress(written)
+            file_out.flush()
+            if sync:
+                os.fsync(file_out.fileno())
+        if overwrite:
+            os.rename(partial, path)
+        else:
+            _link_new(partial, path)
+    except BaseException:
+        remove(partial)
+        raise
+    if sync:
+        fsync_folder(folder)
+    return path
+
+
+def makedirs(folder):
+    """ Creates folder and its parents, it's fine if another process got there first.  The parent folder is
+        fsync'ed so the new folder, and what is written into it, survives a crash
+    """
+    try:
+        os.makedirs(folder)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+        return
+    fsync_folder(os.path.dirname(folder.rstrip(os.sep)))
+
+
+def remove(path):
+    """ Removes a file if it's still there
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def fsync_files(paths):
+    """ Flushes files written with write_atomic(sync=False), and once each the folders they are in
+    """
+    folders = set()
+    for path in paths:
+        handle = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(handle)
+        finally:
+            os.close(handle)
+        folders.add(os.path.dirname(path))
+    for folder in sorted(folders):
+        fsync_folder(folder)
+
+
+def fsync_folder(folder):
+    """ Flushes a folder's entries so renames and removes in it survive a crash, where the platform allows it
+    """
+    try:
+        handle = os.open(folder or '.', os.O_RDONLY)
+    except (OSError, AttributeError):
+        return
+    try:
+        os.fsync(handle)
+    except OSError:
+        pass
+    finally:
+        os.close(handle)
+
+
+def _create_partial(folder, name):
+    """ Opens a new, uniquely named temporary file in folder.  Unlike mkstemp the file is created with the
+        usual 0666 & ~umask permissions, so the umask never has to be read (or changed) to fix them up later
+    Returns (int, str): file descriptor and path
+    """
+    while True:
+        partial = os.path.join(folder or '.', '.%s.%s.partial' % (name, binascii.hexlify(os.urandom(4))))
+        try:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+            return os.open(partial, flags, 0o666), partial
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+
+
+def _link_new(partial, path):
+    """ Moves partial to path, failing with EEXIST rather than replacing a file that appeared meanwhile.
+        A hard link can't replace an existing file, unlike rename; where links aren't supported the existence
+        check right before the rename is the best that can be done
+    """
+    try:
+        os.link(partial, path)
+    except (OSError, AttributeError) as err:
+        if getattr(err, 'errno', None) not in (None, errno.EPERM, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP):
+            raise
+        if os.path.exists(path):
+            raise OSError(errno.EEXIST, 'Refusing to replace an existing file', path)
+        os.rename(partial, path)
+    else:
+        os.remove(partial)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""
+    :module: index
+    :platform: None
+    :synopsis: This module contains the index of saved versions in a discipline folder
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import bisect
+import collections
+import os
+import threading
+
+# Project Imports
+import delta
+import fsutil
+import store
+
+# One saved file of a VersionIndex.history, mtime is the file's modification time in seconds since the epoch
+Version = collections.namedtuple('Version', ['version', 'user', 'path', 'mtime'])
+
+
+class VersionIndex(object):
+    """ Maps (description, discipline, user) to the sorted versions found in a discipline folder and its user
+        subfolders.  The folders are read once, later update() calls only re-list folders whose mtime changed,
+        so the latest or next free version is a dictionary lookup.
+    Usage:
+        a = VersionIndex(model.get_filename_parser(), '/jobs/macysSanta_5403623/build/char_santa/maya/scenes/model')
+        a.scan()
+        a.latest('char_santa', 'MDL', 'aw')
+        a.next_version('char_santa', 'MDL')
+        a.history('char_santa', 'MDL', limit=10)
+        a.add('/jobs/macysSanta_5403623/build/char_santa/maya/scenes/model/aweber/char_santa_MDL_004_aw.ma')
+        a.update()
+    """
+
+    def __init__(self, parser, folder, depth=1, extensions=None):
+        """ init
+        Args:
+            parser (model.FilenameParser): parser used to read the files' fields
+            folder (str): discipline folder to index
+            depth (int): levels of subfolders to include, 1 covers the per-user folders
+            extensions [str]: only index files with these extensions, e.g. ('ma', 'mb'), None indexes every file
+        """
+        self.parser = parser
+        self.folder = folder
+        self.depth = depth
+        self.extensions = None if extensions is None else frozenset(extension.lower() for extension in extensions)
+        self._lock = threading.RLock()
+        self._folders = {}
+        self._versions = {}
+        self._all_users = {}
+        self._files = {}
+
+    def scan(self):
+        """ Reads the whole folder tree, replacing anything indexed before
+        Returns (VersionIndex): self
+        """
+        with self._lock:
+            self._folders.clear()
+            self._versions.clear()
+            self._all_users.clear()
+            self._files.clear()
+            self._update_folder(self.folder, self.depth)
+        return self
+
+    def update(self):
+        """ Re-lists only the folders whose mtime changed since they were last read
+        Returns (VersionIndex): self
+        """
+        with self._lock:
+            self._update_folder(self.folder, self.depth)
+        return self
+
+    def add(self, path):
+        """ Indexes a single file straight after saving it, so the next update() doesn't have to find it.
+            Files that are already indexed or filtered out by extensions are skipped
+        """
+        folder, filename = os.path.split(path)
+        if not self._indexed(filename):
+            return
+        with self._lock:
+            mtime, files, subfolders = self._folders.get(folder, (None, frozenset(), frozenset()))
+            if filename in files:
+                return
+            # the folder's mtime is left alone so the next update() still re-lists it for anything else that changed
+            self._folders[folder] = (mtime, files | frozenset([filename]), subfolders)
+            description, discipline, user, version = self._key(path)
+            bisect.insort(self._versions.setdefault((description, discipline, user), []), version)
+            bisect.insort(self._all_users.setdefault((description, discipline), []), version)
+            bisect.insort(self._files.setdefault((description, discipline), []), (version, user, path))
+
+    def _add_many(self, paths):
+        """ Indexes many files at once, sorting each touched list once instead of inserting file by file
+        """
+        touched = {}
+        for path in paths:
+            description, discipline, user, version = self._key(path)
+            for found, entry in [(self._versions.setdefault((description, discipline, user), []), version),
+                                 (self._all_users.setdefault((description, discipline), []), version),
+                                 (self._files.setdefault((description, discipline), []), (version, user, path))]:
+                found.append(entry)
+                touched[id(found)] = found
+        for found in touched.itervalues():
+            found.sort()
+
+    def remove(self, path):
+        """ Drops a single file from the index, e.g. straight after deleting it
+        """
+        folder, filename = os.path.split(path)
+        with self._lock:
+            if folder in self._folders:
+                mtime, files, subfolders = self._folders[folder]
+                self._folders[folder] = (mtime, files - frozenset([filename]), subfolders)
+            self._remove_entry(path)
+
+    def _remove_entry(self, path):
+        """ Drops a file from the version lists, leaving the folder listings to the caller
+        """
+        with self._lock:
+            description, discipline, user, version = self._key(path)
+            for key, versions, entry in [((description, discipline, user), self._versions, version),
+                                         ((description, discipline), self._all_users, version),
+                                         ((description, discipline), self._files, (version, user, path))]:
+                if entry in versions.get(key, []):
+                    versions[key].remove(entry)
+                    if not versions[key]:
+                        del versions[key]
+
+    def versions(self, description, discipline, user=None):
+        """ Returns [int]: sorted versions saved for the description/discipline, by one user or by anyone
+        """
+        if user is None:
+            return list(self._all_users.get((description, discipline), []))
+        return list(self._versions.get((description, discipline, user), []))
+
+    def files(self, description, discipline):
+        """ Returns [(int, str, str)]: (version, user, path) of every saved file of a description/discipline,
+            sorted by version
+        """
+        with self._lock:
+            return list(self._files.get((description, discipline), []))
+
+    def latest(self, description, discipline, user=None):
+        """ Returns (int): highest saved version, 0 if nothing has been saved yet
+        """
+        versions = self._all_users if user is None else self._versions
+        key = (description, discipline) if user is None else (description, discipline, user)
+        found = versions.get(key)
+        return found[-1] if found else 0
+
+    def next_version(self, description, discipline, user=None):
+        """ Returns (int): first version after every saved one
+        """
+        return self.latest(description, discipline, user) + 1
+
+    def history(self, description, discipline, user=None, limit=None, since=None):
+        """ Lists the saved files of a description/discipline, newest version first
+            Files are stat'ed newest first until limit of them made it into the result, so with since every
+            file older than since is stat'ed too
+        Args:
+            user (str): only this user's files, None for everyone's
+            limit (int): most files returned, None for all
+            since (float): only files modified at or after this time, in seconds since the epoch
+        Returns [Version]: saved files
+        """
+        with self._lock:
+            files = list(self._files.get((description, discipline), []))
+        history = []
+        for version, file_user, path in reversed(files):
+            if limit is not None and len(history) >= limit:
+                break
+            if user is not None and file_user != user:
+                continue
+            mtime = _mtime(path)
+            if mtime is None:
+                continue
+            if since is None or mtime >= since:
+                history.append(Version(version, file_user, path, mtime))
+        return history
+
+    def keys(self):
+        """ Returns [(str, str, str)]: every indexed (description, discipline, user)
+        """
+        return self._versions.keys()
+
+    def _key(self, path):
+        parsed = self.parser.parse(os.path.basename(path))
+        return parsed.description, parsed.discipline, parsed.user, parsed.version
+
+    def _update_folder(self, folder, depth):
+        """ Diffs a folder's listing against what was indexed for it and recurses into its subfolders
+        """
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            self._forget_folder(folder)
+            return
+
+        known_mtime, files, subfolders = self._folders.get(folder, (None, frozenset(), frozenset()))
+        if known_mtime != mtime:
+            new_files, new_subfolders = self._list(folder, depth)
+            self._add_many([os.path.join(folder, filename) for filename in new_files - files])
+            for filename in files - new_files:
+                self._remove_entry(os.path.join(folder, filename))
+            for subfolder in subfolders - new_subfolders:
+                self._forget_folder(subfolder)
+            files, subfolders = new_files, new_subfolders
+            self._folders[folder] = (mtime, files, subfolders)
+
+        for subfolder in subfolders:
+            self._update_folder(subfolder, depth - 1)
+
+    def _forget_folder(self, folder):
+        """ Removes everything indexed from a folder that disappeared
+        """
+        _, files, subfolders = self._folders.pop(folder, (None, frozenset(), frozenset()))
+        for filename in files:
+            self._remove_entry(os.path.join(folder, filename))
+        for subfolder in subfolders:
+            self._forget_folder(subfolder)
+
+    def _indexed(self, filename):
+        """ Returns (bool): whether a file name passes the extensions filter
+        """
+        return self.extensions is None or os.path.splitext(filename)[1][1:].lower() in self.extensions
+
+    def _list(self, folder, depth):
+        """ Returns (frozenset, frozenset): names of the files passing the extensions filter and, while depth
+            allows, subfolder paths of a folder.  Versions archived by delta.compact() or evicted to the folder's
+            store are listed under their original names
+        """
+        files, subfolders = set(), set()
+        if fsutil.scandir is not None:
+            entries = ((entry.name, entry.is_dir()) for entry in fsutil.scandir(folder))
+        else:
+            entries = ((name, os.path.isdir(os.path.join(folder, name))) for name in os.listdir(folder))
+        for name, is_dir in entries:
+            if name == delta.ARCHIVE_FOLDER and is_dir:
+                files.update(delta.archived_names(folder))
+            elif name == store.STORE_FOLDER and is_dir:
+                files.update(store.stored_names(folder))
+            if name.startswith('.'):
+                continue
+            if not is_dir:
+                files.add(name)
+            elif depth > 0:
+                subfolders.add(os.path.join(folder, name))
+        if self.extensions is not None:
+            files = [name for name in files if self._indexed(name)]
+        return frozenset(files), frozenset(subfolders)
+
+
+def _mtime(path):
+    """ Returns (float): modification time of a version, read from its delta archive or its store manifest once
+        the full file is gone, None if none of them is there
+    """
+    for found in (path, delta.archive_path(path), store.manifest_path(path)):
+        try:
+            return os.stat(found).st_mtime
+        except OSError:
+            pass
+    return None
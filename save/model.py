@@ -14,28 +14,135 @@ import getpass as gp
 import re
 import sys
 import os 
-from glob import glob
+import itertools
+import threading
+from collections import deque, namedtuple
 from pprint import pprint
-from ConfigParser import SafeConfigParser
-# MPC Imports
-from mpc.tessa import contexts
+# Project Imports, the rest are imported where they're used so that importing save.model stays cheap
+import cache
+import fsutil
 
 # Relative Path Config Setup
 __location__ =  os.path.dirname(os.path.realpath(__file__))
 __config__ = os.path.join(__location__, "config.ini")
-try:
-    parser = SafeConfigParser()
-    parser.optionxform = str
-    parser.read(__config__)
-    config = {}
-    for section in parser.sections():
-        config[section]={}
-        for sub_item, value in parser.items(section):
-            config[section][sub_item] = value if ',' not in value else value.split(',')
-    root = config['map']['server']
-except KeyError as err:
-    print err
-    raise IOError("File not found %s"%__config__)
+
+
+class _LazyConfig(object):
+    """ Read-only mapping over config.ini that is only parsed the first time a section is asked for
+        Anything derived from the config registers with on_load so that reload() rebuilds it.
+    Usage:
+        config['map']['server']
+        config.reload()
+    """
+    def __init__(self, config_path):
+        self.config_path = config_path
+        self._sections = None
+        self._callbacks = []
+        self._lock = threading.RLock()
+    
+    def load(self):
+        """ Returns (dict): the parsed {section: {option: value}} config, parsing config.ini if it hasn't been yet
+            Comma separated values are split into lists
+        """
+        with self._lock:
+            if self._sections is None:
+                from ConfigParser import SafeConfigParser
+                parser = SafeConfigParser()
+                parser.optionxform = str
+                parser.read(self.config_path)
+                sections = {}
+                for section in parser.sections():
+                    sections[section]={}
+                    for sub_item, value in parser.items(section):
+                        sections[section][sub_item] = value if ',' not in value else value.split(',')
+                if 'map' not in sections:
+                    raise IOError("File not found %s"%self.config_path)
+                self._sections = sections
+                for callback in self._callbacks:
+                    callback(sections)
+            return self._sections
+    
+    def reload(self):
+        """ Re-reads config.ini and rebuilds everything registered with on_load
+        """
+        with self._lock:
+            self._sections = None
+            return self.load()
+    
+    def on_load(self, callback):
+        """ Registers callback(sections) to run every time the config is (re)loaded
+        """
+        self._callbacks.append(callback)
+        if self._sections is not None:
+            callback(self._sections)
+    
+    def __getitem__(self, section):
+        # Lock-free once loaded, config lookups sit on the hot paths of get_filename and build_path
+        sections = self._sections
+        if sections is None:
+            sections = self.load()
+        return sections[section]
+    
+    def __contains__(self, section):
+        return section in self.load()
+    
+    def __iter__(self):
+        return iter(self.load())
+    
+    def get(self, section, default=None):
+        return self.load().get(section, default)
+    
+    def keys(self):
+        return self.load().keys()
+    
+    def items(self):
+        return self.load().items()
+
+
+class _ContextServiceProxy(object):
+    """ Forwards to the context service picked by config['services']['backend'], building it on first use
+        so that mpc.tessa is only imported once a Directory needs a context
+    """
+    def __getattr__(self, attr):
+        return getattr(get_context_service(), attr)
+
+
+config = _LazyConfig(__config__)
+
+def get_config():
+    """ Returns (dict): the parsed config, see _LazyConfig
+    """
+    return config.load()
+
+def reload_config():
+    """ Re-reads config.ini and resets everything built from it
+    Returns (dict): the parsed config
+    """
+    return config.reload()
+
+def get_context_service():
+    """ Returns the context service save.model talks to, see the services module
+    """
+    global _context_service
+    if _context_service_override is not None:
+        return _context_service_override
+    if _context_service is None:
+        import services
+        _context_service = services.from_config(config)
+    return _context_service
+
+def set_context_service(service):
+    """ Replaces the context service, e.g. with a services.MemoryContexts for tests and benchmarks
+        The replacement stays in place when the config is (re)loaded
+    Args:
+        service (object): context service, None goes back to config['services']['backend']
+    """
+    global _context_service_override
+    _context_service_override = service
+
+_context_service = None
+_context_service_override = None
+contexts = _ContextServiceProxy()
 
 
 class SaveData(object):
@@ -46,6 +153,7 @@ class SaveData(object):
         b = SaveData('/jobs/sourPatchKidsGumAndSlurpee_5600273/build/char_spk_amputee/maya/scenes/model/RELEASE/char_spk_amputee_lodA/v003/char_spk_amputee_lodA.ma')
         b.scene_file
         b.dir
+        b.get_next_version()
     """
     def __init__(self, input_filepath):
         self.input_folder = os.path.dirname(input_filepath)
@@ -60,39 +168,119 @@ class SaveData(object):
     def get_filename(self):
         """ Returns the current iteration of the SceneFile object's name
         """
-        template_string_copy = config['path']['template_string']
-        
-        if self.scene_file.optional == None:
-            template_string_copy = template_string_copy.replace( '_{OPTIONAL}', '' )
-        
-        self.filename = template_string_copy.format( DESCRIPTION = self.scene_file.description,
-                                                     DISCIPLINE  = self.scene_file.discipline,
-                                                     VERSION     = '%03d' % self.scene_file.version,
-                                                     INITIALS    = self.scene_file.initials,
-                                                     OPTIONAL    = self.scene_file.optional,
-                                                     EXT         = self.scene_file.extension)
+        template = get_template(config['path']['template_string'])
+        self.filename = template.render_fields(self._filename_fields(self.scene_file))
         return self.filename
     
+    @staticmethod
+    def get_filenames(scene_files):
+        """ Renders the names of many SceneFiles at once, e.g. for a bulk rename
+        Args:
+            scene_files [SceneFile]: scene files to name
+        Returns [str]: filenames in the order of scene_files
+        """
+        return get_template(config['path']['template_string']).render_many(
+            SaveData._filename_fields(scene_file) for scene_file in scene_files)
+    
+    @staticmethod
+    def _filename_fields(scene_file):
+        return {'DESCRIPTION': scene_file.description,
+                'DISCIPLINE': scene_file.discipline,
+                'VERSION': '%03d' % scene_file.version,
+                'INITIALS': scene_file.user,
+                'OPTIONAL': scene_file.optional,
+                'EXT': scene_file.extension}
+    
+    def get_version_index(self):
+        """ Returns the VersionIndex of the current discipline folder, shared between SaveData instances
+            and brought up to date with any folders that changed since it was last used
+        """
+        return get_version_index(os.path.join(self.dir.build_path(), self._get_discipline_folder()))
+    
+    @staticmethod
+    def get_version_store(folder):
+        """ Returns the deduplicating store of the folder files are saved to, see the store module
+        Args:
+            folder (str): user folder the versions are saved in
+        Returns (store.VersionStore or None): None unless config['store']['enabled'] is set
+        """
+        if config['store']['enabled'].lower() not in ('1', 'true', 'yes', 'on'):
+            return None
+        import store
+        return store.VersionStore.from_config(config, folder)
+    
+    def get_next_version(self, user=None):
+        """ Returns the first version after every saved version of the scene file's description and discipline
+        Args:
+            user (str): only consider this user's versions, None for everyone's
+        Returns (int): next free version
+        """
+        return self.get_version_index().next_version(self.scene_file.description, self.scene_file.discipline, user)
+    
+    def get_version_history(self, limit=None, since=None, user=None):
+        """ Lists the saved versions of the scene file's description and discipline, newest first, through the
+            context service's findVersionsOfAssets query instead of listing the discipline folder
+            Answers are kept for config['cache']['version_history_ttl'] seconds so a UI can ask on every redraw,
+            since is applied to the kept answer and a publish drops the answers of its folder, see register_saved_file
+        Args:
+            limit (int): most versions returned, None for all
+            since (float or datetime): only versions saved at or after this time
+            user (str): only this user's versions, None for everyone's
+        Returns [index.Version]: (version, user, path, mtime) of each saved version
+        """
+        import services
+        since = services.timestamp(since)
+        folder = os.path.join(self.dir.build_path(), self._get_discipline_folder())
+        key = (folder, self.scene_file.description, self.scene_file.discipline, user, limit)
+        history = _version_histories.get(key)
+        if history is None:
+            asset_type = os.path.relpath(self._get_discipline_folder(),
+                                         os.path.dirname(config['path']['template_discipline_folder']))
+            history = _find_versions(self.dir.context, asset_type,
+                                     '%s_%s' % (self.scene_file.description, self.scene_file.discipline),
+                                     recent=limit if user is None else None)
+            if user is not None:
+                history = [version for version in history if version.user == user][:limit]
+            _version_histories.set(key, history, ttl=float(config['cache']['version_history_ttl']))
+        return [version for version in history if since is None or version.mtime >= since]
+    
     def _get_discipline_folder(self):
         """ Builds the final directory for the scene file's current discipline
         """
-        dir = config['discipline_LUT'][self.scene_file.discipline]
+        return self.get_discipline_folder(self.scene_file.discipline)
+    
+    @staticmethod
+    def get_discipline_folder(discipline):
+        """ Builds the folder, relative to the shot, that a discipline's files are saved in
+        Args:
+            discipline (str): discipline shorthand, e.g. MDL
+        Returns (str): folder following config['path']['template_discipline_folder']
+        """
+        dir = config['discipline_LUT'][discipline]
         if dir in config['map']['rig_disciplines']:
             dir = os.path.join('rig',dir)
-        return config['path']['template_discipline_folder'].format(dir)
+        return config['path']['template_discipline_folder'].format(DISCIPLINE=dir)
 
 
 class Directory(object):
     """ Use this class to query the path values
+        The job tree is cached lazily: a job's scenes are listed the first time they're asked for and a scene's
+        shots are only queried once get_shots asks for that scene.  Unloaded scenes show as None in tree_cache.
+        Whatever is loaded is also kept in a per-job file under config['cache']['tree_cache_dir'] which stays
+        valid until the mtime of the job folder (scene listing) or a scene folder (its shots) changes.
+        refresh_tree_async walks the tree in a background thread so a UI can draw before the tree is ready.
     Usage: 
         a = Directory()
         print a
         a.tree_cache
         a.get_scenes()
         a.get_shots('build')
+        a.invalidate('build')
+        a.refresh_tree_async(callback=lambda future: pprint(future.result()))
         a.set_cur_dir(scene='shots',shot='sh01')
         a.set_cur_dir(shot='does_not_exist')
         a.validate()
+        a.validate_scene('shots')
         a = Directory('/jobs/sourPatchKidsGumAndSlurpee_5600273/build/char_spk_amputee/maya/scenes/model/RELEASE/char_spk_amputee_lodA/v003/char_spk_amputee_lodA.ma')
         print a
     """
@@ -103,13 +291,8 @@ class Directory(object):
             context_in (dict or str): dictionary for contexts or path string.  Leave None to source from environment
         """
         if isinstance(context_in, str):
-            parse_values = self._parse_path(context_in)
             job_context = dict.fromkeys(['job','scene','shot'],None)
-            for index, key in enumerate(job_context.keys()):
-                try:
-                    job_context[key] = parse_values[index]
-                except:
-                    pass
+            job_context.update(zip(['job','scene','shot'], self._parse_path(context_in)))
             self.context = contexts.contextFactory(job_context)
         elif isinstance(context_in, dict):
             self.context = contexts.contextFactory(context_in)
@@ -117,7 +300,8 @@ class Directory(object):
             self.context = contexts.fromEnvironment()
         
         self.tree_cache = {}
-        self.refresh_tree()
+        self._disk_caches = {}
+        self._tree_lock = threading.RLock()
 
     def set_cur_dir(self, job=None, shot=None, scene=None, from_dict=None):
         """ Sets the current directory from any of: job/shot/scene OR using a dictionary following the tessa format
@@ -128,13 +312,13 @@ class Directory(object):
         orig_context = self.context
 
         if from_dict:
-            self.context = contexts.Shot.fromDict(from_dict)
+            self.context = contexts.contextFactory(from_dict)
         else:
             cur_context = dict(self.context)
             cur_context['job'] = job or cur_context['job']
             cur_context['shot'] = shot or cur_context['shot']
             cur_context['scene'] = scene or cur_context['scene']
-            self.context = contexts.Shot.fromDict(cur_context)
+            self.context = contexts.contextFactory(cur_context)
         if not self.validate():
             self.context = orig_context
             return False
@@ -145,56 +329,295 @@ class Directory(object):
         return self.context.job
     
     @staticmethod
-    def get_jobs():
-        return [path.replace('/%s/' % root,'')
-                for path in glob('/%s/*' % root)]
+    def get_jobs(prefix=None, pattern=None, active_only=False):
+        """ Lists the jobs on the server, see iter_jobs
+        Returns [str]: job names
+        """
+        return list(Directory.iter_jobs(prefix=prefix, pattern=pattern, active_only=active_only))
+    
+    @staticmethod
+    def iter_jobs(prefix=None, pattern=None, active_only=False):
+        """ Streams the job names on the server as the folder is read so callers can show the first jobs right away
+            The full listing is kept for config['cache']['job_list_ttl'] seconds and later calls filter that instead
+        Args:
+            prefix (str): only jobs starting with this
+            pattern (str or regex): only jobs this regex searches successfully
+            active_only (bool): only jobs that are folders, skipping loose files and dangling links
+        Returns (generator): job names, hidden entries are always skipped
+        """
+        pattern = re.compile(pattern) if isinstance(pattern, basestring) else pattern
+        server_path = '/%s' % config['map']['server']
+        entries = _job_list_cache.get(server_path)
+        if entries is None:
+            entries = Directory._scan_jobs(server_path)
+        
+        for name, is_dir in entries:
+            if prefix and not name.startswith(prefix):
+                continue
+            if pattern and not pattern.search(name):
+                continue
+            if active_only and not is_dir:
+                continue
+            yield name
+    
+    @staticmethod
+    def _scan_jobs(server_path):
+        """ Reads the server folder one entry at a time, caching the complete listing once it has been read through
+            Uses os.scandir (or the scandir backport) so directory checks come from the listing instead of a stat
+            A server folder that is missing or can't be read lists no jobs, and isn't cached so it's retried
+        Returns (generator): (name, is_dir) tuples
+        """
+        try:
+            if fsutil.scandir is not None:
+                listing = ((entry.name, entry.is_dir()) for entry in fsutil.scandir(server_path)
+                           if not entry.name.startswith('.'))
+            else:
+                listing = ((name, os.path.isdir(os.path.join(server_path, name)))
+                           for name in os.listdir(server_path) if not name.startswith('.'))
+            
+            entries = []
+            for name, is_dir in listing:
+                entries.append((name, is_dir))
+                yield name, is_dir
+        except OSError:
+            return
+        _job_list_cache.set(server_path, entries, ttl=float(config['cache']['job_list_ttl']))
     
     def get_shots(self, scene_name, filter=[]):
-        """ Simple query for list of shots in the current cached tree's specified scene
+        """ Simple query for list of shots in the current cached tree's specified scene, loading them on first request
         Args:
             scene_name (str): scene to be queried
             filter [str]: list of names to filter out
         Returns [str] or None: list of strings for shot names or None if scene wasn't found in current tree cache
         """
-        filter += config['map']['shot_ignore_list']
-        if scene_name in self.tree_cache[self.context.job.name].keys():
-            return [shot for shot in self.tree_cache[self.context.job.name][scene_name] if shot not in filter]
+        filter = filter + config['map']['shot_ignore_list']
+        job_name = self.context.job.name
+        if scene_name in self._get_job_tree(job_name):
+            return [shot for shot in self._get_scene_tree(job_name, scene_name) if shot not in filter]
         else:
             return None
     
     def get_scenes(self, filter=[]):
-        """ Simple query for list of scenes in the current cached tree
+        """ Simple query for list of scenes in the current cached tree, listing the job's scenes on first request
         Args:
             filter [str]: list of names to filter out
         Returns [str] or None: list of strings for shot names or None if scene wasn't found in current tree cache
         """
-        filter += config['map']['scene_ignore_list']
-        return [scene for scene in self.tree_cache[self.context.job.name].keys() if scene not in filter]
+        filter = filter + config['map']['scene_ignore_list']
+        return [scene for scene in self._get_job_tree(self.context.job.name).keys() if scene not in filter]
         
-    def refresh_tree(self):
+    def refresh_tree(self, force=True, concurrency=None):
         """ Gives us a dictionary tree with which we can browse the current job's structure
-        Args (None)
+            Blocks until every scene's shots are loaded, the scenes themselves are queried concurrently
+        Args:
+            force (bool): re-query every scene and shot, False only loads what isn't cached in memory or on disk
+            concurrency (int): shot queries in flight at once, defaults to config['services']['concurrency']
         Returns (dict): dictionary of the tree
         """
-        job = self.context.job
-        self.tree_cache = {}
-        self.tree_cache[job.name] = {}
-        for scene in job.findChildren():
-            if scene.name not in config['map']['scene_ignore_list']:
-                self.tree_cache[job.name][scene.name]=[]
-                for shot in scene.findChildren():
-                    self.tree_cache[job.name][scene.name].append(shot.name)
+        return self._load_tree(self.context.job.name, force, concurrency)
+    
+    def refresh_tree_async(self, callback=None, force=False, concurrency=None):
+        """ Loads the whole tree of the current job in a background thread
+        Args:
+            callback (function): called with the future once the tree is loaded.  It runs in the background
+                                 thread so UI code should hand it to maya.utils.executeDeferred
+            force (bool): re-query every scene and shot instead of only what isn't cached
+            concurrency (int): shot queries in flight at once, defaults to config['services']['concurrency']
+        Returns (tasks.Future): future whose result is the tree_cache
+        """
+        import tasks
+        future = tasks.submit(self._load_tree, self.context.job.name, force, concurrency)
+        if callback:
+            future.add_done_callback(callback)
+        return future
+    
+    @staticmethod
+    def find_children(contexts_in, concurrency=None):
+        """ Blocking version of find_children_async for callers that want the answer straight away, e.g. Maya UI code
+        Returns [[str]]: names of the children of each context
+        """
+        return Directory.find_children_async(contexts_in, concurrency).result()
+    
+    @staticmethod
+    def find_children_async(contexts_in, concurrency=None):
+        """ Queries the children of many contexts, e.g. the shots of every scene, with several queries in flight at once
+            Uses contexts.findChildrenBatch when the context service provides it, asking for up to
+            config['services']['children_batch_size'] contexts per call, one call per context otherwise
+        Args:
+            contexts_in [context]: contexts to list
+            concurrency (int): queries in flight at once, defaults to config['services']['concurrency']
+        Returns (tasks.Future): future whose result is the list of child names of each context, in order
+        """
+        import tasks
+        concurrency = concurrency or int(config['services']['concurrency'])
+        find_batch = getattr(contexts, 'findChildrenBatch', None)
+        if find_batch is None:
+            return tasks.map_async(_child_names, contexts_in, concurrency)
+        
+        def find_chunk(chunk):
+            found = find_batch(chunk)
+            return [[child.name for child in found.get(context, [])] for context in chunk]
+        
+        chunks = list(_chunked(contexts_in, int(config['services']['children_batch_size'])))
+        return tasks.then(tasks.map_async(find_chunk, chunks, concurrency),
+                          lambda found: [names for chunk in found for names in chunk])
+    
+    def invalidate(self, scene=None):
+        """ Forgets part of the current job's cached tree, in memory and on disk, so that it is re-queried on next access
+        Args:
+            scene (str): scene whose shots should be forgotten, None forgets the job's whole scene listing
+        """
+        self._invalidate(self.context.job.name, scene)
+    
+    def _invalidate(self, job_name, scene=None):
+        with self._tree_lock:
+            if scene is None:
+                self.tree_cache.pop(job_name, None)
+            elif scene in self.tree_cache.get(job_name, {}):
+                self.tree_cache[job_name][scene] = None
+            self._get_disk_cache(job_name).invalidate(scene)
+    
+    def _load_tree(self, job_name, force, concurrency=None):
+        """ Loads every scene of a job, passing the job name explicitly so a context change mid-walk can't mix jobs
+            Scenes missing from the memory and disk caches are queried concurrently without holding the tree lock
+        """
+        if force:
+            self._invalidate(job_name)
+        disk_cache = self._get_disk_cache(job_name)
+        with disk_cache.deferred_writes():
+            with self._tree_lock:
+                job_tree = self._get_job_tree(job_name)
+                missing = []
+                for scene_name in [scene for scene, shots in job_tree.items() if shots is None]:
+                    job_tree[scene_name] = disk_cache.get_shots(scene_name)
+                    if job_tree[scene_name] is None:
+                        missing.append(scene_name)
+            
+            scenes = [contexts.contextFactory({'job': job_name, 'scene': scene_name}) for scene_name in missing]
+            found = self.find_children_async(scenes, concurrency).result()
+            
+            with self._tree_lock:
+                for scene_name, shots in zip(missing, found):
+                    disk_cache.set_shots(scene_name, shots)
+                    if self.tree_cache.get(job_name, {}).get(scene_name, ()) is None:
+                        self.tree_cache[job_name][scene_name] = shots
         return self.tree_cache
     
+    def _get_job_tree(self, job_name):
+        """ Returns a job's {scene: [shot] or None} cache, listing the job's scenes if they aren't cached
+        """
+        with self._tree_lock:
+            if job_name not in self.tree_cache:
+                disk_cache = self._get_disk_cache(job_name)
+                scene_names = disk_cache.get_scenes()
+                if scene_names is None:
+                    job = contexts.contextFactory({'job': job_name})
+                    scene_names = [scene.name for scene in job.findChildren()
+                                   if scene.name not in config['map']['scene_ignore_list']]
+                    disk_cache.set_scenes(scene_names)
+                self.tree_cache[job_name] = dict.fromkeys(scene_names)
+            return self.tree_cache[job_name]
+    
+    def _get_scene_tree(self, job_name, scene_name):
+        """ Returns the cached shot list of a scene, querying the shots if they aren't cached
+        """
+        with self._tree_lock:
+            job_tree = self._get_job_tree(job_name)
+            if job_tree[scene_name] is None:
+                disk_cache = self._get_disk_cache(job_name)
+                shots = disk_cache.get_shots(scene_name)
+                if shots is None:
+                    shots = _child_names(contexts.contextFactory({'job': job_name, 'scene': scene_name}))
+                    disk_cache.set_shots(scene_name, shots)
+                job_tree[scene_name] = shots
+            return job_tree[scene_name]
+    
+    def _get_disk_cache(self, job_name):
+        """ Returns the on-disk tree cache of a job, a disabled cache if config['cache']['tree_cache_dir'] is empty
+        """
+        with self._tree_lock:
+            if job_name not in self._disk_caches:
+                import treecache
+                cache_dir = config['cache']['tree_cache_dir']
+                cache_file = os.path.join(os.path.expanduser(cache_dir), '%s.tree' % job_name) if cache_dir else None
+                self._disk_caches[job_name] = treecache.JobTreeCache(cache_file, '/%s/%s' % (config['map']['server'], job_name))
+            return self._disk_caches[job_name]
+    
     def build_path(self):
         """ Builds a hardlink path to the current context
         """
-        return config['path']['path_format_string'].format(JOB=self.context.job.name,SCENE=self.context.scene.name,SHOT=self.context.shot.name)
+        return get_template(config['path']['path_format_string']).render(JOB=self.context.job.name,
+                                                                          SCENE=self.context.scene.name,
+                                                                          SHOT=self.context.shot.name)
     
-    def validate(self):
+    @staticmethod
+    def build_job_path(job):
+        """ Builds the folder of a job, the part of config['path']['path_format_string'] up to {JOB}
+        Args:
+            job (str): job name
+        Returns (str): job folder
+        """
+        template = config['path']['path_format_string']
+        return get_template(template[:template.index('{JOB}') + len('{JOB}')]).render(JOB=job)
+    
+    @staticmethod
+    def build_paths(contexts_in):
+        """ Builds the paths of many contexts at once
+        Args:
+            contexts_in [context]: shot contexts
+        Returns [str]: paths in the order of contexts_in
+        """
+        levels = [dict(context) for context in contexts_in]
+        return get_template(config['path']['path_format_string']).render_many(
+            {'JOB': level['job'], 'SCENE': level['scene'], 'SHOT': level['shot']} for level in levels)
+    
+    def validate(self, context=None):
         """ Checks whether the currently set directory exists
+            Answers are remembered, valid ones for config['cache']['valid_context_ttl'] seconds and invalid ones
+            for config['cache']['invalid_context_ttl'] seconds, so browsing back and forth doesn't re-ask the service
+        Args:
+            context (context): context to check instead of the current one
+        Returns (bool): whether the context exists
+        """
+        return self.validate_many([context or self.context])[0]
+    
+    @staticmethod
+    def validate_many(contexts_in):
+        """ Validates many contexts, e.g. every shot of a scene, asking the service once for all uncached ones
+            Uses contexts.validateContexts when the context service provides it, one call per context otherwise
+        Args:
+            contexts_in [context]: contexts to check
+        Returns [bool]: whether each context exists, in input order
+        """
+        keys = [tuple(context) for context in contexts_in]
+        results = [_validation_cache.get(key) for key in keys]
+        unknown = [(key, context) for key, context, valid in zip(keys, contexts_in, results) if valid is None]
+        if unknown:
+            batch_validate = getattr(contexts, 'validateContexts', None)
+            if batch_validate is not None:
+                answers = batch_validate([context for _, context in unknown])
+            else:
+                answers = [contexts.validateContext(context) for _, context in unknown]
+            found = {}
+            for (key, _), valid in zip(unknown, answers):
+                valid = bool(valid)
+                ttl = config['cache']['valid_context_ttl' if valid else 'invalid_context_ttl']
+                _validation_cache.set(key, valid, ttl=float(ttl))
+                found[key] = valid
+            results = [found[key] if valid is None else valid for key, valid in zip(keys, results)]
+        return results
+    
+    def validate_scene(self, scene_name=None):
+        """ Validates every shot of a scene in one round trip
+        Args:
+            scene_name (str): scene to check, defaults to the current scene
+        Returns (dict): {shot name: bool}
         """
-        return contexts.validateContext(self.context)
+        job_name = self.context.job.name
+        scene_name = scene_name or self.context.scene.name
+        shots = self.get_shots(scene_name) or []
+        shot_contexts = [contexts.contextFactory({'job': job_name, 'scene': scene_name, 'shot': shot}) for shot in shots]
+        return dict(zip(shots, self.validate_many(shot_contexts)))
         
     @staticmethod
     def _parse_path(file_path):
@@ -203,7 +626,10 @@ class Directory(object):
             file_path (str): input filepath
         Returns [str]: list of strings length 3 that has the first three directories (MPC style)
         """
-        folders = [folder for folder in file_path.split('/') if folder != '' and folder != root]
+        server_folders = [folder for folder in config['map']['server'].split('/') if folder != '']
+        folders = [folder for folder in file_path.split('/') if folder != '']
+        if folders[:len(server_folders)] == server_folders:
+            folders = folders[len(server_folders):]
         return folders[:3]
     
     def __repr__(self):
@@ -211,6 +637,12 @@ class Directory(object):
         return 'Current path is %s' % self.build_path()
 
 
+_job_list_cache = cache.LRUCache(maxsize=8)
+_version_indexes = cache.LRUCache(maxsize=32)
+_version_histories = cache.LRUCache(maxsize=256)
+_validation_cache = cache.LRUCache()
+
+
 class SceneFile(object):
     """ This class will store all information relating to your scene file
     """
@@ -243,11 +675,54 @@ class SceneFile(object):
             filename (str): filename...
         Returns (SceneFile): scene file node from the init.
         """
-        version = max(cls._findVersion(filename), 1)
-        user = cls._findUser(filename)
-        discipline = cls._findDiscipline(filename)
-        description = cls._findDescription(filename, str(version), user, discipline)
-        return cls(description=description, version=version, user=user, discipline=discipline)
+        parsed = get_filename_parser().parse(filename)
+        return cls(description=parsed.description, version=parsed.version, user=parsed.user, discipline=parsed.discipline)
+
+    @classmethod
+    def parse_many(cls, filenames, workers=1, chunksize=2048, in_flight=None):
+        """ Streams parsed records for many filenames or file paths, in input order
+            Only the basename of each path is parsed, the record keeps the path as it was given.
+            With workers, at most in_flight chunks are read ahead of the records yielded so far, so streaming
+            a crawl of /jobs through stdin holds a bounded number of paths in memory.
+        Usage:
+            for record in SceneFile.parse_many(open('/tmp/job_files.txt').read().splitlines(), workers=8):
+                print record.filename, record.version
+        Args:
+            filenames (iterable): filenames or paths, consumed lazily
+            workers (int): number of processes to fan out to, 1 parses in this process, None uses every cpu
+            chunksize (int): number of filenames sent to a worker at a time
+            in_flight (int): chunks read and sent to the workers before the oldest one is waited for, defaults to
+                             twice the workers
+        Returns (generator): ParsedFilename records
+        """
+        chunks = _chunked(filenames, chunksize)
+        import multiprocessing
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        
+        if workers <= 1:
+            for chunk in chunks:
+                for record in _parse_chunk(chunk):
+                    yield record
+            return
+        
+        # Pool.imap reads its input ahead without limit, chunks are submitted by hand to bound them
+        in_flight = max(int(in_flight or workers * 2), 1)
+        pool = multiprocessing.Pool(workers)
+        try:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_parse_chunk, (chunk,)))
+                if len(pending) >= in_flight:
+                    for record in pending.popleft().get():
+                        yield record
+            while pending:
+                for record in pending.popleft().get():
+                    yield record
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
 
     @classmethod
     def _findDiscipline(cls, filename):
@@ -256,10 +731,7 @@ class SceneFile(object):
             filename (str): filename to check
         Returns (str): string for the discipline found or empty string
         """
-        discipline_matches = re.findall('(?i)'+('|'.join(config['map']['disciplines'])), filename)
-        if discipline_matches:
-            return discipline_matches[-1].upper()
-        return ""
+        return get_filename_parser().find_discipline(filename)
     
     @classmethod
     def _findUser(cls, filename):
@@ -268,11 +740,7 @@ class SceneFile(object):
             filename (str): filename to check
         Returns (str): string for the discipline found or empty string
         """
-        match = [match for match in re.findall(config['regex']['username'], filename)
-                 if match.upper() not in config['map']['disciplines']]
-        if match:
-            return match[-1].lower()
-        return ""
+        return get_filename_parser().find_user(filename)
     
     @classmethod
     def _findVersion(cls, filename):
@@ -282,17 +750,7 @@ class SceneFile(object):
             filename (str): filename to check
         Returns (int): value of version found or -1 for no version found
         """
-        result, found = -1, False
-        
-        match = re.findall(config['regex']['leading_v'], filename)
-        if match and not found:
-            result, found = match[-1], True
-        
-        match = [find for find in re.findall(config['regex']['only_numbers'], filename) if find != '']
-        if match and not found:
-            result, found = match[-1], True
-        
-        return int(result)
+        return get_filename_parser().find_version(filename)
     
     @classmethod
     def _findExt(cls, filename):
@@ -301,11 +759,7 @@ class SceneFile(object):
             filename (str): filename...
         Returns (str): file extension or ma as default
         """
-        default = config['defaults']['extension']
-        if not filename:
-            return default
-        else:
-            return os.path.splitext(filename)[-1].replace('.','') or default
+        return get_filename_parser().find_ext(filename)
     
     @classmethod
     def _findDescription(cls, filename, version, user, discipline):
@@ -317,19 +771,7 @@ class SceneFile(object):
             discipline (str): string of the discipline
         Returns (str): string for the description or "untitiled"
         """ 
-        default = config['defaults']['description']
-        indices = [filename.rfind(user), filename.rfind(version), filename.rfind(discipline)]        
-        upper_indices = [filename.rfind(user.upper()), filename.rfind(version.upper()), filename.rfind(discipline.upper())]
-        min_index = min([index for index in indices + upper_indices if index > 0])
-        try:
-            separator_index = min([index for index 
-                                   in [filename[0:min_index].rfind('.'), filename[0:min_index].rfind('_')] 
-                                   if index > 0])
-            return filename[:separator_index]
-        except ValueError as err:
-            return default
-        except TypeError as err:
-            return default
+        return get_filename_parser().find_description(filename, version, user, discipline)
         
     def __repr__(self):
         """ Returns the representation of its current contents separated by comma
@@ -339,4 +781,373 @@ class SceneFile(object):
     def __str__(self):
         """ Returns the string value of its current contents separated by comma        
         """
-        return ', '.join([self.description, str(self.version), self.discipline, self.user])
\ No newline at end of file
+        return ', '.join([self.description, str(self.version), self.discipline, self.user])
+
+
+ParsedFilename = namedtuple('ParsedFilename', ['filename', 'description', 'version', 'discipline', 'user', 'extension'])
+
+
+class FilenameParser(object):
+    """ Pulls version/user/discipline/description out of a filename in a single call.
+        The filename is split into tokens at '.' and '_' once and every field is read off those tokens:
+        a v## token or else a bare number between separators is the version, two letters or digits between
+        separators that aren't a discipline are the user, and the last discipline shorthand anywhere in a token
+        is the discipline.  Results are memoized per filename, so re-parsing the same legacy names while
+        indexing a job is a dictionary lookup.
+    Usage:
+        a = FilenameParser.from_config(config)
+        a.parse('mpc_human_rig_v02_jf.mb')
+        a.parse('mpc_human_rig_v02_jf.mb').version
+    """
+    
+    def __init__(self, disciplines, default_description, default_extension, memo_size=None):
+        """ init
+        Args:
+            disciplines [str]: discipline shorthands to search for
+            default_description (str): description used when none can be found
+            default_extension (str): extension used when none can be found
+            memo_size (int): number of parsed filenames to remember
+        """
+        self.disciplines = frozenset(disciplines)
+        self.default_description = default_description
+        self.default_extension = default_extension
+        self._split = re.compile('([._])').split
+        self._discipline_re = re.compile('(?i)' + '|'.join(disciplines))
+        self._memo = cache.LRUCache(memo_size)
+    
+    @classmethod
+    def from_config(cls, config_in):
+        """ Builds a parser from the [map], [defaults] and [cache] sections of a config dictionary
+        Args:
+            config_in (dict): config dictionary following config.ini
+        Returns (FilenameParser): new parser
+        """
+        return cls(config_in['map']['disciplines'],
+                   config_in['defaults']['description'],
+                   config_in['defaults']['extension'],
+                   memo_size=int(config_in['cache']['filename_memo_size']))
+    
+    def parse(self, filename):
+        """ Parses (or recalls) every field of a filename at once
+        Args:
+            filename (str): filename to parse
+        Returns (ParsedFilename): named tuple of the found values, version is at least 1
+        """
+        parsed = self._memo.get(filename)
+        if parsed is None:
+            version, user, discipline = self._scan(filename)
+            version = max(version, 1)
+            description = self.find_description(filename, str(version), user, discipline)
+            parsed = ParsedFilename(filename, description, version, discipline, user, self.find_ext(filename))
+            self._memo[filename] = parsed
+        return parsed
+    
+    def clear(self):
+        """ Forgets every memoized filename
+        """
+        self._memo.clear()
+    
+    def find_discipline(self, filename):
+        """ Case insensitive search for the last of the discipline shorthands
+        Returns (str): upper case discipline found or empty string
+        """
+        return self._scan(filename)[2]
+    
+    def find_user(self, filename):
+        """ Searches for the last two letter token that isn't a discipline
+        Returns (str): lower case initials found or empty string
+        """
+        return self._scan(filename)[1]
+    
+    def find_version(self, filename):
+        """ Searches for the last v## token, falling back to the last bare number
+        Returns (int): value of version found or -1 for no version found
+        """
+        return self._scan(filename)[0]
+    
+    def _scan(self, filename):
+        """ Reads the version, user and discipline off the filename's tokens in one pass.  Like the patterns
+            this replaces, a separator only counts for one v## or user token, so the token right after one
+            of those is skipped for that field
+        Returns (int, str, str): version or -1, lower case user or '', upper case discipline or ''
+        """
+        tokens = self._split(filename)[::2]
+        version = number = user = discipline = None
+        after_version = after_user = False
+        # only tokens with a separator on both sides, so neither the first token nor the extension
+        for token in tokens[1:-1]:
+            if not after_version and token[:1] in ('v', 'V') and token[1:].isdigit():
+                version, after_version = token[1:], True
+            else:
+                after_version = False
+                if token.isdigit():
+                    number = token
+            if not after_user and len(token) == 2 and token.isalnum():
+                if token.upper() not in self.disciplines:
+                    user = token
+                after_user = True
+            else:
+                after_user = False
+        for token in reversed(tokens):
+            found = self._discipline_re.findall(token)
+            if found:
+                discipline = found[-1]
+                break
+        return (int(version or number or -1),
+                user.lower() if user else '',
+                discipline.upper() if discipline else '')
+    
+    def find_ext(self, filename):
+        """ Finds the extension of a filename with '.' stripped
+        Returns (str): file extension or the default extension
+        """
+        if not filename:
+            return self.default_extension
+        return os.path.splitext(filename)[-1].replace('.','') or self.default_extension
+    
+    def find_description(self, filename, version, user, discipline):
+        """ Everything preceding the earliest of the found version/user/discipline tokens is the description
+        Args:
+            filename (str): input filename
+            version (str): string of the version number
+            user (str): string of the user initials
+            discipline (str): string of the discipline
+        Returns (str): string for the description or the default description
+        """
+        tokens = set([user, version, discipline, user.upper(), version.upper(), discipline.upper()])
+        min_index = min([index for index in [filename.rfind(token) for token in tokens] if index > 0])
+        head = filename[0:min_index]
+        try:
+            separator_index = min([index for index in [head.rfind('.'), head.rfind('_')] if index > 0])
+            return filename[:separator_index]
+        except ValueError:
+            return self.default_description
+
+
+class PathTemplate(object):
+    """ A str.format template prepared once, with a variant for every combination of optional fields left out,
+        so rendering is a dictionary lookup and one format call.  An optional field that is None is dropped
+        together with the '_' in front of it.
+    Usage:
+        a = PathTemplate('{DESCRIPTION}_{DISCIPLINE}_{VERSION}_{INITIALS}_{OPTIONAL}.{EXT}')
+        a.render(DESCRIPTION='char_santa', DISCIPLINE='MDL', VERSION='003', INITIALS='aw', OPTIONAL=None, EXT='ma')
+        a.render_many([{'DESCRIPTION': 'char_santa', ...}, {'DESCRIPTION': 'prop_sleigh', ...}])
+    """
+    
+    def __init__(self, template, optional=('OPTIONAL',)):
+        """ init
+        Args:
+            template (str): str.format template
+            optional [str]: fields that may be None
+        """
+        self.template = template
+        self.optional = tuple(field for field in optional if '{%s}' % field in template)
+        self._formats = {}
+        for count in range(len(self.optional) + 1):
+            for missing in itertools.combinations(self.optional, count):
+                variant = template
+                for field in missing:
+                    variant = variant.replace('_{%s}' % field, '').replace('{%s}' % field, '')
+                self._formats[frozenset(missing)] = variant.format
+        self._none_missing = frozenset()
+        self._one_missing = frozenset(self.optional[:1])
+    
+    def render(self, **fields):
+        """ Returns (str): the template filled in with fields
+        """
+        return self.render_fields(fields)
+    
+    def render_fields(self, fields):
+        """ Same as render, taking the fields as a dictionary
+        """
+        if len(self.optional) == 1:
+            missing = self._one_missing if fields.get(self.optional[0]) is None else self._none_missing
+            return self._formats[missing](**fields)
+        return self._formats[frozenset(field for field in self.optional if fields.get(field) is None)](**fields)
+    
+    def regex(self, patterns=None):
+        """ Builds a regex matching whatever the template renders, e.g. to check that existing names conform
+        Args:
+            patterns (dict): {field: regex} for the fields, fields left out match anything but '/'
+        Returns (re.RegexObject): anchored regex with a named group per field, optional fields may be absent
+        """
+        import string
+        parts = []
+        for literal, field, _, _ in string.Formatter().parse(self.template):
+            if field is None:
+                parts.append(re.escape(literal))
+                continue
+            group = '(?P<%s>%s)' % (field, (patterns or {}).get(field, '[^/]+?'))
+            if field in self.optional:
+                separator = '_' if literal.endswith('_') else ''
+                parts.append(re.escape(literal[:len(literal) - len(separator)]))
+                group = '(?:%s%s)?' % (re.escape(separator), group)
+            else:
+                parts.append(re.escape(literal))
+            parts.append(group)
+        return re.compile('^%s$' % ''.join(parts))
+    
+    def render_many(self, rows):
+        """ Renders many sets of fields at once
+        Args:
+            rows [dict]: fields of each result
+        Returns [str]: rendered strings in the order of rows
+        """
+        if not self.optional:
+            render = self._formats[self._none_missing]
+            return [render(**fields) for fields in rows]
+        return [self.render_fields(fields) for fields in rows]
+
+
+def get_template(template):
+    """ Returns the PathTemplate of a template string, built once per distinct string
+    """
+    path_template = _templates.get(template)
+    if path_template is None:
+        path_template = _templates[template] = PathTemplate(template)
+    return path_template
+
+_templates = {}
+
+
+def get_filename_parser():
+    """ Returns the process wide FilenameParser, building it from the config on first use
+    """
+    global _filename_parser
+    if _filename_parser is None:
+        _filename_parser = FilenameParser.from_config(config)
+    return _filename_parser
+
+_filename_parser = None
+
+
+def get_filename_regex(extensions=None):
+    """ Builds the regex a conforming scene file name matches, from config['path']['template_string'] and
+        the patterns of the [naming] section
+    Args:
+        extensions [str]: extensions a conforming name may have, defaults to config['map']['scene_extensions']
+    Returns (re.RegexObject): anchored regex with a named group per template field
+    """
+    naming = config['naming']
+    patterns = {'DESCRIPTION': naming['description'],
+                'DISCIPLINE': '|'.join(config['map']['disciplines']),
+                'VERSION': naming['version'],
+                'INITIALS': naming['initials'],
+                'OPTIONAL': naming['optional'],
+                'EXT': '|'.join(_scene_extensions() if extensions is None else extensions)}
+    return get_template(config['path']['template_string']).regex(
+        dict((field, '(?:%s)' % pattern) for field, pattern in patterns.items()))
+
+
+def get_version_index(folder):
+    """ Returns the VersionIndex of a discipline folder, shared by everything in the process and brought up to date
+        with any folders that changed since it was last used
+    Args:
+        folder (str): discipline folder, e.g. /jobs/macysSanta_5403623/build/char_santa/maya/scenes/model
+    Returns (index.VersionIndex): the folder's index
+    """
+    version_index = _version_indexes.get(folder)
+    if version_index is None:
+        import index
+        version_index = index.VersionIndex(get_filename_parser(), folder, extensions=_scene_extensions()).scan()
+        _version_indexes[folder] = version_index
+    else:
+        version_index.update()
+    return version_index
+
+
+def register_saved_file(path):
+    """ Adds a file that was just saved to the shared VersionIndex of its discipline folder, if one is loaded,
+        so the next lookup doesn't have to re-list the folder to find it, and drops the version histories kept
+        for the folder so the new version shows up straight away
+    Args:
+        path (str): saved file, in a discipline folder or one of its user folders
+    """
+    user_folder = os.path.dirname(path)
+    folders = (user_folder, os.path.dirname(user_folder))
+    for folder in folders:
+        version_index = _version_indexes.get(folder)
+        if version_index is not None:
+            version_index.add(path)
+    for key in _version_histories.keys():
+        if key[0] in folders:
+            _version_histories.pop(key)
+
+
+def _find_versions(context, asset_type, name, recent=None):
+    """ Asks the context service for the versions of one asset, through mpc.tessa.search.findVersionsOfAssets
+        when the service is mpc.tessa.contexts itself.  Versions are read through the version, user, path and
+        date attributes of services.AssetVersion, date being a datetime or seconds since the epoch
+    Args:
+        context (context): shot the asset is saved in
+        asset_type (str): folder holding the asset's files, relative to the shot's scenes folder
+        name (str): asset name, <description>_<discipline>
+        recent (int): only the latest versions, None for all
+    Returns [index.Version]: the versions, newest first
+    """
+    import importlib
+    import index
+    import services
+    find = getattr(contexts, 'findVersionsOfAssets', None)
+    if find is None:
+        find = importlib.import_module('mpc.tessa.search').findVersionsOfAssets
+    versions = []
+    for _, found in find(context, assetType=asset_type, name=name, recent=recent):
+        versions.extend(index.Version(int(version.version), version.user, version.path,
+                                      services.timestamp(version.date)) for version in found)
+    versions.sort(key=lambda version: version.version, reverse=True)
+    return versions[:recent] if recent else versions
+
+
+def _scene_extensions():
+    """ Returns [str]: config['map']['scene_extensions'], the files VersionIndexes list
+    """
+    extensions = config['map']['scene_extensions']
+    return [extensions] if isinstance(extensions, basestring) else extensions
+
+
+def _child_names(context):
+    """ Returns [str]: names of a context's children
+    """
+    return [child.name for child in context.findChildren()]
+
+def _on_config_load(sections):
+    """ Resets whatever was built from a previous config
+    """
+    global _filename_parser, _context_service
+    _filename_parser = None
+    _context_service = None
+    _validation_cache.clear()
+    _validation_cache.maxsize = int(sections['cache']['validation_cache_size'])
+    _job_list_cache.clear()
+    _version_indexes.clear()
+    _version_histories.clear()
+    _templates.clear()
+
+config.on_load(_on_config_load)
+
+
+def _parse_chunk(paths):
+    """ Parses a list of paths, module level so that it can be sent to a process pool
+    Returns [ParsedFilename]: parsed records with the filename field set to the input path
+    """
+    parser = get_filename_parser()
+    records = []
+    for path in paths:
+        filename = os.path.basename(path)
+        record = parser.parse(filename)
+        if filename != path:
+            record = record._replace(filename=path)
+        records.append(record)
+    return records
+
+
+def _chunked(iterable, size):
+    """ Lazily splits an iterable into lists of at most size items
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""
+    :module: pipeline
+    :platform: None
+    :synopsis: This module saves scene files to local scratch first and copies them to the job in the background
+    :plans:
+    Maya only waits for the write to local scratch.  The copy to the discipline folder on the network runs in a
+    worker thread, in chunks, into a temporary file next to the destination that is fsync'ed and hard linked into
+    place, so a crash or a full disk never leaves a truncated version behind and a version saved meanwhile by
+    someone else is never replaced.  The copies run on daemon threads, wait_for_pipeline holds the process open
+    until they are done and is called at exit and from Maya's quitApplication event, see view.
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import atexit
+import os
+import tempfile
+import threading
+import time
+
+# Project Imports
+import fsutil
+import model
+import tasks
+
+class SaveJob(object):
+    """ Tracks one scratch file being copied to its destination
+    Usage:
+        a = SavePipeline().publish('/tmp/mpcsave/char_santa_MDL_004_aw.ma', '/jobs/.../char_santa_MDL_004_aw.ma')
+        a.progress()
+        a.wait(timeout=60)
+    """
+
+    def __init__(self, source, destination):
+        self.source = source
+        self.destination = destination
+        self.bytes_total = os.path.getsize(source)
+        self.bytes_copied = 0
+        self.started = time.time()
+        self.finished = None
+        self.stored = None
+        self.evicted = []
+        self.store_error = None
+        self.future = None
+
+    def progress(self):
+        """ Returns (float): fraction copied, between 0 and 1
+        """
+        return float(self.bytes_copied) / self.bytes_total if self.bytes_total else float(self.done())
+
+    def done(self):
+        """ Returns (bool): whether the copy finished, successfully or not
+        """
+        return self.future is not None and self.future.done()
+
+    def wait(self, timeout=None):
+        """ Waits for the copy, re-raising its error if it failed
+        Returns (str): the destination path
+        """
+        return self.future.result(timeout)
+
+    def __repr__(self):
+        return '%s(%r, %r, %.0f%%)' % (self.__class__.__name__, self.source, self.destination, self.progress() * 100)
+
+
+class SavePipeline(object):
+    """ Writes scene files to local scratch and publishes them to the job in background workers
+    Usage:
+        a = SavePipeline.from_config(model.config)
+        job = a.save('/jobs/.../model/aweber/char_santa_MDL_004_aw.ma',
+                     lambda path: cmds.file(rn=path) and cmds.file(f=True, s=True, type='mayaAscii'),
+                     callback=lambda job: sys.stdout.write('published %s\\n' % job.destination))
+        a.pending()
+        a.wait()
+    """
+
+    def __init__(self, scratch_dir=None, chunk_size=4194304, workers=2):
+        """ init
+        Args:
+            scratch_dir (str): local folder for the first write, None uses the system temp folder
+            chunk_size (int): bytes read and written per copy step
+            workers (int): copies running at once
+        """
+        self.scratch_dir = os.path.expanduser(scratch_dir or os.path.join(tempfile.gettempdir(), 'mpcsave'))
+        self.chunk_size = chunk_size
+        self.jobs = []
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_in):
+        """ Builds a pipeline from the [pipeline] section of a config dictionary
+        Returns (SavePipeline): new pipeline
+        """
+        return cls(scratch_dir=config_in['pipeline']['scratch_dir'] or None,
+                   chunk_size=int(config_in['pipeline']['chunk_size']),
+                   workers=int(config_in['pipeline']['workers']))
+
+    def scratch_path(self, destination):
+        """ Returns (str): a fresh local path to write destination's file to first
+        """
+        if not os.path.isdir(self.scratch_dir):
+            fsutil.makedirs(self.scratch_dir)
+        handle, path = tempfile.mkstemp(prefix='%s.' % os.path.splitext(os.path.basename(destination))[0],
+                                        suffix=os.path.splitext(destination)[1], dir=self.scratch_dir)
+        os.close(handle)
+        return path
+
+    def save(self, destination, write, progress=None, callback=None, store=None):
+        """ Writes a file to local scratch and starts publishing it, returning once the local write is done
+        Args:
+            destination (str): final path of the file
+            write (function): write(path) saves the file to the given local path, e.g. through cmds.file
+            progress (function): see publish
+            callback (function): see publish
+            store (store.VersionStore): see publish
+        Returns (SaveJob): the background copy
+        """
+        source = self.scratch_path(destination)
+        try:
+            write(source)
+        except BaseException:
+            fsutil.remove(source)
+            raise
+        return self.publish(source, destination, progress=progress, callback=callback, remove_source=True,
+                            store=store)
+
+    def publish(self, source, destination, progress=None, callback=None, remove_source=False, store=None):
+        """ Copies a file to destination in a background worker
+        Args:
+            source (str): file to copy
+            destination (str): final path, its folder is created if needed.  An existing file is never replaced
+            progress (function): called with the SaveJob after every chunk, from the worker thread
+            callback (function): called with the SaveJob once it finished, from the worker thread
+            remove_source (bool): delete source once it was copied
+            store (store.VersionStore): store of destination's folder.  The file is added to it, read from the
+                                        local source, and the full files of older versions are evicted to it,
+                                        see VersionStore.evict.  The publish still succeeds if only this fails,
+                                        the error is kept in SaveJob.store_error
+        Returns (SaveJob): the background copy
+        """
+        job = SaveJob(source, destination)
+
+        def on_chunk(copied):
+            job.bytes_copied = copied
+            if progress:
+                progress(job)
+
+        def run():
+            with self._slots:
+                try:
+                    copy_atomic(source, destination, chunk_size=self.chunk_size, progress=on_chunk)
+                    model.register_saved_file(destination)
+                    if store is not None:
+                        try:
+                            job.stored = store.put(source, name=os.path.basename(destination))
+                            job.evicted = store.evict(model.get_filename_parser())
+                        except Exception as err:
+                            job.store_error = err
+                finally:
+                    job.finished = time.time()
+            if remove_source:
+                fsutil.remove(source)
+            return destination
+
+        with self._lock:
+            # finished copies are forgotten once they succeeded, failed ones stay until wait() reported them
+            self.jobs = [known for known in self.jobs if not known.done() or known.future.exception()] + [job]
+        job.future = tasks.submit(run)
+        if callback:
+            job.future.add_done_callback(lambda future: callback(job))
+        return job
+
+    def pending(self):
+        """ Returns [SaveJob]: copies that haven't finished yet
+        """
+        with self._lock:
+            return [job for job in self.jobs if not job.done()]
+
+    def wait(self, timeout=None):
+        """ Waits for every copy started so far, e.g. before Maya quits
+            A failed copy keeps its scratch file so the save isn't lost
+        Returns [SaveJob]: the copies that failed since the last wait
+        """
+        with self._lock:
+            jobs = list(self.jobs)
+        failed = []
+        for job in jobs:
+            try:
+                job.wait(timeout)
+            except tasks.TimeoutError:
+                raise
+            except Exception:
+                failed.append(job)
+        with self._lock:
+            self.jobs = [job for job in self.jobs if job not in jobs]
+        return failed
+
+
+def copy_atomic(source, destination, chunk_size=4194304, progress=None, overwrite=False):
+    """ Copies source to destination through a temporary file in the destination folder,
+        which is fsync'ed and moved into place so destination is either complete or absent
+    Args:
+        source (str): file to copy
+        destination (str): final path, its folder is created if needed
+        chunk_size (int): bytes read and written per step
+        progress (function): called with the number of bytes copied so far after every chunk
+        overwrite (bool): replace an existing destination instead of raising OSError
+    Returns (str): destination
+    """
+    def read():
+        with open(source, 'rb') as source_file:
+            for chunk in iter(lambda: source_file.read(chunk_size), ''):
+                yield chunk
+
+    return fsutil.write_atomic(destination, read(), overwrite=overwrite, progress=progress)
+
+
+def get_pipeline():
+    """ Returns the process wide SavePipeline, building it from the config on first use
+    """
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = SavePipeline.from_config(model.config)
+    return _pipeline
+
+_pipeline = None
+
+
+def wait_for_pipeline(timeout=None):
+    """ Waits for the copies of the process wide pipeline, if it was used, so quitting doesn't cut them off
+    Returns [SaveJob]: the copies that failed, their scratch files are left in place
+    """
+    if _pipeline is None:
+        return []
+    return _pipeline.wait(timeout)
+
+atexit.register(wait_for_pipeline)
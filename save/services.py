@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+"""
+    :module: services
+    :platform: None
+    :synopsis: This module contains the context services save.model can run against
+    :plans:
+    Every service offers the part of the mpc.tessa.contexts API that save.model uses: contextFactory,
+    fromEnvironment, validateContext(s), findChildrenBatch and context objects with job/scene/shot/name and findChildren.
+    The local and memory services also answer the mpc.tessa.search queries findAssets and findVersionsOfAssets.
+    Which one save.model uses is picked by config['services']['backend']:
+        tessa  - the studio's mpc.tessa.contexts, imported on first use
+        local  - folders under /<config['map']['server']>, for running anywhere with a /jobs style tree
+        memory - a fixed {job: {scene: [shot]}} tree with optional per-call latency, for tests and load tests
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import collections
+import datetime
+import importlib
+import itertools
+import os
+import re
+import threading
+import time
+
+# Project Imports
+import fsutil
+
+# One version answered by findVersionsOfAssets, date is when it was saved in seconds since the epoch or None
+AssetVersion = collections.namedtuple('AssetVersion', ['version', 'user', 'path', 'date'])
+
+# How the local and memory services group saved files into assets: <asset name>_<version>_<initials>[_<note>].<ext>
+_VERSIONED_RE = re.compile(r'^(?P<name>.+)_v?(?P<version>\d+)[a-z]?_(?P<user>[A-Za-z0-9]+)(?:_[^.]*)?\.\w+$')
+
+
+class Context(object):
+    """ Job, scene or shot context handed out by the local and memory services
+    Usage:
+        a = MemoryContexts({'macys_5403623': {'build': ['char_santa']}}).contextFactory({'job': 'macys_5403623'})
+        a.name
+        a.findChildren()
+        dict(a)
+    """
+    __levels__ = ('job', 'scene', 'shot')
+
+    def __init__(self, service, job=None, scene=None, shot=None):
+        self.service = service
+        self._job = job
+        self._scene = scene
+        self._shot = shot
+
+    def __iter__(self):
+        return iter([(level, getattr(self, '_' + level)) for level in self.__levels__])
+
+    def __eq__(self, obj):
+        return isinstance(obj, Context) and tuple(self) == tuple(obj)
+
+    def __ne__(self, obj):
+        return not (self == obj)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join('%s=%r' % item for item in self if item[1] is not None))
+
+    def __str__(self):
+        return self.name or ''
+
+    @property
+    def name(self):
+        """ The name of the deepest level that is set
+        """
+        return self._shot or self._scene or self._job
+
+    @property
+    def job(self):
+        return Context(self.service, self._job)
+
+    @property
+    def scene(self):
+        return Context(self.service, self._job, self._scene)
+
+    @property
+    def shot(self):
+        return Context(self.service, self._job, self._scene, self._shot)
+
+    def findChildren(self):
+        """ Returns [Context]: the scenes of a job or the shots of a scene, sorted by name
+        """
+        return self.service.findChildren(self)
+
+
+class _ContextService(object):
+    """ Shared behaviour of the local and memory services, subclasses answer _child_names and _exists
+    """
+
+    def __init__(self, latency=0.0):
+        """ init
+        Args:
+            latency (float): seconds to sleep per call, to model a remote service
+        """
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def contextFactory(self, context_in):
+        """ Returns (Context): context for a {'job', 'scene', 'shot'} dict or context, other levels are ignored
+        """
+        context_in = dict(context_in)
+        return Context(self, context_in.get('job'), context_in.get('scene'), context_in.get('shot'))
+
+    def fromEnvironment(self):
+        """ Returns (Context): context from the JOB, SCENE and SHOTNAME environment variables
+        """
+        job = os.getenv('JOB') or None
+        scene = os.getenv('SCENE') or None if job else None
+        shot = os.getenv('SHOTNAME') or None if scene else None
+        return Context(self, job, scene, shot)
+
+    def validateContext(self, context):
+        """ Returns (bool): whether the context exists
+        """
+        return self.validateContexts([context])[0]
+
+    def validateContexts(self, contexts):
+        """ Returns [bool]: whether each context exists, as one call
+        """
+        self._call()
+        return [self._exists(context) for context in contexts]
+
+    def findChildren(self, context):
+        """ Returns [Context]: the children of a job or scene context
+        """
+        self._call()
+        return self._children(context)
+
+    def _children(self, context):
+        job, scene, shot = [value for _, value in context]
+        if shot is not None:
+            return []
+        if scene is not None:
+            return [Context(self, job, scene, name) for name in sorted(self._child_names(context))]
+        return [Context(self, job, name) for name in sorted(self._child_names(context))]
+
+    def findChildrenBatch(self, contexts):
+        """ Returns {Context: [Context]}: the children of many job or scene contexts, as one call
+        """
+        self._call()
+        return dict((context, self._children(context)) for context in contexts)
+
+    def findAssets(self, context, assetType=None, name=None, recursive=False):
+        """ Searches the files saved in a context
+        Args:
+            context (Context): context to search
+            assetType (str): only files of this type, the discipline folder they were saved in
+            name (str): only files with this name
+            recursive (bool): include the child contexts
+        Returns (generator): (context, assetType, name) tuples
+        """
+        self._call()
+        for found_context in self._walk(context, recursive):
+            for found_type, found_name in self._assets(found_context):
+                if assetType is not None and found_type != assetType:
+                    continue
+                if name is not None and found_name != name:
+                    continue
+                yield found_context, found_type, found_name
+
+    def findAssetsPage(self, context, assetType=None, name=None, recursive=False, limit=500, cursor=None):
+        """ One page of findAssets, walking the contexts lazily so only the page is held in memory
+        Args:
+            context, assetType, name, recursive: see findAssets
+            limit (int): most results returned
+            cursor (str): cursor of the previous page, None for the first page
+        Returns (list, str): (context, assetType, name) tuples and the cursor of the next page, None after the last
+        """
+        offset = int(cursor or 0)
+        found = list(itertools.islice(self.findAssets(context, assetType, name, recursive), offset, offset + limit + 1))
+        if len(found) > limit:
+            return found[:limit], str(offset + limit)
+        return found, None
+
+    def findVersionsOfAssets(self, context, assetType=None, name=None, recursive=False, startDateTime=None,
+                             endDateTime=None, recent=None):
+        """ Lists the versions of the assets saved in a context like mpc.tessa.search.findVersionsOfAssets, where
+            an asset is every version of a scene file, e.g. char_santa_MDL for char_santa_MDL_004_aw.ma
+        Args:
+            context, assetType, recursive: see findAssets
+            name (str or [str]): only these assets
+            startDateTime, endDateTime (datetime or float): only versions saved in this window
+            recent (int): only the latest versions of each asset
+        Returns (generator): ((context, assetType, name), (AssetVersion,)) tuples, versions newest first
+        """
+        self._call()
+        names = None if name is None else frozenset([name] if isinstance(name, basestring) else name)
+        start, end = timestamp(startDateTime), timestamp(endDateTime)
+        for found_context in self._walk(context, recursive):
+            assets = {}
+            for found_type, filename, path, date in self._versions(found_context, assetType):
+                match = _VERSIONED_RE.match(filename)
+                if not match or (names is not None and match.group('name') not in names):
+                    continue
+                if (start is not None or end is not None) and date is None:
+                    continue
+                if (start is not None and date < start) or (end is not None and date > end):
+                    continue
+                assets.setdefault((found_type, match.group('name')), []).append(
+                    AssetVersion(int(match.group('version')), match.group('user'), path, date))
+            for (found_type, found_name), versions in sorted(assets.items()):
+                versions.sort(key=lambda version: version.version, reverse=True)
+                yield (found_context, found_type, found_name), tuple(versions[:recent] if recent else versions)
+
+    def _walk(self, context, recursive):
+        yield context
+        if recursive:
+            job, scene, shot = [value for _, value in context]
+            if shot is None:
+                for child in self.findChildren(context):
+                    for found in self._walk(child, recursive):
+                        yield found
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _child_names(self, context):
+        raise NotImplementedError # pragma: no cover
+
+    def _exists(self, context):
+        raise NotImplementedError # pragma: no cover
+
+    def _assets(self, context):
+        raise NotImplementedError # pragma: no cover
+
+    def _versions(self, context, assetType):
+        """ Returns (generator): (assetType, file name, path, date) of the files saved in a context
+        """
+        for found_type, found_name in self._assets(context):
+            if assetType is None or found_type == assetType:
+                yield found_type, found_name, None, None
+
+
+class MemoryContexts(_ContextService):
+    """ Context service answering from a fixed tree held in memory
+    Usage:
+        a = MemoryContexts({'macys_5403623': {'build': ['char_santa', 'prop_sleigh']}},
+                           assets={('macys_5403623', 'build', 'char_santa'): [('model', 'char_santa_MDL_001_aw.ma')]},
+                           latency=0.002)
+        a.contextFactory({'job': 'macys_5403623', 'scene': 'build'}).findChildren()
+    """
+
+    def __init__(self, tree, assets=None, latency=0.0):
+        """ init
+        Args:
+            tree (dict): {job: {scene: [shot]}}
+            assets (dict): {(job, scene, shot): [(assetType, name)]}
+            latency (float): seconds to sleep per call
+        """
+        super(MemoryContexts, self).__init__(latency)
+        self.tree = tree
+        self.assets = assets or {}
+
+    def _child_names(self, context):
+        job, scene, _ = [value for _, value in context]
+        if scene is None:
+            return self.tree.get(job, {}).keys()
+        return self.tree.get(job, {}).get(scene, [])
+
+    def _exists(self, context):
+        job, scene, shot = [value for _, value in context]
+        if job not in self.tree:
+            return False
+        if scene is not None and scene not in self.tree[job]:
+            return False
+        return shot is None or shot in self.tree[job][scene]
+
+    def _assets(self, context):
+        return self.assets.get(tuple(value for _, value in context), [])
+
+
+class LocalContexts(_ContextService):
+    """ Context service reading the job/scene/shot folders of a /jobs style tree
+    Usage:
+        a = LocalContexts('/jobs')
+        a.contextFactory({'job': 'macys_5403623'}).findChildren()
+        list(a.findAssets(a.contextFactory({'job': 'macys_5403623', 'scene': 'build'}), recursive=True))
+    """
+
+    def __init__(self, root, scenes_folder='maya/scenes', latency=0.0):
+        """ init
+        Args:
+            root (str): folder holding the jobs
+            scenes_folder (str): folder under a shot whose subfolders hold saved files per asset type
+            latency (float): seconds to sleep per call
+        """
+        super(LocalContexts, self).__init__(latency)
+        self.root = root
+        self.scenes_folder = scenes_folder
+
+    def path(self, context):
+        """ Returns (str): folder of a context
+        """
+        return os.path.join(self.root, *[value for _, value in context if value is not None])
+
+    def _child_names(self, context):
+        return [name for name, is_dir in _list(self.path(context)) if is_dir]
+
+    def _exists(self, context):
+        return os.path.isdir(self.path(context))
+
+    def _versions(self, context, assetType):
+        """ Files below <shot>/<scenes_folder>/<assetType> with their paths and modification times, only the
+            assetType folder is read when one is given
+        """
+        if dict(context).get('shot') is None:
+            return
+        scenes_path = os.path.join(self.path(context), self.scenes_folder)
+        asset_types = [assetType] if assetType else [name for name, is_dir in _list(scenes_path) if is_dir]
+        for asset_type in asset_types:
+            for folder, folders, filenames in os.walk(os.path.join(scenes_path, asset_type)):
+                folders[:] = [name for name in folders if not name.startswith('.')]
+                for filename in filenames:
+                    if filename.startswith('.'):
+                        continue
+                    path = os.path.join(folder, filename)
+                    try:
+                        date = os.stat(path).st_mtime
+                    except OSError:
+                        continue
+                    yield asset_type, filename, path, date
+
+    def _assets(self, context):
+        """ Files below <shot>/<scenes_folder>/<assetType>, user subfolders included
+        """
+        if context._shot is None:
+            return
+        scenes_path = os.path.join(self.path(context), self.scenes_folder)
+        for asset_type, is_dir in _list(scenes_path):
+            if not is_dir:
+                continue
+            for folder, _, filenames in os.walk(os.path.join(scenes_path, asset_type)):
+                for filename in filenames:
+                    if not filename.startswith('.'):
+                        yield asset_type, filename
+
+
+def _list(folder):
+    """ Returns [(str, bool)]: (name, is_dir) of a folder's visible entries, nothing if it can't be read
+    """
+    try:
+        if fsutil.scandir is not None:
+            return [(entry.name, entry.is_dir()) for entry in fsutil.scandir(folder) if not entry.name.startswith('.')]
+        return [(name, os.path.isdir(os.path.join(folder, name)))
+                for name in os.listdir(folder) if not name.startswith('.')]
+    except OSError:
+        return []
+
+
+def timestamp(value):
+    """ Returns (float): seconds since the epoch of a datetime, floats and None are passed through
+    """
+    if isinstance(value, datetime.datetime):
+        return time.mktime(value.timetuple()) + value.microsecond / 1e6
+    return value
+
+
+def from_config(config_in):
+    """ Builds the context service named by config['services']['backend']
+    Args:
+        config_in (dict): config dictionary following config.ini
+    Returns (object): mpc.tessa.contexts, a LocalContexts or an empty MemoryContexts
+    """
+    backend = config_in['services']['backend']
+    latency = float(config_in['services'].get('latency') or 0.0)
+    if backend == 'tessa':
+        return importlib.import_module('mpc.tessa.contexts')
+    if backend == 'local':
+        return LocalContexts('/%s' % config_in['map']['server'],
+                             scenes_folder=os.path.dirname(config_in['path']['template_discipline_folder']),
+                             latency=latency)
+    if backend == 'memory':
+        return MemoryContexts({}, latency=latency)
+    raise ValueError("Unknown context service %r in config['services']['backend']" % backend)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+"""
+    :module: store
+    :platform: None
+    :synopsis: This module contains a deduplicating, content addressed store for saved scene files
+    :plans:
+    Files are cut into chunks where the content says so (see iter_chunks) rather than at fixed offsets, so
+    inserting or deleting a few nodes in a .ma only changes the chunks around the edit.  Each chunk is kept
+    once under its sha1 and a version is a small manifest listing its chunks, which is what makes keeping
+    hundreds of near identical versions of a shot cheap.  Versions are turned back into files on demand.
+    Every user folder can keep a store in its .store subfolder.  Publishing puts the new version in it and evict()
+    then removes the full files of all but the latest keep versions, which from then on only exist as manifests.
+    Like delta archives, VersionIndex lists them under their original names and restore() writes them back out.
+    Versions a delta archive is taken against are never evicted, delta.reconstruct needs their full file.
+    New chunks are written without fsync and flushed together before the manifest listing them is written, so
+    a publish costs one round of fsyncs on network storage rather than two per chunk.
+    put() and gc() lock the store against each other where fcntl is available, gc() must not run while files
+    are saved on platforms without it.
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import collections
+import contextlib
+import errno
+import hashlib
+import json
+import os
+import zlib
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Project Imports
+import delta
+import fsutil
+
+STORE_FOLDER = '.store'
+
+# One put() into a VersionStore.  new_bytes is what actually had to be written
+StoreResult = collections.namedtuple('StoreResult', ['name', 'size', 'chunks', 'new_chunks', 'new_bytes'])
+
+
+def iter_chunks(file_in, mask_bits=10, min_size=16384, max_size=1048576):
+    """ Content defined chunking anchored on lines: a chunk ends after a line whose crc32 has its low mask_bits
+        bits all zero, once the chunk holds min_size bytes.  Lines are used as the unit because .ma files
+        are line based and hashing whole lines with zlib.crc32 is far cheaper in Python than a byte-wise
+        rolling hash.  Binary files without many line breaks are still cut at max_size.
+    Args:
+        file_in (file): file opened in binary mode
+        mask_bits (int): about one line in 2 ** mask_bits ends a chunk
+        min_size (int): smallest chunk, apart from the last one
+        max_size (int): largest chunk
+    Returns (generator): chunks as strings
+    """
+    mask = (1 << mask_bits) - 1
+    chunk, size = [], 0
+    while True:
+        line = file_in.readline(max_size - size)
+        if not line:
+            break
+        chunk.append(line)
+        size += len(line)
+        if size >= max_size or (size >= min_size and not zlib.crc32(line) & mask):
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+class VersionStore(object):
+    """ Deduplicating store of file versions, usually a hidden folder inside a discipline folder so that
+        VersionIndex and the job listings skip it
+    Usage:
+        a = VersionStore('/jobs/macysSanta_5403623/build/char_santa/maya/scenes/model/aweber/.store')
+        a.put('/jobs/.../model/aweber/char_santa_MDL_004_aw.ma')
+        a.evict(model.get_filename_parser())
+        a.names()
+        a.materialize('char_santa_MDL_001_aw.ma', '/tmp/char_santa_MDL_001_aw.ma')
+        a.remove('char_santa_MDL_001_aw.ma')
+        a.gc()
+    """
+
+    def __init__(self, root, compress=True, mask_bits=10, min_size=16384, max_size=1048576, keep=3):
+        """ init
+        Args:
+            root (str): folder holding the store, the versions it evicts are the ones in its parent folder
+            compress (bool): zlib chunks as they are written
+            mask_bits, min_size, max_size: chunking parameters, see iter_chunks
+            keep (int): latest versions evict() leaves as full files
+        """
+        self.root = root
+        self.keep = keep
+        self.compress = compress
+        self.mask_bits = mask_bits
+        self.min_size = min_size
+        self.max_size = max_size
+
+    @classmethod
+    def from_config(cls, config_in, folder):
+        """ Builds the store of a user folder from the [store] section of a config dictionary
+        Args:
+            config_in (dict): config dictionary following config.ini
+            folder (str): folder the versions are saved in
+        Returns (VersionStore): new store
+        """
+        store_config = config_in['store']
+        return cls(os.path.join(folder, STORE_FOLDER),
+                   compress=store_config['compress'].lower() in ('1', 'true', 'yes', 'on'),
+                   mask_bits=int(store_config['mask_bits']),
+                   min_size=int(store_config['min_chunk_size']),
+                   max_size=int(store_config['max_chunk_size']),
+                   keep=int(store_config['keep']))
+
+    def put(self, path, name=None):
+        """ Stores a file, writing only the chunks the store doesn't have yet
+        Args:
+            path (str): file to store
+            name (str): name to store it under, defaults to the file's name
+        Returns (StoreResult): what was stored
+        """
+        name = name or os.path.basename(path)
+        file_hash = hashlib.sha1()
+        chunks, written, new_bytes, size = [], [], 0, 0
+        # gc() waits until the manifest is written, a chunk found here can't be collected before it refers to it
+        with self._locked(exclusive=False), open(path, 'rb') as file_in:
+            for chunk in iter_chunks(file_in, self.mask_bits, self.min_size, self.max_size):
+                file_hash.update(chunk)
+                digest = hashlib.sha1(chunk).hexdigest()
+                chunk_path = self._write_chunk(digest, chunk)
+                if chunk_path:
+                    written.append(chunk_path)
+                    new_bytes += len(chunk)
+                chunks.append([digest, len(chunk)])
+                size += len(chunk)
+            mtime = os.stat(path).st_mtime
+            manifest = {'format': 1, 'name': name, 'size': size, 'sha1': file_hash.hexdigest(),
+                        'mtime': mtime, 'chunks': chunks}
+            # the chunks have to be on disk before a manifest refers to them
+            fsutil.fsync_files(written)
+            fsutil.write_atomic(self._manifest_path(name), json.dumps(manifest))
+            # like delta archives, the manifest carries the modification time of the version it stands in for
+            os.utime(self._manifest_path(name), (mtime, mtime))
+        return StoreResult(name, size, len(chunks), len(written), new_bytes)
+
+    def evict(self, parser, keep=None, extensions=('ma', 'mb')):
+        """ Removes the full files of all but the latest keep versions of every description/discipline/user
+            in the store's folder, once they are in the store.  Each one is put() again first so its manifest
+            is known to match the file being removed.  Versions a delta archive in the folder is taken against
+            are kept, see delta.archived_bases
+        Args:
+            parser (model.FilenameParser): parser used to group the files
+            keep (int): latest versions left as full files, defaults to the store's keep, at least 1
+            extensions [str]: scene formats to evict
+        Returns [StoreResult]: the versions whose full file was removed
+        """
+        keep = max(int(self.keep if keep is None else keep), 1)
+        folder = os.path.dirname(self.root)
+        bases = delta.archived_bases(folder)
+        groups = {}
+        for name in os.listdir(folder):
+            if name.startswith('.') or name in bases or not os.path.isfile(os.path.join(folder, name)):
+                continue
+            parsed = parser.parse(name)
+            if parsed.extension.lower() in extensions:
+                key = (parsed.description, parsed.discipline, parsed.user, parsed.extension.lower())
+                groups.setdefault(key, []).append((parsed.version, name))
+        results = []
+        for key in sorted(groups):
+            for _, name in sorted(groups[key])[:-keep]:
+                path = os.path.join(folder, name)
+                results.append(self.put(path))
+                os.remove(path)
+        if results:
+            fsutil.fsync_folder(folder)
+        return results
+
+    def manifest(self, name):
+        """ Returns (dict): the manifest of a stored version
+        """
+        with open(self._manifest_path(name), 'rb') as manifest_file:
+            return json.load(manifest_file)
+
+    def names(self):
+        """ Returns [str]: names of the stored versions, sorted
+        """
+        try:
+            return sorted(filename[:-len('.json')] for filename in os.listdir(os.path.join(self.root, 'manifests'))
+                          if filename.endswith('.json'))
+        except OSError:
+            return []
+
+    def __contains__(self, name):
+        return os.path.exists(self._manifest_path(name))
+
+    def iter_content(self, name):
+        """ Streams a stored version's content chunk by chunk
+        Returns (generator): chunks as strings
+        """
+        for digest, size in self.manifest(name)['chunks']:
+            yield self._read_chunk(digest)
+
+    def materialize(self, name, destination):
+        """ Writes a stored version back out as a file of its own, never sharing storage with the chunks
+        Args:
+            name (str): stored version
+            destination (str): file to create, replaced if it exists
+        Returns (str): destination
+        """
+        manifest = self.manifest(name)
+        file_hash = hashlib.sha1()
+
+        def verified():
+            for chunk in self.iter_content(name):
+                file_hash.update(chunk)
+                yield chunk
+            if file_hash.hexdigest() != manifest['sha1']:
+                raise IOError('%s is corrupt in %s' % (name, self.root))
+
+        fsutil.write_atomic(destination, verified())
+        os.utime(destination, (manifest['mtime'], manifest['mtime']))
+        return destination
+
+    def remove(self, name):
+        """ Forgets a stored version, its chunks are only deleted by gc()
+        """
+        try:
+            os.remove(self._manifest_path(name))
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+
+    def gc(self):
+        """ Deletes the chunks no stored version refers to any more, while no put() is running
+        Returns (int): bytes freed
+        """
+        freed = 0
+        with self._locked(exclusive=True):
+            referenced = set()
+            for name in self.names():
+                referenced.update(digest for digest, _ in self.manifest(name)['chunks'])
+            for path, digest in _list_objects(os.path.join(self.root, 'chunks')):
+                if digest not in referenced:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        return freed
+
+    def stats(self):
+        """ Returns (dict): number of versions, their total size and the bytes the chunks take on disk
+        """
+        names = self.names()
+        logical = sum(self.manifest(name)['size'] for name in names)
+        stored = sum(os.path.getsize(path) for path, _ in _list_objects(os.path.join(self.root, 'chunks')))
+        return {'versions': len(names), 'logical_bytes': logical, 'stored_bytes': stored}
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        """ Holds a shared (put) or exclusive (gc) lock on the store's lock file, where fcntl is available
+        """
+        if fcntl is None:
+            yield
+            return
+        if not os.path.isdir(self.root):
+            fsutil.makedirs(self.root)
+        with open(os.path.join(self.root, 'lock'), 'a+') as lock_file:
+            fcntl.lockf(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.lockf(lock_file, fcntl.LOCK_UN)
+
+    def _manifest_path(self, name):
+        return os.path.join(self.root, 'manifests', name + '.json')
+
+    def _chunk_path(self, digest, compressed):
+        """ Compressed chunks end in .z so a store can hold both kinds after compress was changed
+        """
+        return os.path.join(self.root, 'chunks', digest[:2], digest[2:] + ('.z' if compressed else ''))
+
+    def _write_chunk(self, digest, chunk):
+        """ Writes a chunk the store doesn't have yet, without fsync, see put()
+        Returns (str): path of the new chunk file, None if the store already had the chunk
+        """
+        if os.path.exists(self._chunk_path(digest, True)) or os.path.exists(self._chunk_path(digest, False)):
+            return None
+        return fsutil.write_atomic(self._chunk_path(digest, self.compress),
+                                   zlib.compress(chunk, 1) if self.compress else chunk, sync=False)
+
+    def _read_chunk(self, digest):
+        for compressed in (True, False):
+            try:
+                with open(self._chunk_path(digest, compressed), 'rb') as chunk_file:
+                    data = chunk_file.read()
+            except IOError as err:
+                if err.errno != errno.ENOENT:
+                    raise
+                continue
+            return zlib.decompress(data) if compressed else data
+        raise IOError(errno.ENOENT, 'Missing chunk %s' % digest, self.root)
+
+
+def stored_names(folder):
+    """ Returns [str]: names of the versions in a folder's store, whether or not their full file is still there
+    """
+    try:
+        return [name[:-len('.json')] for name in os.listdir(os.path.join(folder, STORE_FOLDER, 'manifests'))
+                if name.endswith('.json')]
+    except OSError:
+        return []
+
+
+def manifest_path(path):
+    """ Returns (str): the manifest a version is kept as in its folder's store, which has the version's
+        modification time
+    """
+    return _store_of(path)._manifest_path(os.path.basename(path))
+
+
+def is_stored(path):
+    """ Returns (bool): whether path's full file was evicted and only its manifest is left in the folder's store
+    """
+    return not os.path.exists(path) and os.path.exists(manifest_path(path))
+
+
+def restore(path):
+    """ Writes an evicted version back out at its original path
+    Returns (str): path
+    """
+    return _store_of(path).materialize(os.path.basename(path), path)
+
+
+def _store_of(path):
+    return VersionStore(os.path.join(os.path.dirname(path), STORE_FOLDER))
+
+
+def _list_objects(folder):
+    """ Returns (generator): (path, digest) of the chunks in a chunks folder
+    """
+    if not os.path.isdir(folder):
+        return
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if os.path.isdir(path):
+            for sub_name in os.listdir(path):
+                if not sub_name.startswith('.'):
+                    yield os.path.join(path, sub_name), name + sub_name.split('.')[0]
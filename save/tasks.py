@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+"""
+    :module: tasks
+    :platform: None
+    :synopsis: This module contains a minimal future/background thread helper (Maya's python has no concurrent.futures)
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import Queue
+import sys
+import threading
+
+
+class TimeoutError(Exception):
+    """ Raised when a Future's result isn't ready within the given timeout
+    """
+
+
+class Future(object):
+    """ Holds the eventual result of a call running in another thread
+    Usage:
+        a = submit(sum, [1, 2, 3])
+        a.done()
+        a.result(timeout=5)
+        a.add_done_callback(lambda future: future.result())
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        """ Returns (bool): True once the call has finished, successfully or not
+        """
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """ Waits for and returns the call's return value, re-raising its exception if it failed
+        Args:
+            timeout (float): seconds to wait, None waits forever
+        Returns (object): return value of the call
+        """
+        self._wait(timeout)
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        """ Waits for the call and returns the exception it raised
+        Returns (Exception): the exception or None if the call succeeded
+        """
+        self._wait(timeout)
+        return self._exc_info[1] if self._exc_info else None
+
+    def add_done_callback(self, callback):
+        """ Calls callback(future) once the call finishes, immediately if it already has
+            Callbacks run in the thread that finished the call, not the caller's thread
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exc_info(self, exc_info):
+        self._exc_info = exc_info
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as err:
+                sys.stderr.write('Future callback %r failed: %s\n' % (callback, err))
+
+    def _wait(self, timeout):
+        if not self._done.wait(timeout) and not self.done():
+            raise TimeoutError('Result not ready after %s seconds' % timeout)
+
+
+def submit(function, *args, **kwargs):
+    """ Runs function(*args, **kwargs) in a daemon thread
+    Returns (Future): future for the call's result
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException:
+            future.set_exc_info(sys.exc_info())
+
+    thread = threading.Thread(target=run, name='mpcsave-%s' % getattr(function, '__name__', 'task'))
+    thread.daemon = True
+    thread.start()
+    return future
+
+
+def then(future, function):
+    """ Chains function onto a future without blocking, e.g. to reshape a result
+    Returns (Future): future for function(future.result()), failing with the original error if future failed
+    """
+    chained = Future()
+
+    def run(done):
+        try:
+            chained.set_result(function(done.result()))
+        except BaseException:
+            chained.set_exc_info(sys.exc_info())
+
+    future.add_done_callback(run)
+    return chained
+
+
+def map_async(function, items, concurrency=8):
+    """ Runs function(item) for every item with at most concurrency calls in flight, e.g. one service query per scene
+        Once a call fails no new items are started and the future re-raises that failure
+    Args:
+        function (function): called once per item from a worker thread
+        items [object]: arguments, one call each
+        concurrency (int): number of worker threads
+    Returns (Future): future whose result is the list of return values in the order of items
+    """
+    items = list(items)
+    future = Future()
+    results = [None] * len(items)
+    state = {'next': 0, 'running': max(1, min(int(concurrency), len(items))), 'exc_info': None}
+    lock = threading.Lock()
+
+    if not items:
+        future.set_result(results)
+        return future
+
+    def work():
+        while True:
+            with lock:
+                index = state['next']
+                if index >= len(items) or state['exc_info']:
+                    state['running'] -= 1
+                    finished = not state['running']
+                    break
+                state['next'] += 1
+            try:
+                results[index] = function(items[index])
+            except BaseException:
+                with lock:
+                    state['exc_info'] = state['exc_info'] or sys.exc_info()
+        if finished:
+            if state['exc_info']:
+                future.set_exc_info(state['exc_info'])
+            else:
+                future.set_result(results)
+
+    for worker in range(state['running']):
+        thread = threading.Thread(target=work, name='mpcsave-%s-%d' % (getattr(function, '__name__', 'task'), worker))
+        thread.daemon = True
+        thread.start()
+    return future
+
+
+def imap_unordered(function, items, concurrency=8):
+    """ Streams function(item) for every item as each call finishes, with at most concurrency calls in flight.
+        Unlike map_async, items are pulled lazily (they may be a generator, even one that is itself waiting on
+        other threads) and nothing is kept once it has been yielded, so it suits walking very large trees.
+        The first failure is re-raised in the consuming thread and stops new items from being started.
+    Args:
+        function (function): called once per item from a worker thread
+        items (iterable): arguments, one call each
+        concurrency (int): number of worker threads
+    Returns (generator): return values in the order the calls finished
+    """
+    iterator = iter(items)
+    results = Queue.Queue()
+    lock = threading.Lock()
+    stop = threading.Event()
+    finished = object()
+
+    def work():
+        try:
+            while not stop.is_set():
+                with lock:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                results.put((True, function(item)))
+        except BaseException:
+            results.put((False, sys.exc_info()))
+        finally:
+            results.put(finished)
+
+    running = max(1, int(concurrency))
+    for worker in range(running):
+        thread = threading.Thread(target=work, name='mpcsave-%s-%d' % (getattr(function, '__name__', 'task'), worker))
+        thread.daemon = True
+        thread.start()
+    try:
+        while running:
+            try:
+                # a timeout keeps the wait interruptible with ctrl+c
+                entry = results.get(True, 1.0)
+            except Queue.Empty:
+                continue
+            if entry is finished:
+                running -= 1
+                continue
+            succeeded, value = entry
+            if not succeeded:
+                raise value[0], value[1], value[2]
+            yield value
+    finally:
+        stop.set()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+    :module: test_assettypes
+    :platform: None
+    :synopsis: This module tests the assettypes.py module against fake definitions
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import unittest
+from save import assettypes
+
+
+class AssetTypeNotFound(Exception):
+    pass
+
+
+class Shot(object):
+    pass
+
+
+class Job(object):
+    pass
+
+
+class FakeDefinitions(object):
+    """ Resolves every asset type except 'unknown' to its name, counting the lookups
+    """
+    def __init__(self):
+        self.calls = []
+
+    def getDefinitionObject(self, context, assetType):
+        self.calls.append((type(context).__name__, assetType))
+        if assetType == 'unknown':
+            raise AssetTypeNotFound(assetType)
+        return assetType
+
+    def checkAssetTypeForContext(self, assetTypeObj, context):
+        pass
+
+
+class TestAssetTypes(unittest.TestCase):
+
+    def setUp(self):
+        self.definitions = FakeDefinitions()
+        self.originals = (assettypes.definitions, assettypes.exceptions, assettypes._MISSING_ASSET_TYPE_TTL)
+        assettypes.definitions = self.definitions
+        assettypes.exceptions = type('E', (object,), {'AssetTypeNotFound': AssetTypeNotFound})
+        assettypes.invalidateAssetTypes()
+
+    def tearDown(self):
+        assettypes.invalidateAssetTypes()
+        assettypes.definitions, assettypes.exceptions, assettypes._MISSING_ASSET_TYPE_TTL = self.originals
+
+    def testGetAssetTypeObject_cache_hits(self):
+        self.assertEqual(assettypes.getAssetTypeObject(Shot(), 'model'), 'model')
+        self.assertEqual(assettypes.getAssetTypeObject(Shot(), 'model'), 'model')
+        self.assertEqual(assettypes.getAssetTypeObject(Shot(), 'rig'), 'rig')
+        self.assertEqual(assettypes.getAssetTypeObject(Job(), 'model'), 'model')
+        self.assertEqual(self.definitions.calls, [('Shot', 'model'), ('Shot', 'rig'), ('Job', 'model')])
+
+    def testGetAssetTypeObject_missing_types_expire(self):
+        self.assertTrue(assettypes.getAssetTypeObject(Shot(), 'unknown') is assettypes._MissingAssetType)
+        assettypes.getAssetTypeObject(Shot(), 'unknown')
+        self.assertEqual(len(self.definitions.calls), 1)
+        assettypes.invalidateAssetTypes()
+        assettypes._MISSING_ASSET_TYPE_TTL = -1
+        assettypes.getAssetTypeObject(Shot(), 'unknown')
+        assettypes.getAssetTypeObject(Shot(), 'unknown')
+        self.assertEqual(len(self.definitions.calls), 3)
+
+    def testInvalidateAssetTypes_one_type(self):
+        for context in (Shot(), Job()):
+            assettypes.getAssetTypeObject(context, 'model')
+            assettypes.getAssetTypeObject(context, 'rig')
+        assettypes.invalidateAssetTypes('model')
+        for context in (Shot(), Job()):
+            assettypes.getAssetTypeObject(context, 'model')
+            assettypes.getAssetTypeObject(context, 'rig')
+        self.assertEqual(self.definitions.calls[4:], [('Shot', 'model'), ('Job', 'model')])
+
+    def testInvalidateAssetTypes_every_type(self):
+        assettypes.getAssetTypeObject(Shot(), 'model')
+        assettypes.getAssetTypeObject(Shot(), 'rig')
+        assettypes.invalidateAssetTypes()
+        assettypes.getAssetTypeObject(Shot(), 'model')
+        assettypes.getAssetTypeObject(Shot(), 'rig')
+        self.assertEqual(len(self.definitions.calls), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+    :module: test_audit
+    :platform: None
+    :synopsis: This module tests the audit.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from save import audit, delta, model
+
+class TestJobAudit(unittest.TestCase):
+
+    def setUp(self):
+        self.job = tempfile.mkdtemp()
+        self.scenes = os.path.join(self.job, 'build', 'char_santa', 'maya', 'scenes')
+        self._save('model/aweber', 'char_santa_MDL_001_aw.ma')
+        self._save('model/aweber', 'char_santa_MDL_002_aw.ma')
+        self._save('model/jfrank', 'char_santa_MDL_002_jf.ma')
+        self._save('model/jfrank', 'char_santa_MDL_005_jf.ma')
+        self._save('model/jfrank', 'notes.txt')
+        self._save('anim/aweber', 'char_santa_ANIM_001_aw_blocking.ma')
+        self._save('anim/aweber', 'char_santa_ANIM_002_aw.ma')
+        self._save('anim/aweber', 'char_santa_anim_v3.ma')
+        os.makedirs(os.path.join(self.job, 'reference', 'char_santa', 'maya', 'scenes', 'model'))
+        os.makedirs(os.path.join(self.job, 'shots', 'sh010', 'maya', 'scenes', 'lighting'))
+        self.audit = audit.JobAudit.from_config(model.config, self.job, workers=4)
+
+    def tearDown(self):
+        shutil.rmtree(self.job)
+
+    def _save(self, folder, filename):
+        folder = os.path.join(self.scenes, folder)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        open(os.path.join(folder, filename), 'w').close()
+
+    def testJobAudit_discipline_folders(self):
+        self.assertEqual(sorted(self.audit.discipline_folders()),
+                         [('build', 'char_santa', os.path.join(self.scenes, 'anim')),
+                          ('build', 'char_santa', os.path.join(self.scenes, 'model')),
+                          ('shots', 'sh010', os.path.join(self.job, 'shots', 'sh010', 'maya', 'scenes', 'lighting'))])
+
+    def testJobAudit_issues(self):
+        issues = sorted((issue.kind, os.path.basename(issue.folder), issue.versions,
+                         [os.path.basename(path) for path in issue.paths]) for issue in self.audit.run())
+        self.assertEqual(issues, [('duplicate', 'model', [2], ['char_santa_MDL_002_aw.ma', 'char_santa_MDL_002_jf.ma']),
+                                  ('gap', 'model', [3, 4], []),
+                                  ('nonconforming', 'anim', [3], ['char_santa_anim_v3.ma'])])
+        stats = self.audit.stats.as_dict()
+        self.assertEqual((stats['folders'], stats['files'], stats['scene_files']), (3, 8, 7))
+        self.assertEqual(stats['issues'], {'duplicate': 1, 'gap': 1, 'nonconforming': 1})
+
+    def testJobAudit_archived_versions(self):
+        user_folder = os.path.join(self.scenes, 'model', 'jfrank')
+        for version in (3, 4):
+            self._save('model/jfrank', 'char_santa_MDL_%03d_jf.ma' % version)
+        delta.compact(user_folder, model.get_filename_parser(), keep=1)
+        kinds = [issue.kind for issue in self.audit.run()]
+        self.assertFalse('gap' in kinds)
+        self.assertFalse('broken_chain' in kinds)
+        os.remove(os.path.join(user_folder, 'char_santa_MDL_005_jf.ma'))
+        issues = [issue for issue in self.audit.run() if issue.kind == 'broken_chain']
+        self.assertEqual([(issue.versions, [os.path.basename(path) for path in issue.paths]) for issue in issues],
+                         [([version], ['char_santa_MDL_%03d_jf.ma' % version, 'char_santa_MDL_005_jf.ma'])
+                          for version in (2, 3, 4)])
+
+    def testJobAudit_nonconforming_skips_version_checks(self):
+        self._save('anim/aweber', 'char_santa_anim_v7.ma')
+        self._save('anim/aweber', 'char_santa_ANIM_1_aw.ma')
+        kinds = sorted(issue.kind for issue in self.audit.run() if os.path.basename(issue.folder) == 'anim')
+        self.assertEqual(kinds, ['nonconforming'] * 3)
+
+    def testJobAudit_unreadable(self):
+        unreadable = [os.path.join(self.job, 'shots'), os.path.join(self.scenes, 'model')]
+        listdir = os.listdir
+
+        def failing_listdir(path):
+            if path in unreadable:
+                raise OSError(errno.EACCES, 'Permission denied', path)
+            return listdir(path)
+
+        os.listdir = failing_listdir
+        try:
+            issues = [issue for issue in self.audit.run() if issue.kind == 'unreadable']
+        finally:
+            os.listdir = listdir
+        self.assertEqual(sorted(issue.folder for issue in issues), sorted(unreadable))
+        self.assertEqual(self.audit.stats.issues['unreadable'], 2)
+        self.assertEqual(self.audit.stats.folders, 2)
+
+    def testPathTemplate_regex(self):
+        self.assertTrue(self.audit.name_re.match('char_santa_MDL_001_aw_blocking.ma'))
+        self.assertTrue(self.audit.name_re.match('char_santa_MDL_001b_aw.mb'))
+        self.assertFalse(self.audit.name_re.match('char_santa_MDL_1_aw.ma'))
+        self.assertFalse(self.audit.name_re.match('char_santa_MDL_001_aw.obj'))
+
+if __name__ == '__main__':
+    unittest.main()
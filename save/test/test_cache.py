@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+    :module: test_cache
+    :platform: None
+    :synopsis: This module tests the cache.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import unittest
+from save import cache
+
+class TestLRUCache(unittest.TestCase):
+
+    def testLRUCache_evicts_least_recently_used(self):
+        lru = cache.LRUCache(maxsize=2)
+        lru['one'] = 1
+        lru['two'] = 2
+        lru.get('one')
+        lru['three'] = 3
+        self.assertEqual(sorted(lru._data.keys()), ['one', 'three'])
+
+    def testLRUCache_hit_miss_counters(self):
+        lru = cache.LRUCache()
+        lru['one'] = 1
+        lru.get('one')
+        lru.get('two')
+        self.assertEqual((lru.hits, lru.misses), (1, 1))
+
+    def testLRUCache_ttl_expires(self):
+        lru = cache.LRUCache(ttl=60)
+        lru['one'] = 1
+        lru.set('two', 2, ttl=-1)
+        lru.set('three', 3, ttl=None)
+        self.assertEqual(lru.get('one'), 1)
+        self.assertEqual(lru.get('two'), None)
+        self.assertFalse('two' in lru)
+        self.assertTrue('three' in lru)
+
+    def testLRUCache_getitem_missing(self):
+        self.assertRaises(KeyError, lambda: cache.LRUCache()['one'])
+
+    def testLRUCache_keys(self):
+        lru = cache.LRUCache(maxsize=3)
+        for key in ['one', 'two', 'three']:
+            lru[key] = key
+        lru.get('one')
+        self.assertEqual(lru.keys(), ['two', 'three', 'one'])
+
+if __name__ == '__main__':
+    unittest.main()
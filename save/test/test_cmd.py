@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+    :module: test_cmd
+    :platform: None
+    :synopsis: This module tests the cmd.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+from save import cmd, model
+
+class TestCmd(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.orig_server = model.config['map']['server']
+        self.orig_path_format = model.config['path']['path_format_string']
+        model.config['map']['server'] = self.temp_dir.lstrip('/')
+        model.config['path']['path_format_string'] = os.path.join(self.temp_dir, '{JOB}', '{SCENE}', '{SHOT}')
+        model._version_indexes.clear()
+        self.anim = os.path.join(self.temp_dir, 'test_job', 'test_scene01', 'test_shot1', 'maya', 'scenes', 'anim')
+        for user, filename in [('aweber', 'anim_cave_ANIM_001_aw.ma'), ('aweber', 'anim_cave_ANIM_004_aw.ma'),
+                               ('jfrank', 'anim_cave_ANIM_004_jf.ma')]:
+            if not os.path.isdir(os.path.join(self.anim, user)):
+                os.makedirs(os.path.join(self.anim, user))
+            open(os.path.join(self.anim, user, filename), 'w').close()
+        os.makedirs(os.path.join(self.temp_dir, 'test_job', 'test_scene01', 'test_shot2'))
+        os.makedirs(os.path.join(self.temp_dir, 'test_job', 'test_scene02', 'test_shot3'))
+        self.orig_stdin, self.orig_stdout = sys.stdin, sys.stdout
+
+    def tearDown(self):
+        sys.stdin, sys.stdout = self.orig_stdin, self.orig_stdout
+        model.config['map']['server'] = self.orig_server
+        model.config['path']['path_format_string'] = self.orig_path_format
+        model._version_indexes.clear()
+        model.set_context_service(None)
+        shutil.rmtree(self.temp_dir)
+
+    def _run(self, argv, stdin=''):
+        sys.stdin, sys.stdout = StringIO(stdin), StringIO()
+        code = cmd.main(argv)
+        output, sys.stdout = sys.stdout.getvalue(), self.orig_stdout
+        return code, [json.loads(line) for line in output.splitlines()]
+
+    def testCmd_parse_stdin(self):
+        code, records = self._run(['parse'], stdin='anim_cave_v005_aw.ma\n\nmpc_human_rig_v02_jf.mb\n')
+        self.assertEqual(code, 0)
+        self.assertEqual([(record['path'], record['version'], record['user']) for record in records],
+                         [('anim_cave_v005_aw.ma', 5, 'aw'), ('mpc_human_rig_v02_jf.mb', 2, 'jf')])
+        self.assertEqual(records[1]['filename'], 'mpc_human_rig_v02_jf.mb')
+
+    def testCmd_parse_conforming(self):
+        code, records = self._run(['parse', 'anim_cave.v005.ma', 'hello world', '/jobs/anim_cave_ANIM_005_aw.ma',
+                                   'anim_cave_ANIM_005_aw_wip.ma'])
+        self.assertEqual(code, 0)
+        self.assertEqual([(record['filename'], record['conforming']) for record in records],
+                         [('anim_cave.v005.ma', False), ('hello world', False), ('anim_cave_ANIM_005_aw.ma', True),
+                          ('anim_cave_ANIM_005_aw_wip.ma', True)])
+        self.assertEqual(records[0]['version'], 5)
+        self.assertEqual(records[2]['path'], '/jobs/anim_cave_ANIM_005_aw.ma')
+        self.assertFalse(any('error' in record for record in records))
+
+    def testCmd_next_version(self):
+        path = os.path.join(self.anim, 'aweber', 'anim_cave_ANIM_004_aw.ma')
+        code, records = self._run(['next-version', '--username', 'kmorris', '--initials', 'km', path,
+                                   os.path.join(self.temp_dir, 'loose_ANIM_001_aw.ma')])
+        self.assertEqual(code, 1)
+        self.assertEqual(records[0]['next_version'], 5)
+        self.assertEqual(records[0]['file_path'], os.path.join(self.anim, 'kmorris', 'anim_cave_ANIM_005_km.ma'))
+        self.assertTrue('error' in records[1])
+
+    def testCmd_next_version_outside_server(self):
+        outside = tempfile.mkdtemp()
+        try:
+            path = os.path.join(outside, 'test_job', 'test_scene01', 'test_shot1', 'anim_cave_ANIM_004_aw.ma')
+            code, records = self._run(['next-version', path])
+        finally:
+            shutil.rmtree(outside)
+        self.assertEqual(code, 1)
+        self.assertTrue('server' in records[0]['error'])
+
+    def testCmd_list_shots(self):
+        code, records = self._run(['--backend', 'local', 'list-shots', 'test_job'])
+        self.assertEqual([(record['scene'], record['shot']) for record in records],
+                         [('test_scene01', 'test_shot1'), ('test_scene01', 'test_shot2'),
+                          ('test_scene02', 'test_shot3')])
+        code, records = self._run(['--backend', 'local', 'list-shots', 'test_job', '--scene', 'test_scene02'])
+        self.assertEqual([record['shot'] for record in records], ['test_shot3'])
+
+    def testCmd_audit(self):
+        code, records = self._run(['audit', 'test_job', '--strict'])
+        self.assertEqual(code, 1)
+        self.assertEqual(records[-1]['summary']['issues'], {'gap': 1, 'duplicate': 1})
+        self.assertEqual(records[-1]['summary']['scene_files'], 3)
+        self.assertEqual(records[0]['versions'], [2, 3])
+        code, records = self._run(['audit', 'test_job', '--kind', 'duplicate', '--workers', '2'])
+        self.assertEqual(code, 0)
+        self.assertEqual([record.get('kind') for record in records], ['duplicate', None])
+
+    def testCmd_audit_missing_job(self):
+        code, records = self._run(['audit', 'no_such_job'])
+        self.assertEqual(code, 1)
+        self.assertEqual(records, [{'path': os.path.join(self.temp_dir, 'no_such_job'), 'error': 'no such job folder'}])
+
+if __name__ == '__main__':
+    unittest.main()
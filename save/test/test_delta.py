@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+    :module: test_delta
+    :platform: None
+    :synopsis: This module tests the delta.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from save import delta, index, model
+from save.benchmark.fixtures import make_scene
+
+class TestDiffLines(unittest.TestCase):
+
+    def testDiffLines_roundtrip(self):
+        rng = random.Random(4)
+        for trial in range(200):
+            base = delta.split_lines(make_scene(rng.randint(0, 30), seed=trial))
+            target = list(base)
+            for _ in range(rng.randint(0, 6)):
+                position = rng.randint(0, len(target))
+                choice = rng.random()
+                if choice < 0.3 and target:
+                    del target[min(position, len(target) - 1)]
+                elif choice < 0.6:
+                    target.insert(position, '\tsetAttr ".v" no;\n')
+                else:
+                    target.insert(position, 'connectAttr "node%d.t" "node0.t";\n' % position)
+            if trial % 7 == 0:
+                target.append('no line break')
+            self.assertEqual(delta.apply_delta(base, delta.diff_lines(base, target)), target)
+
+    def testDiffLines_small_edit_small_delta(self):
+        base = delta.split_lines(make_scene(5000))
+        target = delta.split_lines(make_scene(5000, renamed=(10, 2500, 4990)))
+        ops = delta.diff_lines(base, target)
+        self.assertEqual(sum(len(op[1]) for op in ops if op[0] == '+'), 3)
+        self.assertTrue(len(delta.encode_archive({}, ops)) < 200)
+
+    def testSplitLines_only_on_newlines(self):
+        self.assertEqual(delta.split_lines('a\rb\x0cc\nd'), ['a\rb\x0cc\n', 'd'])
+
+
+class TestCompact(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.user_folder = os.path.join(self.folder, 'anim', 'aweber')
+        os.makedirs(self.user_folder)
+        self.contents = {}
+        for version in range(1, 7):
+            self._save('anim_cave_ANIM_%03d_aw.ma' % version, make_scene(500, renamed=range(version)), version)
+        self._save('anim_cave_ANIM_001_aw.mb', '\x00binary', 1)
+        self.parser = model.get_filename_parser()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _save(self, filename, content, mtime):
+        path = os.path.join(self.user_folder, filename)
+        with open(path, 'wb') as scene:
+            scene.write(content)
+        os.utime(path, (mtime * 1000, mtime * 1000))
+        self.contents[filename] = content
+
+    def testCompact_keeps_latest(self):
+        results = delta.compact(self.user_folder, self.parser, keep=2)
+        self.assertEqual([os.path.basename(result.path) for result in results],
+                         ['anim_cave_ANIM_%03d_aw.ma' % version for version in (4, 3, 2, 1)])
+        self.assertEqual(sorted(os.listdir(self.user_folder)), ['.delta', 'anim_cave_ANIM_001_aw.mb',
+                                                                'anim_cave_ANIM_005_aw.ma',
+                                                                'anim_cave_ANIM_006_aw.ma'])
+        self.assertTrue(all(result.stored < result.size / 20 for result in results))
+        self.assertEqual(delta.compact(self.user_folder, self.parser, keep=2), [])
+
+    def testCompact_reconstruct_and_restore(self):
+        delta.compact(self.user_folder, self.parser, keep=1, max_chain=2)
+        for version in range(1, 6):
+            filename = 'anim_cave_ANIM_%03d_aw.ma' % version
+            self.assertTrue(delta.is_archived(os.path.join(self.user_folder, filename)))
+            self.assertEqual(delta.reconstruct(os.path.join(self.user_folder, filename)), self.contents[filename])
+        self.assertEqual(delta.read_archive(delta.archive_path(os.path.join(self.user_folder,
+                                                                            'anim_cave_ANIM_003_aw.ma')))[0]['base'],
+                         None)
+        path = delta.restore(os.path.join(self.user_folder, 'anim_cave_ANIM_004_aw.ma'))
+        self.assertEqual(open(path, 'rb').read(), self.contents['anim_cave_ANIM_004_aw.ma'])
+        self.assertEqual(os.stat(path).st_mtime, 4000)
+        self.assertEqual(delta.reconstruct(os.path.join(self.user_folder, 'anim_cave_ANIM_003_aw.ma')),
+                         self.contents['anim_cave_ANIM_003_aw.ma'])
+
+    def testCompact_versions_stay_indexed(self):
+        delta.compact_tree(self.folder, self.parser, keep=1)
+        version_index = index.VersionIndex(self.parser, os.path.join(self.folder, 'anim')).scan()
+        self.assertEqual(version_index.versions('anim_cave', 'ANIM', 'aw'), [1, 1, 2, 3, 4, 5, 6])
+        self.assertEqual(version_index.next_version('anim_cave', 'ANIM'), 7)
+        self.assertEqual([version.mtime for version in version_index.history('anim_cave', 'ANIM', limit=3)],
+                         [6000, 5000, 4000])
+
+    def testBrokenChains(self):
+        delta.compact(self.user_folder, self.parser, keep=1, max_chain=2)
+        self.assertEqual(delta.broken_chains(self.user_folder), [])
+        os.remove(delta.archive_path(os.path.join(self.user_folder, 'anim_cave_ANIM_003_aw.ma')))
+        self.assertEqual(delta.broken_chains(self.user_folder),
+                         [('anim_cave_ANIM_001_aw.ma', 'anim_cave_ANIM_003_aw.ma'),
+                          ('anim_cave_ANIM_002_aw.ma', 'anim_cave_ANIM_003_aw.ma')])
+
+    def testCompact_dry_run(self):
+        results = delta.compact(self.user_folder, self.parser, keep=3, dry_run=True)
+        self.assertEqual(len(results), 3)
+        self.assertFalse(os.path.exists(os.path.join(self.user_folder, delta.ARCHIVE_FOLDER)))
+
+if __name__ == '__main__':
+    unittest.main()
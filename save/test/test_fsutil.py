@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+    :module: test_fsutil
+    :platform: None
+    :synopsis: This module tests the fsutil.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from save import fsutil
+
+class TestWriteAtomic(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def testWriteAtomic_string(self):
+        path = os.path.join(self.folder, 'model', 'char_santa_MDL_004_aw.ma')
+        self.assertEqual(fsutil.write_atomic(path, '//Maya ASCII scene\n'), path)
+        self.assertEqual(open(path, 'rb').read(), '//Maya ASCII scene\n')
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['char_santa_MDL_004_aw.ma'])
+
+    def testWriteAtomic_chunks_overwrite(self):
+        path = os.path.join(self.folder, 'manifest.json')
+        fsutil.write_atomic(path, 'old')
+        progress = []
+        fsutil.write_atomic(path, iter(['{', '}']), progress=progress.append)
+        self.assertEqual(open(path, 'rb').read(), '{}')
+        self.assertEqual(progress, [1, 2])
+
+    def testWriteAtomic_no_overwrite(self):
+        path = os.path.join(self.folder, 'char_santa_MDL_004_aw.ma')
+        fsutil.write_atomic(path, 'first')
+        try:
+            fsutil.write_atomic(path, 'second', overwrite=False)
+            self.fail('existing file was replaced')
+        except OSError as err:
+            self.assertEqual(err.errno, errno.EEXIST)
+        self.assertEqual(open(path, 'rb').read(), 'first')
+        self.assertEqual(os.listdir(self.folder), ['char_santa_MDL_004_aw.ma'])
+
+    def testWriteAtomic_failure_leaves_nothing(self):
+        path = os.path.join(self.folder, 'char_santa_MDL_004_aw.ma')
+
+        def content():
+            yield 'partial'
+            raise IOError('disk full')
+
+        self.assertRaises(IOError, fsutil.write_atomic, path, content())
+        self.assertEqual(os.listdir(self.folder), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+    :module: test_index
+    :platform: None
+    :synopsis: This module tests the index.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import os
+import shutil
+import tempfile
+import unittest
+from save import index, model
+
+class TestVersionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self._save('aweber', 'char_santa_MDL_001_aw.ma')
+        self._save('aweber', 'char_santa_MDL_003_aw.ma')
+        self._save('jfrank', 'char_santa_MDL_002_jf.ma')
+        self._save('jfrank', 'char_elf_MDL_007_jf.mb')
+        self.index = index.VersionIndex(model.get_filename_parser(), self.folder).scan()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _save(self, user, filename, mtime=None):
+        if not os.path.isdir(os.path.join(self.folder, user)):
+            os.makedirs(os.path.join(self.folder, user))
+        path = os.path.join(self.folder, user, filename)
+        open(path, 'w').close()
+        if mtime:
+            os.utime(os.path.dirname(path), (mtime, mtime))
+        return path
+
+    def testVersionIndex_versions_per_user(self):
+        self.assertEqual(self.index.versions('char_santa', 'MDL', 'aw'), [1, 3])
+        self.assertEqual(self.index.versions('char_santa', 'MDL'), [1, 2, 3])
+
+    def testVersionIndex_next_version(self):
+        self.assertEqual(self.index.next_version('char_santa', 'MDL'), 4)
+        self.assertEqual(self.index.next_version('char_santa', 'MDL', 'jf'), 3)
+        self.assertEqual(self.index.next_version('char_reindeer', 'MDL'), 1)
+
+    def testVersionIndex_update_changed_folders(self):
+        self._save('jfrank', 'char_santa_MDL_009_jf.ma', mtime=1000)
+        os.remove(os.path.join(self.folder, 'aweber', 'char_santa_MDL_003_aw.ma'))
+        os.utime(os.path.join(self.folder, 'aweber'), (1000, 1000))
+        self.index.update()
+        self.assertEqual(self.index.versions('char_santa', 'MDL'), [1, 2, 9])
+
+    def testVersionIndex_update_new_and_removed_user_folder(self):
+        shutil.rmtree(os.path.join(self.folder, 'aweber'))
+        self._save('kmorris', 'char_santa_MDL_005_km.ma')
+        os.utime(self.folder, (1000, 1000))
+        self.index.update()
+        self.assertEqual(self.index.versions('char_santa', 'MDL'), [2, 5])
+
+    def testVersionIndex_history(self):
+        old_file = os.path.join(self.folder, 'aweber', 'char_santa_MDL_001_aw.ma')
+        os.utime(old_file, (1000, 1000))
+        self.assertEqual([(entry.version, entry.user) for entry in self.index.history('char_santa', 'MDL')],
+                         [(3, 'aw'), (2, 'jf'), (1, 'aw')])
+        self.assertEqual([entry.version for entry in self.index.history('char_santa', 'MDL', user='aw', limit=1)], [3])
+        self.assertEqual([entry.version for entry in self.index.history('char_santa', 'MDL', since=2000)], [3, 2])
+        self.index.remove(old_file)
+        self.assertEqual(len(self.index.history('char_santa', 'MDL')), 2)
+
+    def testVersionIndex_add(self):
+        self.index.add(os.path.join(self.folder, 'aweber', 'char_santa_MDL_004_aw.ma'))
+        self.assertEqual(self.index.latest('char_santa', 'MDL', 'aw'), 4)
+
+    def testVersionIndex_add_then_update_keeps_one_entry(self):
+        for user, filename in [('aweber', 'char_santa_MDL_004_aw.ma'), ('bsmith', 'char_santa_MDL_005_bs.ma')]:
+            path = self._save(user, filename)
+            self.index.add(path)
+            self.index.add(path)
+        self.index.update()
+        self.assertEqual([version for version, _, _ in self.index.files('char_santa', 'MDL')], [1, 2, 3, 4, 5])
+        self.assertEqual(self.index.versions('char_santa', 'MDL'), [1, 2, 3, 4, 5])
+        self.index.remove(os.path.join(self.folder, 'aweber', 'char_santa_MDL_004_aw.ma'))
+        self.index.update()
+        self.assertEqual(self.index.versions('char_santa', 'MDL'), [1, 2, 3, 5])
+
+    def testVersionIndex_extensions(self):
+        self._save('aweber', 'notes.txt')
+        self._save('aweber', 'char_santa_MDL_009_aw.ma.swatch')
+        version_index = index.VersionIndex(model.get_filename_parser(), self.folder, extensions=('MA', 'mb')).scan()
+        self.assertEqual(sorted(version_index.keys()), [('char_elf', 'MDL', 'jf'), ('char_santa', 'MDL', 'aw'),
+                                                        ('char_santa', 'MDL', 'jf')])
+        version_index.add(os.path.join(self.folder, 'aweber', 'char_santa_MDL_010_aw.ma.swatch'))
+        self.assertEqual(version_index.latest('char_santa', 'MDL'), 3)
+
+    def testAddToVersionIndex(self):
+        shared = model.get_version_index(self.folder)
+        try:
+            model.register_saved_file(os.path.join(self.folder, 'aweber', 'char_santa_MDL_004_aw.ma'))
+            self.assertEqual(model.get_version_index(self.folder).next_version('char_santa', 'MDL'), 5)
+            self.assertTrue(model.get_version_index(self.folder) is shared)
+        finally:
+            model._version_indexes.pop(self.folder)
+
+if __name__ == '__main__':
+    unittest.main()
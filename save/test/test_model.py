@@ -9,8 +9,62 @@ __author__ = "Andres Weber"
 __email__ = "andresmweber@gmail.com"
 __version__ = 1.0
 #mpcSave_contextManager
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 from save import model
+from save import services
+
+
+class FakeContexts(object):
+    """ Stands in for mpc.tessa.contexts with a fixed {job: {scene: [shot]}} tree and records every query
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.queries = []
+
+    def contextFactory(self, context_in):
+        return FakeContext(self, **context_in)
+
+    def validateContext(self, context):
+        self.queries.append(('validate', tuple(context)))
+        return context.shot.name in self.tree.get(context.job.name, {}).get(context.scene.name, [])
+
+
+class FakeContext(object):
+    def __init__(self, contexts, job=None, scene=None, shot=None):
+        self.contexts = contexts
+        self.levels = (('job', job), ('scene', scene), ('shot', shot))
+
+    def __iter__(self):
+        return iter(self.levels)
+
+    @property
+    def name(self):
+        return [value for _, value in self.levels if value is not None][-1]
+
+    @property
+    def job(self):
+        return FakeContext(self.contexts, self.levels[0][1])
+
+    @property
+    def scene(self):
+        return FakeContext(self.contexts, self.levels[0][1], self.levels[1][1])
+
+    @property
+    def shot(self):
+        return self
+
+    def findChildren(self):
+        job, scene, _ = [value for _, value in self.levels]
+        self.contexts.queries.append(('findChildren', self.name))
+        if scene is None:
+            return [FakeContext(self.contexts, job, child) for child in self.contexts.tree[job]]
+        return [FakeContext(self.contexts, job, scene, child) for child in self.contexts.tree[job][scene]]
+
 
 class TestSceneFile(unittest.TestCase):
 
@@ -67,6 +121,89 @@ class TestSceneFile(unittest.TestCase):
         dir = model.SceneFile.from_existing('macys_PV_020_fx_v006.mb').increment(5)
         self.assertEqual(dir.version, 5)
 
+    def testSceneFile_parse_many_keeps_order_and_paths(self):
+        paths = ['/jobs/test/maya/scenes/anim/aw/anim_cave.v005.ma', 'mpc_human_rig_v02_jf.mb'] * 3
+        records = list(model.SceneFile.parse_many(paths, chunksize=4))
+        self.assertEqual([record.filename for record in records], paths)
+        self.assertEqual([record.version for record in records], [5, 2] * 3)
+
+    def testSceneFile_parse_many_workers(self):
+        paths = ['macys_PV_020_fx_v%03d.mb' % version for version in range(1, 50)]
+        records = list(model.SceneFile.parse_many(paths, workers=2, chunksize=10))
+        self.assertEqual([record.version for record in records], range(1, 50))
+
+    def testSceneFile_parse_many_bounds_read_ahead(self):
+        read = []
+
+        def paths():
+            for version in range(1, 101):
+                read.append(version)
+                yield 'macys_PV_020_fx_v%03d.mb' % version
+
+        records = model.SceneFile.parse_many(paths(), workers=2, chunksize=5, in_flight=3)
+        first = next(records)
+        self.assertEqual(first.version, 1)
+        self.assertTrue(len(read) <= 3 * 5)
+        self.assertEqual([first.version] + [record.version for record in records], range(1, 101))
+
+class TestConfig(unittest.TestCase):
+
+    def tearDown(self):
+        model.reload_config()
+
+    def testConfig_split_lists(self):
+        self.assertTrue('ANIM' in model.config['map']['disciplines'])
+        self.assertEqual(model.config['map']['server'], 'jobs')
+
+    def testConfig_reload_resets_parser(self):
+        parser = model.get_filename_parser()
+        model.config['map']['server'] = 'elsewhere'
+        model.reload_config()
+        self.assertEqual(model.config['map']['server'], 'jobs')
+        self.assertFalse(model.get_filename_parser() is parser)
+
+class TestFilenameParser(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = model.FilenameParser.from_config(model.config)
+
+    def testFilenameParser_parse_all_fields(self):
+        parsed = self.parser.parse('mpc_human_rig_v02_jf.mb')
+        self.assertEqual((parsed.description, parsed.version, parsed.discipline, parsed.user, parsed.extension),
+                         ('mpc_human_rig', 2, 'RIG', 'jf', 'mb'))
+
+    def testFilenameParser_parse_tokens(self):
+        parsed = self.parser.parse('SBN_SOC_EarthANIM_013_ac_v02.aep')
+        self.assertEqual((parsed.version, parsed.discipline, parsed.user), (2, 'ANIM', 'ac'))
+        self.assertEqual(self.parser.parse('char_v01_v02_jf.ma').version, 1)
+        self.assertEqual(self.parser.parse('char_santa__aw_MDL_003.ma').user, 'aw')
+
+    def testFilenameParser_parse_memoized(self):
+        first = self.parser.parse('macys_PV_020_fx_v006.mb')
+        self.assertTrue(self.parser.parse('macys_PV_020_fx_v006.mb') is first)
+        self.parser.clear()
+        self.assertFalse(self.parser.parse('macys_PV_020_fx_v006.mb') is first)
+
+    def testFilenameParser_from_existing_returns_new_instances(self):
+        first = model.SceneFile.from_existing('anim_cave.v005.ma').increment()
+        self.assertEqual(model.SceneFile.from_existing('anim_cave.v005.ma').version, 5)
+        self.assertEqual(first.version, 6)
+
+class TestPathTemplate(unittest.TestCase):
+
+    def testPathTemplate_optional(self):
+        template = model.PathTemplate('{DESCRIPTION}_{VERSION}_{OPTIONAL}.{EXT}')
+        self.assertEqual(template.render(DESCRIPTION='char_santa', VERSION='003', OPTIONAL=None, EXT='ma'),
+                         'char_santa_003.ma')
+        self.assertEqual(template.render(DESCRIPTION='char_santa', VERSION='003', OPTIONAL='fix', EXT='ma'),
+                         'char_santa_003_fix.ma')
+
+    def testPathTemplate_render_many(self):
+        template = model.get_template('/jobs/{JOB}/{SCENE}')
+        self.assertTrue(model.get_template('/jobs/{JOB}/{SCENE}') is template)
+        self.assertEqual(template.render_many([{'JOB': 'a', 'SCENE': 'b'}, {'JOB': 'c', 'SCENE': 'd'}]),
+                         ['/jobs/a/b', '/jobs/c/d'])
+
 class TestDirectory(unittest.TestCase):
 
     def setUp(self):
@@ -78,6 +215,11 @@ class TestDirectory(unittest.TestCase):
         for fixture in self.fixtures:
             del fixture
 
+    def testDirectory_parse_path(self):
+        self.assertEqual(model.Directory._parse_path('/jobs/test_job/test_scene01/test_shot1/maya/scenes/a.ma'),
+                         ['test_job', 'test_scene01', 'test_shot1'])
+        self.assertEqual(model.Directory._parse_path('test_job/test_scene01'), ['test_job', 'test_scene01'])
+
     def testDirectory_refresh_tree_scene_ignored(self):
         #Mehhhhhhhhhhhhhhh, don't think this is test-worthy?
         pass
@@ -92,5 +234,256 @@ class TestDirectory(unittest.TestCase):
         pass
         #self.assertEquals(Directory().refresh_tree(), [])
 
+class TestSaveData(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.contexts = FakeContexts({'test_job': {'test_scene01': ['test_shot1']}})
+        self.orig_contexts, model.contexts = model.contexts, self.contexts
+        self.orig_path_format = model.config['path']['path_format_string']
+        model.config['path']['path_format_string'] = os.path.join(self.temp_dir, '{JOB}', '{SCENE}', '{SHOT}')
+        model._version_indexes.clear()
+        model._version_histories.clear()
+        self.save_data = model.SaveData('/jobs/test_job/test_scene01/test_shot1/maya/scenes/anim/aw/test.ma')
+        self.save_data.scene_file = model.SceneFile('anim_cave', 'ANIM', 2, user='aw')
+
+    def tearDown(self):
+        model.contexts = self.orig_contexts
+        model.config['path']['path_format_string'] = self.orig_path_format
+        model._version_indexes.clear()
+        model._version_histories.clear()
+        shutil.rmtree(self.temp_dir)
+
+    def _save(self, filename):
+        folder = os.path.join(self.save_data.dir.build_path(), 'maya', 'scenes', 'anim', 'aweber')
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        open(os.path.join(folder, filename), 'w').close()
+        os.utime(folder, (1000, 1000))
+
+    def testSaveData_context_from_path(self):
+        self.assertEqual(dict(self.save_data.dir.context),
+                         {'job': 'test_job', 'scene': 'test_scene01', 'shot': 'test_shot1'})
+
+    def testSaveData_get_filename(self):
+        self.assertEqual(self.save_data.get_filename(), 'anim_cave_ANIM_002_aw.ma')
+        self.save_data.scene_file.optional = 'fix'
+        self.assertEqual(self.save_data.get_filename(), 'anim_cave_ANIM_002_aw_fix.ma')
+
+    def testSaveData_get_next_version(self):
+        self.assertEqual(self.save_data.get_next_version(), 1)
+        self._save('anim_cave_ANIM_005_aw.ma')
+        self.assertEqual(self.save_data.get_next_version(), 6)
+        self.assertEqual(self.save_data.get_next_version(user='jf'), 1)
+
+    def testSaveData_get_version_history(self):
+        service = model.contexts = services.LocalContexts(self.temp_dir)
+        for version in range(1, 6):
+            self._save('anim_cave_ANIM_%03d_aw.ma' % version)
+        self._save('anim_cave_LAY_009_aw.ma')
+        folder = os.path.join(self.save_data.dir.build_path(), 'maya', 'scenes', 'anim', 'aweber')
+        os.utime(os.path.join(folder, 'anim_cave_ANIM_001_aw.ma'), (1000, 1000))
+        history = self.save_data.get_version_history(limit=2)
+        self.assertEqual([(entry.version, entry.user) for entry in history], [(5, 'aw'), (4, 'aw')])
+        self.assertEqual([entry.version for entry in self.save_data.get_version_history(since=2000)], [5, 4, 3, 2])
+        self.assertEqual(self.save_data.get_version_history(user='jf'), [])
+        calls = service.calls
+        self.assertEqual(self.save_data.get_version_history(limit=2, since=2000), history)
+        self.assertEqual(self.save_data.get_version_history(limit=2, since=time.time() + 60), [])
+        self.assertEqual(service.calls, calls)
+        self._save('anim_cave_ANIM_006_aw.ma')
+        self.assertEqual(self.save_data.get_version_history(limit=2), history)
+        model.register_saved_file(os.path.join(folder, 'anim_cave_ANIM_006_aw.ma'))
+        self.assertEqual(self.save_data.get_version_history(limit=1)[0].version, 6)
+
+    def testSaveData_get_filenames(self):
+        scene_files = [model.SceneFile('anim_cave', 'ANIM', version, user='aw') for version in [1, 12]]
+        scene_files[1].optional = 'fix'
+        self.assertEqual(model.SaveData.get_filenames(scene_files),
+                         ['anim_cave_ANIM_001_aw.ma', 'anim_cave_ANIM_012_aw_fix.ma'])
+
+    def testDirectory_build_paths(self):
+        shots = [self.contexts.contextFactory({'job': 'test_job', 'scene': 'test_scene01', 'shot': shot})
+                 for shot in ['test_shot1', 'test_shot2']]
+        self.assertEqual(model.Directory.build_paths(shots),
+                         [os.path.join(self.temp_dir, 'test_job', 'test_scene01', shot)
+                          for shot in ['test_shot1', 'test_shot2']])
+        self.assertEqual(self.save_data.dir.build_path(), model.Directory.build_paths(shots)[0])
+
+class TestDirectoryJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.orig_server = model.config['map']['server']
+        model.config['map']['server'] = self.temp_dir.lstrip('/')
+        for job in ['macysSanta_5403623', 'macysParade_5403700', 'sourPatchKids_5600273', '.snapshot']:
+            os.makedirs(os.path.join(self.temp_dir, job))
+        open(os.path.join(self.temp_dir, 'macys_notes.txt'), 'w').close()
+        model._job_list_cache.clear()
+
+    def tearDown(self):
+        model.config['map']['server'] = self.orig_server
+        model._job_list_cache.clear()
+        shutil.rmtree(self.temp_dir)
+
+    def testDirectory_get_jobs_skips_hidden(self):
+        self.assertEqual(sorted(model.Directory.get_jobs()),
+                         ['macysParade_5403700', 'macysSanta_5403623', 'macys_notes.txt', 'sourPatchKids_5600273'])
+
+    def testDirectory_get_jobs_filters(self):
+        self.assertEqual(sorted(model.Directory.get_jobs(prefix='macys', active_only=True)),
+                         ['macysParade_5403700', 'macysSanta_5403623'])
+        self.assertEqual(model.Directory.get_jobs(pattern=r'_56\d+$'), ['sourPatchKids_5600273'])
+
+    def testDirectory_get_jobs_cached(self):
+        model.Directory.get_jobs()
+        os.makedirs(os.path.join(self.temp_dir, 'newJob_5700000'))
+        self.assertFalse('newJob_5700000' in model.Directory.get_jobs())
+        model._job_list_cache.clear()
+        self.assertTrue('newJob_5700000' in model.Directory.get_jobs())
+
+    def testDirectory_get_jobs_missing_server(self):
+        model.config['map']['server'] = os.path.join(self.temp_dir, 'missing').lstrip('/')
+        self.assertEqual(model.Directory.get_jobs(active_only=True), [])
+        self.assertEqual(len(model._job_list_cache), 0)
+
+    def testDirectory_get_jobs_caches_booleans(self):
+        model.Directory.get_jobs()
+        self.assertEqual(sorted(model._job_list_cache.get('/' + model.config['map']['server'])),
+                         [('macysParade_5403700', True), ('macysSanta_5403623', True), ('macys_notes.txt', False),
+                          ('sourPatchKids_5600273', True)])
+
+    def testDirectory_iter_jobs_partial_read_not_cached(self):
+        next(model.Directory.iter_jobs())
+        self.assertEqual(len(model._job_list_cache), 0)
+
+class TestDirectoryTree(unittest.TestCase):
+
+    def setUp(self):
+        self.contexts = FakeContexts({'test_job': {'test_scene01': ['test_shot1', 'test_shot2', 'tools'],
+                                                   'test_scene02': [],
+                                                   'archive': ['old_shot']}})
+        self.orig_contexts, model.contexts = model.contexts, self.contexts
+        self.orig_tree_cache_dir = model.config['cache']['tree_cache_dir']
+        model.config['cache']['tree_cache_dir'] = ''
+        model._validation_cache.clear()
+        self.directory = model.Directory({'job': 'test_job', 'scene': 'test_scene01', 'shot': 'test_shot1'})
+
+    def tearDown(self):
+        model.contexts = self.orig_contexts
+        model.config['cache']['tree_cache_dir'] = self.orig_tree_cache_dir
+        model._validation_cache.clear()
+
+    def testDirectory_init_does_not_query(self):
+        self.assertEqual(self.contexts.queries, [])
+
+    def testDirectory_get_shots_loads_single_scene(self):
+        self.assertEqual(self.directory.get_shots('test_scene01'), ['test_shot1', 'test_shot2'])
+        self.assertEqual(self.contexts.queries, [('findChildren', 'test_job'), ('findChildren', 'test_scene01')])
+        self.assertEqual(self.directory.tree_cache, {'test_job': {'test_scene01': ['test_shot1', 'test_shot2', 'tools'],
+                                                                  'test_scene02': None}})
+
+    def testDirectory_get_shots_missing_scene(self):
+        self.assertEqual(self.directory.get_shots('archive'), None)
+
+    def testDirectory_get_scenes_filter_not_accumulated(self):
+        self.assertEqual(sorted(self.directory.get_scenes(filter=['test_scene02'])), ['test_scene01'])
+        self.assertEqual(sorted(self.directory.get_scenes()), ['test_scene01', 'test_scene02'])
+
+    def testDirectory_invalidate_scene(self):
+        self.directory.get_shots('test_scene01')
+        self.contexts.tree['test_job']['test_scene01'].append('test_shot3')
+        self.directory.invalidate('test_scene01')
+        self.assertEqual(self.directory.get_shots('test_scene01'), ['test_shot1', 'test_shot2', 'test_shot3'])
+        self.assertEqual(self.contexts.queries.count(('findChildren', 'test_job')), 1)
+
+    def testDirectory_refresh_tree(self):
+        self.assertEqual(self.directory.refresh_tree(),
+                         {'test_job': {'test_scene01': ['test_shot1', 'test_shot2', 'tools'], 'test_scene02': []}})
+
+    def testDirectory_validate_cached(self):
+        self.assertTrue(self.directory.validate())
+        self.assertTrue(self.directory.validate())
+        missing = self.contexts.contextFactory({'job': 'test_job', 'scene': 'test_scene01', 'shot': 'nope'})
+        self.assertFalse(self.directory.validate(missing))
+        self.assertFalse(self.directory.validate(missing))
+        self.assertEqual([query[0] for query in self.contexts.queries], ['validate', 'validate'])
+
+    def testDirectory_validate_scene_batched(self):
+        batches = []
+        self.contexts.validateContexts = lambda contexts_in: batches.append(len(contexts_in)) or \
+                                                             [self.contexts.validateContext(c) for c in contexts_in]
+        self.directory.validate()
+        self.assertEqual(self.directory.validate_scene(),
+                         {'test_shot1': True, 'test_shot2': True})
+        self.assertEqual(batches, [1, 1])
+
+    def testDirectory_refresh_tree_async(self):
+        loaded = []
+        future = self.directory.refresh_tree_async(callback=loaded.append)
+        self.assertEqual(future.result(timeout=5)['test_job']['test_scene02'], [])
+        self.assertEqual(loaded, [future])
+        self.assertEqual(self.directory.get_shots('test_scene01'), ['test_shot1', 'test_shot2'])
+        self.assertEqual(len(self.contexts.queries), 3)
+
+    def testDirectory_refresh_tree_concurrent(self):
+        running, peak, lock = [0], [0], threading.Lock()
+        find_children = FakeContext.findChildren
+
+        def slow_find_children(context):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return find_children(context)
+
+        for index in range(3, 9):
+            self.contexts.tree['test_job']['test_scene%02d' % index] = ['shot%d' % index]
+        FakeContext.findChildren = slow_find_children
+        try:
+            tree = self.directory.refresh_tree(concurrency=3)
+        finally:
+            FakeContext.findChildren = find_children
+        self.assertEqual(tree['test_job']['test_scene08'], ['shot8'])
+        self.assertEqual(len(self.contexts.queries), 9)
+        self.assertEqual(peak[0], 3)
+
+    def testDirectory_refresh_tree_batched(self):
+        batches = []
+
+        def find_children_batch(contexts_in):
+            batches.append(sorted(context.name for context in contexts_in))
+            return dict((context, context.findChildren()) for context in contexts_in)
+
+        self.contexts.findChildrenBatch = find_children_batch
+        self.assertEqual(self.directory.refresh_tree(),
+                         {'test_job': {'test_scene01': ['test_shot1', 'test_shot2', 'tools'], 'test_scene02': []}})
+        self.assertEqual(batches, [['test_scene01', 'test_scene02']])
+
+    def testDirectory_find_children(self):
+        scenes = [self.contexts.contextFactory({'job': 'test_job', 'scene': scene})
+                  for scene in ['test_scene02', 'test_scene01']]
+        self.assertEqual(model.Directory.find_children(scenes, concurrency=2),
+                         [[], ['test_shot1', 'test_shot2', 'tools']])
+
+    def testDirectory_disk_cache_reused(self):
+        temp_dir = tempfile.mkdtemp()
+        orig_server = model.config['map']['server']
+        try:
+            model.config['map']['server'] = temp_dir.lstrip('/')
+            model.config['cache']['tree_cache_dir'] = os.path.join(temp_dir, 'cache')
+            for scene in ['test_scene01', 'test_scene02']:
+                os.makedirs(os.path.join(temp_dir, 'test_job', scene))
+            model.Directory({'job': 'test_job', 'scene': 'test_scene01', 'shot': 'test_shot1'}).refresh_tree()
+            del self.contexts.queries[:]
+            directory = model.Directory({'job': 'test_job', 'scene': 'test_scene01', 'shot': 'test_shot1'})
+            self.assertEqual(directory.get_shots('test_scene01'), ['test_shot1', 'test_shot2'])
+            self.assertEqual(self.contexts.queries, [])
+        finally:
+            model.config['map']['server'] = orig_server
+            shutil.rmtree(temp_dir)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+    :module: test_pipeline
+    :platform: None
+    :synopsis: This module tests the pipeline.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from save import pipeline
+from save import store
+
+class TestCopyAtomic(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.source = os.path.join(self.folder, 'char_santa_MDL_004_aw.ma')
+        with open(self.source, 'wb') as source:
+            source.write('//Maya ASCII scene\n' * 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def testCopyAtomic_chunked(self):
+        destination = os.path.join(self.folder, 'model', 'aweber', 'char_santa_MDL_004_aw.ma')
+        progress = []
+        pipeline.copy_atomic(self.source, destination, chunk_size=4096, progress=progress.append)
+        self.assertEqual(open(destination, 'rb').read(), open(self.source, 'rb').read())
+        self.assertEqual(progress[-1], os.path.getsize(self.source))
+        self.assertEqual(len(progress), 5)
+        self.assertEqual(os.listdir(os.path.dirname(destination)), ['char_santa_MDL_004_aw.ma'])
+
+    def testCopyAtomic_never_replaces(self):
+        destination = os.path.join(self.folder, 'existing.ma')
+        open(destination, 'w').close()
+        try:
+            pipeline.copy_atomic(self.source, destination)
+            self.fail('existing version was replaced')
+        except OSError as err:
+            self.assertEqual(err.errno, errno.EEXIST)
+        self.assertEqual(os.path.getsize(destination), 0)
+
+    def testCopyAtomic_keeps_umask(self):
+        destination = os.path.join(self.folder, 'model', 'char_santa_MDL_004_aw.ma')
+        umask = os.umask(0o027)
+        try:
+            pipeline.copy_atomic(self.source, destination)
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(destination).st_mode & 0o777, 0o640)
+
+    def testCopyAtomic_never_replaces_late_arrival(self):
+        destination = os.path.join(self.folder, 'late.ma')
+
+        def arrive(copied):
+            if not os.path.exists(destination):
+                with open(destination, 'w') as late:
+                    late.write('saved meanwhile')
+
+        try:
+            pipeline.copy_atomic(self.source, destination, progress=arrive)
+            self.fail('version saved meanwhile was replaced')
+        except OSError as err:
+            self.assertEqual(err.errno, errno.EEXIST)
+        self.assertEqual(open(destination).read(), 'saved meanwhile')
+        self.assertEqual(sorted(os.listdir(self.folder)), ['char_santa_MDL_004_aw.ma', 'late.ma'])
+
+    def testCopyAtomic_failure_leaves_nothing(self):
+        destination = os.path.join(self.folder, 'model', 'char_santa_MDL_004_aw.ma')
+
+        def fail(copied):
+            raise IOError('disk full')
+
+        self.assertRaises(IOError, pipeline.copy_atomic, self.source, destination, 4096, fail)
+        self.assertEqual(os.listdir(os.path.dirname(destination)), [])
+
+
+class TestSavePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.pipeline = pipeline.SavePipeline(scratch_dir=os.path.join(self.folder, 'scratch'), chunk_size=1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write(self, path):
+        with open(path, 'w') as scene:
+            scene.write('requires maya "2016";\n' * 200)
+
+    def testSavePipeline_save(self):
+        destination = os.path.join(self.folder, 'jobs', 'anim', 'aweber', 'anim_cave_ANIM_002_aw.ma')
+        published = []
+        job = self.pipeline.save(destination, self._write, callback=published.append)
+        self.assertEqual(job.wait(timeout=5), destination)
+        self.assertEqual(job.progress(), 1.0)
+        self.assertEqual(published, [job])
+        self.assertEqual(os.listdir(os.path.join(self.folder, 'scratch')), [])
+        self.assertEqual(self.pipeline.pending(), [])
+
+    def testSavePipeline_failed_copy_keeps_scratch(self):
+        destination = os.path.join(self.folder, 'anim_cave_ANIM_002_aw.ma')
+        open(destination, 'w').close()
+        job = self.pipeline.save(destination, self._write)
+        self.assertEqual(self.pipeline.wait(timeout=5), [job])
+        self.assertTrue(os.path.exists(job.source))
+        self.assertEqual(self.pipeline.wait(timeout=5), [])
+
+    def testSavePipeline_save_to_store(self):
+        destination = os.path.join(self.folder, 'anim', 'anim_cave_ANIM_002_aw.ma')
+        version_store = store.VersionStore(os.path.join(self.folder, 'anim', '.store'), keep=1)
+        self.pipeline.publish(self._save_old(os.path.join(self.folder, 'anim_cave_ANIM_001_aw.ma')),
+                              destination.replace('002', '001'), store=version_store).wait(timeout=5)
+        job = self.pipeline.save(destination, self._write, store=version_store)
+        job.wait(timeout=5)
+        self.assertEqual(job.stored.name, 'anim_cave_ANIM_002_aw.ma')
+        self.assertEqual(''.join(version_store.iter_content(job.stored.name)), open(destination).read())
+        self.assertEqual([result.name for result in job.evicted], ['anim_cave_ANIM_001_aw.ma'])
+        self.assertEqual(sorted(os.listdir(os.path.dirname(destination))), ['.store', 'anim_cave_ANIM_002_aw.ma'])
+        self.assertEqual(version_store.names(), ['anim_cave_ANIM_001_aw.ma', 'anim_cave_ANIM_002_aw.ma'])
+
+    def _save_old(self, path):
+        with open(path, 'w') as scene:
+            scene.write('requires maya "2015";\n' * 200)
+        return path
+
+    def testSavePipeline_store_failure_still_publishes(self):
+        destination = os.path.join(self.folder, 'anim', 'anim_cave_ANIM_002_aw.ma')
+
+        class BrokenStore(object):
+            def put(self, path, name=None):
+                raise IOError('store is full')
+
+        job = self.pipeline.save(destination, self._write, store=BrokenStore())
+        self.assertEqual(job.wait(timeout=5), destination)
+        self.assertTrue(isinstance(job.store_error, IOError))
+        self.assertEqual(self.pipeline.wait(timeout=5), [])
+        self.assertEqual(os.listdir(os.path.join(self.folder, 'scratch')), [])
+
+    def testWaitForPipeline(self):
+        pipeline._pipeline, previous = self.pipeline, pipeline._pipeline
+        try:
+            destination = os.path.join(self.folder, 'anim_cave_ANIM_002_aw.ma')
+            open(destination, 'w').close()
+            job = self.pipeline.save(destination, self._write)
+            self.assertEqual(pipeline.wait_for_pipeline(timeout=5), [job])
+        finally:
+            pipeline._pipeline = previous
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+    :module: test_services
+    :platform: None
+    :synopsis: This module tests the services.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import os
+import shutil
+import tempfile
+import unittest
+from save import model, services
+
+TREE = {'macysSanta_5403623': {'build': ['char_santa', 'prop_sleigh'], 'sc010': ['sc010_sh0010']}}
+
+class TestMemoryContexts(unittest.TestCase):
+
+    def setUp(self):
+        self.service = services.MemoryContexts(TREE, assets={('macysSanta_5403623', 'build', 'char_santa'):
+                                                             [('model', 'char_santa_MDL_001_aw.ma'),
+                                                              ('rig', 'char_santa_RIG_002_aw.ma')]})
+
+    def testMemoryContexts_contextFactory(self):
+        context = self.service.contextFactory({'job': 'macysSanta_5403623', 'scene': 'build', 'shot': 'char_santa',
+                                               'extra': 'ignored'})
+        self.assertEqual(dict(context), {'job': 'macysSanta_5403623', 'scene': 'build', 'shot': 'char_santa'})
+        self.assertEqual(context.name, 'char_santa')
+        self.assertEqual(context.scene.name, 'build')
+        self.assertEqual(context.job.name, 'macysSanta_5403623')
+        self.assertEqual(self.service.contextFactory(context), context)
+
+    def testMemoryContexts_findChildren(self):
+        job = self.service.contextFactory({'job': 'macysSanta_5403623'})
+        self.assertEqual([scene.name for scene in job.findChildren()], ['build', 'sc010'])
+        self.assertEqual([shot.name for shot in job.findChildren()[0].findChildren()], ['char_santa', 'prop_sleigh'])
+
+    def testMemoryContexts_findChildrenBatch(self):
+        job = self.service.contextFactory({'job': 'macysSanta_5403623'})
+        found = self.service.findChildrenBatch(job.findChildren())
+        self.assertEqual(dict((scene.name, [shot.name for shot in shots]) for scene, shots in found.items()),
+                         {'build': ['char_santa', 'prop_sleigh'], 'sc010': ['sc010_sh0010']})
+        self.assertEqual(self.service.calls, 2)
+
+    def testMemoryContexts_validateContexts(self):
+        found = self.service.contextFactory({'job': 'macysSanta_5403623', 'scene': 'build', 'shot': 'char_santa'})
+        missing = self.service.contextFactory({'job': 'macysSanta_5403623', 'scene': 'build', 'shot': 'char_elf'})
+        self.assertEqual(self.service.validateContexts([found, missing, found.scene]), [True, False, True])
+        self.assertEqual(self.service.calls, 1)
+        self.assertFalse(self.service.validateContext(missing))
+
+    def testMemoryContexts_findAssets(self):
+        scene = self.service.contextFactory({'job': 'macysSanta_5403623', 'scene': 'build'})
+        self.assertEqual(list(self.service.findAssets(scene)), [])
+        found = list(self.service.findAssets(scene, assetType='rig', recursive=True))
+        self.assertEqual([(context.name, asset_type, name) for context, asset_type, name in found],
+                         [('char_santa', 'rig', 'char_santa_RIG_002_aw.ma')])
+
+    def testMemoryContexts_findAssetsPage(self):
+        job = self.service.contextFactory({'job': 'macysSanta_5403623'})
+        first, cursor = self.service.findAssetsPage(job, recursive=True, limit=1)
+        self.assertEqual([name for _, _, name in first], ['char_santa_MDL_001_aw.ma'])
+        second, cursor = self.service.findAssetsPage(job, recursive=True, limit=1, cursor=cursor)
+        self.assertEqual(([name for _, _, name in second], cursor), (['char_santa_RIG_002_aw.ma'], None))
+
+    def testMemoryContexts_findVersionsOfAssets(self):
+        job = self.service.contextFactory({'job': 'macysSanta_5403623'})
+        found = list(self.service.findVersionsOfAssets(job, name='char_santa_RIG', recursive=True))
+        self.assertEqual([(context.name, asset_type, name) for (context, asset_type, name), _ in found],
+                         [('char_santa', 'rig', 'char_santa_RIG')])
+        self.assertEqual(found[0][1], (services.AssetVersion(2, 'aw', None, None),))
+
+
+class TestLocalContexts(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for scene, shots in TREE['macysSanta_5403623'].items():
+            for shot in shots:
+                os.makedirs(os.path.join(self.root, 'macysSanta_5403623', scene, shot, 'maya', 'scenes'))
+        folder = os.path.join(self.root, 'macysSanta_5403623', 'build', 'char_santa', 'maya', 'scenes', 'model',
+                              'aweber')
+        os.makedirs(folder)
+        open(os.path.join(folder, 'char_santa_MDL_001_aw.ma'), 'w').close()
+        self.service = services.LocalContexts(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def testLocalContexts_findChildren(self):
+        job = self.service.contextFactory({'job': 'macysSanta_5403623'})
+        self.assertEqual([scene.name for scene in job.findChildren()], ['build', 'sc010'])
+        self.assertEqual([shot.name for shot in job.findChildren()[1].findChildren()], ['sc010_sh0010'])
+
+    def testLocalContexts_validateContexts(self):
+        self.assertEqual(self.service.validateContexts([
+            self.service.contextFactory({'job': 'macysSanta_5403623', 'scene': 'build', 'shot': 'prop_sleigh'}),
+            self.service.contextFactory({'job': 'macysSanta_5403623', 'scene': 'build', 'shot': 'char_elf'})]),
+            [True, False])
+
+    def testLocalContexts_findAssets(self):
+        job = self.service.contextFactory({'job': 'macysSanta_5403623'})
+        found = list(self.service.findAssets(job, recursive=True))
+        self.assertEqual([(context.name, asset_type, name) for context, asset_type, name in found],
+                         [('char_santa', 'model', 'char_santa_MDL_001_aw.ma')])
+
+    def testLocalContexts_findVersionsOfAssets(self):
+        folder = os.path.join(self.root, 'macysSanta_5403623', 'build', 'char_santa', 'maya', 'scenes', 'model',
+                              'jfox')
+        os.makedirs(folder)
+        for version in [2, 3]:
+            open(os.path.join(folder, 'char_santa_MDL_%03d_jf_fix.ma' % version), 'w').close()
+        os.utime(os.path.join(folder, 'char_santa_MDL_002_jf_fix.ma'), (1000, 1000))
+        shot = self.service.contextFactory({'job': 'macysSanta_5403623', 'scene': 'build', 'shot': 'char_santa'})
+        (found, versions), = self.service.findVersionsOfAssets(shot, assetType='model', recent=2)
+        self.assertEqual((found[1:], [(version.version, version.user) for version in versions]),
+                         (('model', 'char_santa_MDL'), [(3, 'jf'), (2, 'jf')]))
+        self.assertEqual(versions[0].path, os.path.join(folder, 'char_santa_MDL_003_jf_fix.ma'))
+        (_, versions), = self.service.findVersionsOfAssets(shot, name=['char_santa_MDL'], startDateTime=2000)
+        self.assertEqual([version.version for version in versions], [3, 1])
+        self.assertEqual(list(self.service.findVersionsOfAssets(shot, assetType='rig')), [])
+
+
+class TestFromConfig(unittest.TestCase):
+
+    def testFromConfig_backends(self):
+        config_in = {'map': {'server': 'jobs'},
+                     'path': {'template_discipline_folder': 'maya/scenes/{DISCIPLINE}'},
+                     'services': {'backend': 'local', 'latency': '0'}}
+        service = services.from_config(config_in)
+        self.assertEqual((service.root, service.scenes_folder), ('/jobs', 'maya/scenes'))
+        config_in['services']['backend'] = 'memory'
+        self.assertTrue(isinstance(services.from_config(config_in), services.MemoryContexts))
+        config_in['services']['backend'] = 'unknown'
+        self.assertRaises(ValueError, services.from_config, config_in)
+
+    def testFromConfig_directory(self):
+        model.set_context_service(services.MemoryContexts(TREE))
+        try:
+            directory = model.Directory({'job': 'macysSanta_5403623', 'scene': 'build', 'shot': 'char_santa'})
+            self.assertEqual(sorted(directory.get_scenes()), ['build', 'sc010'])
+            self.assertTrue(directory.set_cur_dir(shot='prop_sleigh'))
+            self.assertEqual(directory.context.name, 'prop_sleigh')
+            self.assertFalse(directory.set_cur_dir(shot='char_elf'))
+            service = model.get_context_service()
+            calls = service.calls
+            directory.refresh_tree()
+            self.assertEqual(service.calls - calls, 2)
+        finally:
+            model.set_context_service(None)
+            model._validation_cache.clear()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+    :module: test_store
+    :platform: None
+    :synopsis: This module tests the store.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from save import delta
+from save import fsutil
+from save import index
+from save import model
+from save import store
+from save.benchmark.fixtures import make_scene
+
+class TestIterChunks(unittest.TestCase):
+
+    def testIterChunks_roundtrip_and_bounds(self):
+        content = make_scene(5000)
+        chunks = list(store.iter_chunks(StringIO(content), mask_bits=6, min_size=1024, max_size=8192))
+        self.assertEqual(''.join(chunks), content)
+        self.assertTrue(len(chunks) > 10)
+        self.assertTrue(all(len(chunk) <= 8192 for chunk in chunks))
+        self.assertTrue(all(len(chunk) >= 1024 for chunk in chunks[:-1]))
+
+    def testIterChunks_edit_is_local(self):
+        content = make_scene(5000)
+        edited = content.replace('"node2500"', '"node2500_renamed"')
+        chunks = set(store.iter_chunks(StringIO(content), mask_bits=6, min_size=1024, max_size=8192))
+        edited_chunks = list(store.iter_chunks(StringIO(edited), mask_bits=6, min_size=1024, max_size=8192))
+        self.assertTrue(len([chunk for chunk in edited_chunks if chunk not in chunks]) <= 2)
+
+    def testIterChunks_no_line_breaks(self):
+        chunks = list(store.iter_chunks(StringIO('x' * 20000), max_size=8192))
+        self.assertEqual([len(chunk) for chunk in chunks], [8192, 8192, 3616])
+
+
+class TestVersionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = store.VersionStore(os.path.join(self.folder, '.store'), mask_bits=6, min_size=1024,
+                                        max_size=8192)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _save(self, filename, content):
+        path = os.path.join(self.folder, filename)
+        with open(path, 'wb') as scene:
+            scene.write(content)
+        return path
+
+    def testVersionStore_dedup(self):
+        content = make_scene(5000)
+        first = self.store.put(self._save('anim_cave_ANIM_001_aw.ma', content))
+        second = self.store.put(self._save('anim_cave_ANIM_002_aw.ma', content.replace('node2500', 'nodeX')))
+        self.assertEqual(first.new_bytes, len(content))
+        self.assertTrue(second.new_bytes < len(content) / 10)
+        self.assertEqual(self.store.names(), ['anim_cave_ANIM_001_aw.ma', 'anim_cave_ANIM_002_aw.ma'])
+        stats = self.store.stats()
+        self.assertTrue(stats['stored_bytes'] < stats['logical_bytes'] / 2)
+
+    def testVersionStore_materialize(self):
+        content = make_scene(2000)
+        self.store.put(self._save('anim_cave_ANIM_001_aw.ma', content))
+        destination = os.path.join(self.folder, 'restored', 'anim_cave_ANIM_001_aw.ma')
+        os.makedirs(os.path.dirname(destination))
+        self.store.materialize('anim_cave_ANIM_001_aw.ma', destination)
+        self.assertEqual(open(destination, 'rb').read(), content)
+        with open(destination, 'ab') as restored:
+            restored.write('edited in place\n')
+        self.assertEqual(''.join(self.store.iter_content('anim_cave_ANIM_001_aw.ma')), content)
+
+    def testVersionStore_evict(self):
+        contents = dict((version, make_scene(1000, seed=version)) for version in range(1, 6))
+        for version in sorted(contents):
+            self._save('anim_cave_ANIM_%03d_aw.ma' % version, contents[version])
+        self._save('anim_cave_ANIM_001_aw.mb', 'binary')
+        evicted = self.store.evict(model.get_filename_parser(), keep=2)
+        self.assertEqual([result.name for result in evicted],
+                         ['anim_cave_ANIM_001_aw.ma', 'anim_cave_ANIM_002_aw.ma', 'anim_cave_ANIM_003_aw.ma'])
+        self.assertEqual(sorted(os.listdir(self.folder)), ['.store', 'anim_cave_ANIM_001_aw.mb',
+                                                            'anim_cave_ANIM_004_aw.ma', 'anim_cave_ANIM_005_aw.ma'])
+        self.assertEqual(sorted(store.stored_names(self.folder)), [result.name for result in evicted])
+        path = os.path.join(self.folder, 'anim_cave_ANIM_002_aw.ma')
+        self.assertTrue(store.is_stored(path))
+        self.assertFalse(store.is_stored(os.path.join(self.folder, 'anim_cave_ANIM_005_aw.ma')))
+        self.assertEqual(store.restore(path), path)
+        self.assertEqual(open(path, 'rb').read(), contents[2])
+        self.assertFalse(store.is_stored(path))
+        history = index.VersionIndex(model.get_filename_parser(), self.folder).scan()
+        self.assertEqual(history.versions('anim_cave', 'ANIM'), [1, 1, 2, 3, 4, 5])
+
+    def testVersionStore_evict_keeps_delta_bases(self):
+        parser = model.get_filename_parser()
+        for version in range(1, 8):
+            self._save('anim_cave_ANIM_%03d_aw.ma' % version, make_scene(1000, seed=version))
+        delta.compact(self.folder, parser, keep=3)
+        self._save('anim_cave_ANIM_008_aw.ma', make_scene(1000, seed=8))
+        evicted = self.store.evict(parser, keep=1)
+        self.assertEqual([result.name for result in evicted], ['anim_cave_ANIM_006_aw.ma', 'anim_cave_ANIM_007_aw.ma'])
+        self.assertTrue(os.path.exists(os.path.join(self.folder, 'anim_cave_ANIM_005_aw.ma')))
+        self.assertEqual(delta.broken_chains(self.folder), [])
+        self.assertEqual(delta.reconstruct(os.path.join(self.folder, 'anim_cave_ANIM_001_aw.ma')),
+                         make_scene(1000, seed=1))
+
+    def testVersionStore_evicted_history(self):
+        path = self._save('anim_cave_ANIM_001_aw.ma', make_scene(1000, seed=1))
+        os.utime(path, (1000000000, 1000000000))
+        self._save('anim_cave_ANIM_002_aw.ma', make_scene(1000, seed=2))
+        self.store.evict(model.get_filename_parser(), keep=1)
+        self.assertTrue(store.is_stored(path))
+        history = index.VersionIndex(model.get_filename_parser(), self.folder).scan().history('anim_cave', 'ANIM')
+        self.assertEqual([(version.version, version.mtime) for version in history][1:], [(1, 1000000000)])
+
+    def testVersionStore_put_syncs_once(self):
+        synced = []
+        original = fsutil.fsync_files
+        fsutil.fsync_files = lambda paths: synced.append(list(paths)) or original(paths)
+        try:
+            result = self.store.put(self._save('anim_cave_ANIM_001_aw.ma', make_scene(5000)))
+            again = self.store.put(self._save('anim_cave_ANIM_002_aw.ma', make_scene(5000)))
+        finally:
+            fsutil.fsync_files = original
+        self.assertTrue(result.new_chunks > 1)
+        self.assertEqual([len(paths) for paths in synced], [result.new_chunks, 0])
+        self.assertEqual(again.new_chunks, 0)
+
+    def testVersionStore_gc(self):
+        self.store.put(self._save('anim_cave_ANIM_001_aw.ma', make_scene(2000, seed=1)))
+        self.store.put(self._save('anim_cave_ANIM_002_aw.ma', make_scene(2000, seed=2)))
+        self.assertEqual(self.store.gc(), 0)
+        self.store.remove('anim_cave_ANIM_001_aw.ma')
+        self.assertTrue(self.store.gc() > 0)
+        self.assertEqual(''.join(self.store.iter_content('anim_cave_ANIM_002_aw.ma')), make_scene(2000, seed=2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+    :module: test_tasks
+    :platform: None
+    :synopsis: This module tests the tasks.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import threading
+import time
+import unittest
+from save import tasks
+
+class TestFuture(unittest.TestCase):
+
+    def testFuture_result(self):
+        self.assertEqual(tasks.submit(sum, [1, 2, 3]).result(timeout=5), 6)
+
+    def testFuture_exception_reraised(self):
+        future = tasks.submit(int, 'not a number')
+        self.assertRaises(ValueError, future.result, 5)
+        self.assertTrue(isinstance(future.exception(), ValueError))
+
+    def testFuture_timeout(self):
+        release = threading.Event()
+        future = tasks.submit(release.wait)
+        self.assertRaises(tasks.TimeoutError, future.result, 0.01)
+        release.set()
+        future.result(timeout=5)
+
+    def testFuture_callback_after_done(self):
+        future = tasks.submit(len, 'abc')
+        future.result(timeout=5)
+        results = []
+        future.add_done_callback(lambda done: results.append(done.result()))
+        self.assertEqual(results, [3])
+
+    def testFuture_then(self):
+        self.assertEqual(tasks.then(tasks.submit(sum, [1, 2, 3]), str).result(timeout=5), '6')
+        self.assertRaises(ValueError, tasks.then(tasks.submit(int, 'not a number'), str).result, 5)
+
+
+class TestMapAsync(unittest.TestCase):
+
+    def testMapAsync_ordered_results(self):
+        self.assertEqual(tasks.map_async(len, ['a', 'abc', '', 'ab'], concurrency=2).result(timeout=5), [1, 3, 0, 2])
+
+    def testMapAsync_empty(self):
+        self.assertEqual(tasks.map_async(len, []).result(timeout=5), [])
+
+    def testMapAsync_concurrency_bounded(self):
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def work(item):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return item
+
+        self.assertEqual(tasks.map_async(work, range(10), concurrency=4).result(timeout=5), range(10))
+        self.assertEqual(peak[0], 4)
+
+    def testMapAsync_failure(self):
+        future = tasks.map_async(int, ['1', 'not a number', '3'], concurrency=1)
+        self.assertRaises(ValueError, future.result, 5)
+
+
+class TestImapUnordered(unittest.TestCase):
+
+    def testImapUnordered_results(self):
+        self.assertEqual(sorted(tasks.imap_unordered(len, iter(['a', 'abc', '', 'ab']), concurrency=3)), [0, 1, 2, 3])
+        self.assertEqual(list(tasks.imap_unordered(len, [])), [])
+
+    def testImapUnordered_nested(self):
+        inner = tasks.imap_unordered(lambda item: item * 2, range(20), concurrency=4)
+        self.assertEqual(sorted(tasks.imap_unordered(lambda item: item + 1, inner, concurrency=4)),
+                         [item * 2 + 1 for item in range(20)])
+
+    def testImapUnordered_failure(self):
+        results = tasks.imap_unordered(int, ['1', 'not a number', '3'], concurrency=1)
+        self.assertRaises(ValueError, list, results)
+
+if __name__ == '__main__':
+    unittest.main()
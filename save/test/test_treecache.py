@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+    :module: test_treecache
+    :platform: None
+    :synopsis: This module tests the treecache.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import os
+import shutil
+import tempfile
+import unittest
+from save import treecache
+
+class TestJobTreeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.job_path = os.path.join(self.temp_dir, 'jobs', 'test_job')
+        self.cache_file = os.path.join(self.temp_dir, 'cache', 'test_job.tree')
+        os.makedirs(os.path.join(self.job_path, 'test_scene01'))
+        os.makedirs(os.path.join(self.job_path, 'test_scene02'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _touch(self, path, mtime):
+        os.utime(path, (mtime, mtime))
+
+    def testJobTreeCache_empty(self):
+        disk_cache = treecache.JobTreeCache(self.cache_file, self.job_path)
+        self.assertEqual(disk_cache.get_scenes(), None)
+        self.assertEqual(disk_cache.get_shots('test_scene01'), None)
+
+    def testJobTreeCache_persists(self):
+        disk_cache = treecache.JobTreeCache(self.cache_file, self.job_path)
+        disk_cache.set_scenes(['test_scene01', 'test_scene02'])
+        disk_cache.set_shots('test_scene01', ['test_shot1'])
+        disk_cache = treecache.JobTreeCache(self.cache_file, self.job_path)
+        self.assertEqual(disk_cache.get_scenes(), ['test_scene01', 'test_scene02'])
+        self.assertEqual(disk_cache.get_shots('test_scene01'), ['test_shot1'])
+        self.assertEqual(disk_cache.get_shots('test_scene02'), None)
+
+    def testJobTreeCache_scene_mtime_invalidates_scene_only(self):
+        disk_cache = treecache.JobTreeCache(self.cache_file, self.job_path)
+        disk_cache.set_scenes(['test_scene01', 'test_scene02'])
+        disk_cache.set_shots('test_scene01', ['test_shot1'])
+        disk_cache.set_shots('test_scene02', ['test_shot2'])
+        self._touch(os.path.join(self.job_path, 'test_scene01'), 1000)
+        self.assertEqual(disk_cache.get_shots('test_scene01'), None)
+        self.assertEqual(disk_cache.get_shots('test_scene02'), ['test_shot2'])
+        self.assertEqual(disk_cache.get_scenes(), ['test_scene01', 'test_scene02'])
+
+    def testJobTreeCache_job_mtime_invalidates_listing(self):
+        disk_cache = treecache.JobTreeCache(self.cache_file, self.job_path)
+        disk_cache.set_scenes(['test_scene01'])
+        self._touch(self.job_path, 1000)
+        self.assertEqual(disk_cache.get_scenes(), None)
+
+    def testJobTreeCache_deferred_writes(self):
+        disk_cache = treecache.JobTreeCache(self.cache_file, self.job_path)
+        with disk_cache.deferred_writes():
+            disk_cache.set_scenes(['test_scene01'])
+            self.assertFalse(os.path.exists(self.cache_file))
+        self.assertTrue(os.path.exists(self.cache_file))
+
+    def testJobTreeCache_missing_job_not_written(self):
+        disk_cache = treecache.JobTreeCache(self.cache_file, os.path.join(self.temp_dir, 'missing'))
+        disk_cache.set_scenes(['test_scene01'])
+        self.assertFalse(os.path.exists(self.cache_file))
+
+    def testJobTreeCache_disabled(self):
+        disk_cache = treecache.JobTreeCache(None, self.job_path)
+        disk_cache.set_scenes(['test_scene01'])
+        self.assertEqual(disk_cache.get_scenes(), None)
+
+if __name__ == '__main__':
+    unittest.main()
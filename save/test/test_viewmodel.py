@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+    :module: test_viewmodel
+    :platform: None
+    :synopsis: This module tests the viewmodel.py module
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+import unittest
+from save import viewmodel
+
+class TestSaveViewModel(unittest.TestCase):
+
+    def setUp(self):
+        self.pending = []
+        self.labels = []
+        self.view_model = viewmodel.SaveViewModel(scheduler=self.pending.append,
+                                                  description='anim_cave', discipline='ANIM', version=2,
+                                                  extension='ma', initials='aw', username='aweber',
+                                                  project_folder='/jobs/test_job/test_scene01/test_shot1',
+                                                  original_folder='/tmp')
+        self.view_model.bind('file_path', self.labels.append)
+
+    def _run_pending(self):
+        while self.pending:
+            self.pending.pop(0)()
+
+    def testSaveViewModel_initial(self):
+        self.assertEqual(self.view_model['filename'], 'anim_cave_ANIM_002_aw.ma')
+        self.assertEqual(self.labels,
+                         ['/jobs/test_job/test_scene01/test_shot1/maya/scenes/anim/aweber/anim_cave_ANIM_002_aw.ma'])
+
+    def testSaveViewModel_coalesces_updates(self):
+        self.view_model.set(version=3)
+        self.view_model.set(optional='fix')
+        self.view_model.set(version_letter='b')
+        self.assertEqual(len(self.pending), 1)
+        self._run_pending()
+        self.assertEqual(self.labels[1:],
+                         ['/jobs/test_job/test_scene01/test_shot1/maya/scenes/anim/aweber/anim_cave_ANIM_003b_aw_fix.ma'])
+
+    def testSaveViewModel_unchanged_text_not_set(self):
+        self.view_model.set(version=3)
+        self.view_model.set(version=2)
+        self._run_pending()
+        self.view_model.set(description='anim_cave')
+        self._run_pending()
+        self.assertEqual(len(self.labels), 1)
+
+    def testSaveViewModel_only_dependents_recomputed(self):
+        self.view_model['file_path']
+        self.view_model.set(use_original_folder=True)
+        self.assertEqual(self.view_model._dirty, set(['file_path']))
+        self._run_pending()
+        self.assertEqual(self.labels[-1], '/tmp/anim_cave_ANIM_002_aw.ma')
+        self.view_model.set(discipline='MDL')
+        self.assertEqual(self.view_model._dirty, set(['filename', 'discipline_folder', 'file_path']))
+
+    def testSaveViewModel_unknown_field(self):
+        self.assertRaises(KeyError, self.view_model.set, colour='red')
+
+if __name__ == '__main__':
+    unittest.main()
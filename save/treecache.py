@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+    :module: treecache
+    :platform: None
+    :synopsis: This module contains the on-disk cache of a job's scene/shot tree
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import contextlib
+import marshal
+import os
+import threading
+
+
+class JobTreeCache(object):
+    """ Persists one job's scene listing and per-scene shot lists to a small marshal file.
+        Entries are trusted for as long as the mtime of the folder they were read from is unchanged,
+        the job folder for the scene listing and each scene folder for its shots.
+    Usage:
+        a = JobTreeCache('/home/aw/.cache/mpcsave/macysSanta_5403623.tree', '/jobs/macysSanta_5403623')
+        a.get_scenes()
+        a.set_scenes(['build', 'shots'])
+        a.get_shots('shots')
+        a.invalidate('shots')
+    """
+    FORMAT = 1
+
+    def __init__(self, cache_file, job_path):
+        """ init
+        Args:
+            cache_file (str): file the tree is stored in, None disables the cache
+            job_path (str): folder of the job on disk
+        """
+        self.cache_file = cache_file
+        self.job_path = job_path
+        self._stats = {}
+        self._deferred = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._data = self._read()
+
+    def get_scenes(self):
+        """ Returns the cached scene names or None if the job folder changed since they were stored
+        """
+        with self._lock:
+            mtime = self._mtime(self.job_path)
+            if mtime is None or self._data['job_mtime'] != mtime:
+                return None
+            return sorted(self._data['scenes'])
+
+    def set_scenes(self, scene_names):
+        """ Stores the job's scene listing, keeping the shot lists of scenes that are still present
+            Nothing is stored for a job folder that can't be found since it could never be validated
+        Args:
+            scene_names [str]: scene names
+        """
+        with self._lock:
+            mtime = self._stats.pop(self.job_path, None) or self._mtime(self.job_path)
+            if mtime is None:
+                return
+            scenes = self._data['scenes']
+            self._data['scenes'] = dict((name, scenes.get(name, (None, None))) for name in scene_names)
+            self._data['job_mtime'] = mtime
+            self._changed()
+
+    def get_shots(self, scene_name):
+        """ Returns the cached shot names of a scene or None if the scene folder changed since they were stored
+        """
+        with self._lock:
+            stored_mtime, shots = self._data['scenes'].get(scene_name, (None, None))
+            mtime = self._mtime(self._scene_path(scene_name))
+            if mtime is None or stored_mtime != mtime:
+                return None
+            return list(shots)
+
+    def set_shots(self, scene_name, shot_names):
+        """ Stores the shot names of a scene
+        Args:
+            scene_name (str): scene the shots belong to
+            shot_names [str]: shot names
+        """
+        with self._lock:
+            scene_path = self._scene_path(scene_name)
+            mtime = self._stats.pop(scene_path, None) or self._mtime(scene_path)
+            if mtime is None:
+                return
+            self._data['scenes'][scene_name] = (mtime, list(shot_names))
+            self._changed()
+
+    def invalidate(self, scene_name=None):
+        """ Forgets a scene's shots, or everything about the job when no scene is given
+        """
+        with self._lock:
+            if scene_name is None:
+                self._data = self._empty()
+            elif scene_name in self._data['scenes']:
+                self._data['scenes'][scene_name] = (None, None)
+            self._changed()
+
+    @contextlib.contextmanager
+    def deferred_writes(self):
+        """ Holds back writing to disk until the outermost block exits, used when filling many scenes at once
+        """
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                if not self._deferred:
+                    self.flush()
+
+    def flush(self):
+        """ Writes the tree to the cache file if it changed, via a temp file so readers never see a partial tree
+        """
+        with self._lock:
+            if not self._dirty or not self.cache_file:
+                return
+            self._dirty = False
+            temp_file = '%s.%d.tmp' % (self.cache_file, os.getpid())
+            try:
+                if not os.path.isdir(os.path.dirname(self.cache_file)):
+                    os.makedirs(os.path.dirname(self.cache_file))
+                with open(temp_file, 'wb') as stream:
+                    marshal.dump(self._data, stream)
+                os.rename(temp_file, self.cache_file)
+            except (IOError, OSError):
+                pass
+
+    def _changed(self):
+        self._dirty = True
+        if not self._deferred:
+            self.flush()
+
+    def _read(self):
+        """ Loads the cache file, anything unreadable or from another format version counts as empty
+        """
+        if self.cache_file:
+            try:
+                with open(self.cache_file, 'rb') as stream:
+                    data = marshal.load(stream)
+                if data.get('format') == self.FORMAT and data.get('job_path') == self.job_path:
+                    return data
+            except (IOError, OSError, EOFError, ValueError, TypeError, AttributeError):
+                pass
+        return self._empty()
+
+    def _empty(self):
+        return {'format': self.FORMAT, 'job_path': self.job_path, 'job_mtime': None, 'scenes': {}}
+
+    def _scene_path(self, scene_name):
+        return os.path.join(self.job_path, scene_name)
+
+    def _mtime(self, path):
+        """ Stats a folder and remembers the result so a following set_* stores the mtime that was validated
+        Returns (float): mtime or None if the folder can't be read or the cache is disabled
+        """
+        if not self.cache_file:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        self._stats[path] = mtime
+        return mtime
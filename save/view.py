@@ -18,20 +18,31 @@ import string
 import getpass as gp
 import maya.cmds as cmds
 import maya.mel as mel
+import maya.utils as mutils
 import sys as sys
 import os
 
 # importing the colors module
 from aw.maya.env import aw_windows as wind
 import save.model as model
+import save.viewmodel as viewmodel
+import save.pipeline as pipeline
 reload(wind)
 reload(model)
+reload(viewmodel)
+reload(pipeline)
 
 
 class MPCSaveUI(object):
     def __init__(self):        
         #VAR SETUP#
         self.save_data = model.SaveData(os.path.abspath(cmds.file(q=True, sn=True)))
+        self.disciplines = model.config['map']['disciplines']
+        # Widget callbacks only change fields, the file path label is refreshed once per idle from the view model
+        self.view_model = viewmodel.SaveViewModel.from_save_data(self.save_data, scheduler=mutils.executeDeferred)
+        # The job tree loads in the background while the window builds, the scene/shot menus fill in once it's ready
+        self.tree_future = self.save_data.dir.refresh_tree_async(callback=self._onTreeLoaded)
+        _installQuitJob()
         self._setupUI()
     
     def _setupUI(self):
@@ -50,24 +61,29 @@ class MPCSaveUI(object):
         self.title_tx = pm.symbolButton(image='save_105.png', w=105, h=105)
         self.col = pm.columnLayout(p=self.fl)
         pm.text(l='Saving to Directory:', fn='boldLabelFont')
-        self._updateFile(False)
-        self.filePath_tx = pm.text('filePath_tx', l=self.file)
+        self.filePath_tx = pm.text('filePath_tx', l=self.view_model['file_path'])
+        self.context_rl = pm.rowLayout(nc=2, p=self.col)
+        self.scene_om = pm.optionMenu('scene_om', label='Scene', p=self.context_rl, en=False, cc=self._changeScene_om)
+        pm.menuItem(label='loading...', p=self.scene_om)
+        self.shot_om = pm.optionMenu('shot_om', label='Shot', p=self.context_rl, en=False, cc=self._changeShot_om)
+        pm.menuItem(label='loading...', p=self.shot_om)
+        pm.setParent(self.col)
         pm.text(l='')
         self.header = pm.text('header_tf',fn='boldLabelFont', l='Filename')
         self.origFile_om = wind.AW_optionMenu(label='', options=['Original Folder', 'Auto-detect'], parent=self.col, cc=self._changeOrigFolder_om)
-        if self.save_data.dir.is_new_file: self.origFile_om.setSelect(2)
+        if self.save_data.is_new_file: self.origFile_om.setSelect(2)
         
         self.layout = pm.formLayout(nd=100)
         
-        self.fileDescr_tf = pm.textField('fileDescr_tf',text=self.fileDescr, p=self.layout, w=200, cc=self._changeFileDescr)
+        self.fileDescr_tf = pm.textField('fileDescr_tf',text=self.view_model['description'], p=self.layout, w=200, cc=self._changeFileDescr)
         self.discipline_om = wind.AW_optionMenu(label='_', options=self.disciplines, parent=self.layout, cc=self._changeDiscipline)
         self.spacer = pm.text(l='_v', p=self.layout,w=10)
-        self.version_tf = pm.textField('version_tf',text='%03d'%self.version, p=self.layout, w=30, cc= self._changeVersionNumber)
+        self.version_tf = pm.textField('version_tf',text='%03d'%self.view_model['version'], p=self.layout, w=30, cc= self._changeVersionNumber)
         self.versionOptional_om = wind.AW_optionMenu(label='', options=['']+list(string.lowercase), parent=self.layout, cc=self._changeVersionOptional_om)
         self.optionalNote_tf = pm.textField('optionalNote_tf', text='(optional note)', p=self.layout, w=150, cc=self._changeOptionalNoteTx)
         self.type = wind.AW_optionMenu(label='_', options=['.ma','.mb'], parent=self.layout, cc=self._changeType_om)
-        if self.initialFileType=='ma': self.type.setSelect(1)
-        if self.initialFileType=='mb': self.type.setSelect(2)
+        if self.view_model['extension']=='ma': self.type.setSelect(1)
+        if self.view_model['extension']=='mb': self.type.setSelect(2)
         self.save_btn = pm.button(label='Save', command=self._save,h=20, bgc=self.go_yellow_cl)
 
         pm.formLayout(self.layout, e=True, af=[(self.fileDescr_tf, 'left', 0),
@@ -81,130 +97,134 @@ class MPCSaveUI(object):
                                                    (self.save_btn, 'left',5,self.type.optionMenu)])
         pm.formLayout(self.fl, e=True, af=[(self.col, 'top', 10)], ac=[(self.col, 'left',10, self.title_tx)])
         
-        self._setVersionOption(self.versionOption_startup)
-        self._getDiscipline()
-        self._updateFilename()
-        self._updateFilePathTx()
+        if self.view_model['discipline'] in self.disciplines:
+            self._setDiscipline(self.view_model['discipline'])
+        self._changeOrigFolder_om()
+        self.view_model.bind('file_path', self.filePath_tx.setLabel)
         
         self.window.show()
     
     
     def _save(self, *args):
-        """Saves the file from self.file."""
-        self._updateFilename()
-        if self.origFile_om.getSelect()==1: self._updateFile(True)
-        else: self._updateFile(False)
-        self._updateFilePathTx()
+        """Saves the scene to local scratch and publishes it to the view model's file path in the background."""
+        if not self.view_model['description']: pm.error("You need to enter a file description")
+        self.view_model.flush()
+        self.file = self.view_model['file_path']
+        if os.path.exists(self.file): pm.error("%s already exists, pick another version" % self.file)
         print 'Saving as new file:\n%s' % (self.file)        
         
-        #creating the user dir if it doesn't exist
-        if not os.path.exists(os.path.dirname(self.file)):
-            os.makedirs(os.path.dirname(self.file))
+        file_type = 'mayaBinary' if self.type.getSelect(str=True) == '.mb' else 'mayaAscii'
         
-        #save the file
-        cmds.file( rn=self.file )
-        cmds.file( f=True, s=True, type = self.fileType[self.type.getSelect()-1] )
+        def write(local_path):
+            cmds.file( rn=local_path )
+            cmds.file( f=True, s=True, type = file_type )
         
-        if self.type.getSelect(str=True) == '.mb':
-            mel.eval('catch(`addRecentFile "%s" "%s"`);' % (self.file, "mayaBinary"))
-        elif self.type.getSelect(str=True) == '.ma':
-            mel.eval('catch(`addRecentFile "%s" "%s"`);' % (self.file, "mayaAscii"))
+        #Maya is free again once the local write is done, the copy to the job reports back when it finishes
+        self.save_job = pipeline.get_pipeline().save(self.file, write, callback=self._onPublished,
+                                                     store=self.save_data.get_version_store(os.path.dirname(self.file)))
+        cmds.file( rn=self.file )
+        mel.eval('catch(`addRecentFile "%s" "%s"`);' % (self.file, file_type))
         self._close()
-                    
     
- 
-    def _updateFilename(self):
-        """Updates the filename with latest internal vars.
-        Returns: str
-        """
-        if self.fileDescr == '': pm.error("You need to enter a file description")
-        
-        #Checking whether or not to append an optional note to the filename formatter
-        self.optionalNote = self.optionalNote_tf.getText()
-        optional = self.optionalNote
-        if optional == '(optional note)':
-            optional = None
-        
-        self._formatFilename(self.fileDescr,
-                             self.discipline_om.getSelect(str=True),
-                             'v%s' % str(self.version_tf.getText() + str(self.versionOptional_om.getSelect(str=True)) ),
-                             self.initials,
-                             self.type.getSelect(str=True),
-                             optional = optional)
-        
-        if self.origFile_om.getSelect()==1: self._updateFile(True)
-        else: self._updateFile(False)
-        
-        return self.filename
-    
-    
-
-    def _updateFile( self, origFolder ):
-        """Updates self.file with the most recent internal vars + formats it as an os.path type.
-        returns os.path
-        """
-        file_result = os.path.join( self.folder_project, self.folder_discipline, self.username, self.filename )
-        if origFolder:
-            file_result = os.path.join( self.origFolder,  self.filename )
-        self.file = file_result
-        return file_result
+    def _onPublished(self, save_job):
+        """Reports the finished background copy from Maya's main thread."""
+        if save_job.future.exception():
+            mutils.executeDeferred(pm.warning, 'Could not publish %s: %s' % (save_job.destination,
+                                                                             save_job.future.exception()))
+            return
+        mutils.executeDeferred(pm.displayInfo, 'Published %s' % save_job.destination)
+        if save_job.store_error:
+            mutils.executeDeferred(pm.warning, 'Published %s but could not add it to the version store: %s' %
+                                   (save_job.destination, save_job.store_error))
                                  
     def _setDiscipline(self, discipline, *args):
-        """Updates self.folder_discipline with the selected discipline path."""
+        """Selects a discipline in discipline_om."""
         self.discipline_om.setSelect(self.disciplines.index(discipline)+1)
-        self._updateFilename()
-        self._updateFilePathTx()
-    
-    def _setVersionOption(self, option, *args):
-        self.versionOptional_om.setSelect(self.versionOption_startup)
-        self._updateFilename()
-        self._updateFilePathTx()
+        self.view_model.set(discipline=discipline)
     
     def _changeVersionNumber(self, *args):
-        """Updates the file path textField onChange of discipline_om."""
-        self.version=self.version_tf.getText()
-        self._updateFilename()
-        self._updateFilePathTx()
+        """Updates the version onChange of version_tf."""
+        try:
+            self.view_model.set(version=int(self.version_tf.getText()))
+        except ValueError:
+            pm.warning('The version has to be a number')
         
     def _changeDiscipline(self, *args):
-        """Updates the file path textField onChange of discipline_om."""
-        self._setDiscipline(self.discipline_om.getSelect(str=True))
-        self._updateFilePathTx()
+        """Updates the discipline onChange of discipline_om."""
+        self.view_model.set(discipline=self.discipline_om.getSelect(str=True))
         
     def _changeOptionalNoteTx(self, *args):
-        """Updates the file path textField onChange of optionalNote_tx."""
-        self.optionalNote = self.optionalNote_tf.getText()
-        self._updateFilename()
-        self._updateFilePathTx()
+        """Updates the optional note onChange of optionalNote_tx."""
+        note = self.optionalNote_tf.getText()
+        self.view_model.set(optional=None if note in ('', '(optional note)') else note)
     
     def _changeVersionOptional_om(self, *args):
-        """Updates the file path textField onChange of versionOptional_om."""
-        self._updateFilename()
-        self._updateFilePathTx()
+        """Updates the version letter onChange of versionOptional_om."""
+        self.view_model.set(version_letter=self.versionOptional_om.getSelect(str=True))
         
     def _changeType_om(self, *args):
-        """Updates the file path textField onChange of type_om."""
-        self._updateFilename()
-        self._updateFilePathTx()
+        """Updates the extension onChange of type_om."""
+        self.view_model.set(extension=self.type.getSelect(str=True))
     
     def _changeOrigFolder_om(self, *args):
-        """Updates the file path to the original folder onChange of changeOrigFolder_om"""
-        self._updateFilename()
-        self._updateFilePathTx()
+        """Switches between the original folder and the auto-detected one onChange of changeOrigFolder_om"""
+        self.view_model.set(use_original_folder=self.origFile_om.getSelect()==1)
         
     def _changeFileDescr(self, *args):
-        """Updates the file path textField onChange of fileDescr_tf."""
-        self.fileDescr = "_".join( self.fileDescr_tf.getText().split(" ") )
-        self._updateFilename()
-        self._updateFilePathTx()
+        """Updates the description onChange of fileDescr_tf."""
+        self.view_model.set(description="_".join( self.fileDescr_tf.getText().split(" ") ))
         
-    def _updateFilePathTx(self):
-        """Updates the file path textField with latest internal vars."""
-        self.filePath_tx.setLabel( self.file )
+    def _onTreeLoaded(self, future):
+        """Hands the finished background tree walk back to Maya's main thread."""
+        mutils.executeDeferred(self._populateTree)
+    
+    def _populateTree(self):
+        """Fills the scene/shot option menus from the loaded job tree."""
+        if not pm.optionMenu(self.scene_om, q=True, ex=True):
+            return
+        if self.tree_future.exception():
+            pm.warning('Could not load the job tree: %s' % self.tree_future.exception())
+            return
+        context = dict(self.save_data.dir.context)
+        self._setMenuItems(self.scene_om, sorted(self.save_data.dir.get_scenes()), context.get('scene'))
+        self._setMenuItems(self.shot_om, self.save_data.dir.get_shots(context.get('scene')) or [], context.get('shot'))
+        self.scene_om.setEnable(True)
+        self.shot_om.setEnable(True)
+    
+    def _setMenuItems(self, option_menu, items, selected=None):
+        """Replaces the items of an option menu, selecting the given item if it's present."""
+        for item in cmds.optionMenu(option_menu, q=True, itemListLong=True) or []:
+            pm.deleteUI(item)
+        for item in items:
+            pm.menuItem(label=item, p=option_menu)
+        if selected in items:
+            option_menu.setSelect(items.index(selected) + 1)
+    
+    def _changeScene_om(self, *args):
+        """Refreshes the shot list onChange of scene_om."""
+        self._setMenuItems(self.shot_om, self.save_data.dir.get_shots(self.scene_om.getValue()) or [])
+        self._changeShot_om()
+    
+    def _changeShot_om(self, *args):
+        """Moves the save directory to the selected scene/shot onChange of shot_om."""
+        if self.shot_om.getValue():
+            self.save_data.dir.set_cur_dir(scene=self.scene_om.getValue(), shot=self.shot_om.getValue())
+        self.view_model.set(project_folder=self.save_data.dir.build_path())
     
     def _close ( self ):
         """closes the window.  Completely Useless one line function. I hate me."""
         self.window.delete()
 
+
+def _installQuitJob():
+    """Makes Maya wait for the background copies to the job before it quits, once per session."""
+    if not any('_waitForPublishes' in job for job in cmds.scriptJob(listJobs=True) or []):
+        cmds.scriptJob(event=['quitApplication', _waitForPublishes], protected=True)
+
+def _waitForPublishes():
+    """Blocks quitting until every background copy finished, naming the scratch files of the failed ones."""
+    for save_job in pipeline.wait_for_pipeline():
+        sys.stderr.write('Could not publish %s, the save is kept at %s\n' % (save_job.destination, save_job.source))
+
 if __name__=='__main__':
-    ui = MPCSaveUI()
\ No newline at end of file
+    ui = MPCSaveUI()
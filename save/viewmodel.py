@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+    :module: viewmodel
+    :platform: None
+    :synopsis: This module holds the save dialog's state and works out what the widgets need to show
+    :plans:
+"""
+__author__ = "Andres Weber"
+__email__ = "andresmweber@gmail.com"
+__version__ = 1.0
+
+# Default Imports
+import os
+
+# Project Imports
+import model
+
+
+class SaveViewModel(object):
+    """ Holds the fields the artist edits and the values derived from them (filename, file path).
+        set() only marks the derived values that depend on the changed fields, updates are coalesced until
+        the scheduler runs flush() and a bound widget is only called when its text actually changed.
+    Usage:
+        a = SaveViewModel.from_save_data(model.SaveData(cmds.file(q=True, sn=True)), scheduler=maya.utils.executeDeferred)
+        a.bind('file_path', lambda text: filePath_tx.setLabel(text))
+        a.set(description='char_santa')
+        a.set(version=4)
+        a.flush()
+        a['filename']
+    """
+    __fields__ = ('description', 'discipline', 'version', 'version_letter', 'optional', 'extension', 'initials',
+                  'username', 'project_folder', 'original_folder', 'use_original_folder')
+    # (derived value, what it depends on), in the order they have to be computed
+    __derived__ = (('filename', ('description', 'discipline', 'version', 'version_letter', 'optional', 'extension',
+                                 'initials')),
+                   ('discipline_folder', ('discipline',)),
+                   ('file_path', ('filename', 'discipline_folder', 'username', 'project_folder', 'original_folder',
+                                  'use_original_folder')))
+
+    def __init__(self, scheduler=None, **fields):
+        """ init
+        Args:
+            scheduler (function): called with flush when an update is pending, e.g. maya.utils.executeDeferred.
+                                  None flushes straight away on every set()
+            fields (dict): starting values of __fields__
+        """
+        self.scheduler = scheduler
+        self.flushes = 0
+        self._values = dict.fromkeys(self.__fields__)
+        self._values.update(version=1, version_letter='', use_original_folder=False)
+        self._values.update(fields)
+        self._dirty = set(name for name, _ in self.__derived__)
+        self._published = {}
+        self._bindings = {}
+        self._scheduled = False
+        self.flush()
+
+    @classmethod
+    def from_save_data(cls, save_data, scheduler=None):
+        """ Starts from a SaveData's scene file and directory
+        Returns (SaveViewModel): new view model
+        """
+        scene_file = save_data.scene_file
+        return cls(scheduler=scheduler,
+                   description=scene_file.description,
+                   discipline=scene_file.discipline,
+                   version=scene_file.version,
+                   optional=scene_file.optional,
+                   extension=scene_file.extension,
+                   initials=scene_file.user,
+                   username=save_data.username,
+                   project_folder=save_data.dir.build_path(),
+                   original_folder=save_data.input_folder)
+
+    def bind(self, name, setter):
+        """ Calls setter(value) whenever the value of name changes, starting with its current value
+        Args:
+            name (str): field or derived value
+            setter (function): usually a widget's setText/setLabel
+        """
+        self._bindings.setdefault(name, []).append(setter)
+        value = self[name]
+        self._published[name] = value
+        setter(value)
+
+    def set(self, **changes):
+        """ Changes fields and schedules a flush, changes to the same value are ignored
+        """
+        changed = set()
+        for name, value in changes.items():
+            if name not in self.__fields__:
+                raise KeyError('Unknown field %r, expected one of %s' % (name, ', '.join(self.__fields__)))
+            if self._values[name] != value:
+                self._values[name] = value
+                changed.add(name)
+        if not changed:
+            return
+        self._mark_dirty(changed)
+        if self.scheduler is None:
+            self.flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            self.scheduler(self.flush)
+
+    def flush(self):
+        """ Recomputes the dirty derived values and calls the bindings whose value changed
+        Returns [str]: names whose bindings were called
+        """
+        self._scheduled = False
+        self._compute()
+        updated = []
+        for name, setters in self._bindings.items():
+            value = self._values[name]
+            if self._published.get(name, self) != value:
+                self._published[name] = value
+                updated.append(name)
+                for setter in setters:
+                    setter(value)
+        self.flushes += 1
+        return updated
+
+    def __getitem__(self, name):
+        self._compute()
+        return self._values[name]
+
+    def _mark_dirty(self, changed):
+        for name, depends_on in self.__derived__:
+            if changed.intersection(depends_on):
+                self._dirty.add(name)
+                changed.add(name)
+
+    def _compute(self):
+        for name, _ in self.__derived__:
+            if name in self._dirty:
+                self._values[name] = getattr(self, '_compute_%s' % name)()
+                self._dirty.discard(name)
+
+    def _compute_filename(self):
+        if not self._values['description']:
+            return ''
+        return model.get_template(model.config['path']['template_string']).render_fields({
+            'DESCRIPTION': self._values['description'],
+            'DISCIPLINE': self._values['discipline'],
+            'VERSION': '%03d%s' % (int(self._values['version']), self._values['version_letter'] or ''),
+            'INITIALS': self._values['initials'],
+            'OPTIONAL': self._values['optional'] or None,
+            'EXT': (self._values['extension'] or '').lstrip('.')})
+
+    def _compute_discipline_folder(self):
+        return model.SaveData.get_discipline_folder(self._values['discipline'])
+
+    def _compute_file_path(self):
+        if self._values['use_original_folder']:
+            return os.path.join(self._values['original_folder'] or '', self._values['filename'])
+        return os.path.join(self._values['project_folder'] or '', self._values['discipline_folder'],
+                            self._values['username'] or '', self._values['filename'])
@@ -22,5 +22,8 @@ setup(
     test_suite='nose.collector',
     tests_require=['nose'],
     include_package_data=True,
+    entry_points={
+        'console_scripts': ['mpcsave = save.cmd:main'],
+    },
     zip_safe=False
 )